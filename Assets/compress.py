@@ -0,0 +1,121 @@
+import gzip
+import mimetypes
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from Assets.fingerprint import is_fingerprinted
+
+"""
+Pre-compressed Asset Publishing
+: Text assets are compressed once at the highest level (gzip -9) and stored with Content-Encoding set, instead of relying
+: on CloudFront's on-the-fly compression. The gzip copy replaces the original key, since every browser accepts gzip.
+: No brotli copy is stored: S3 serves one object per key, so a <key>.br variant would need an edge function to select it.
+: Every object gets a Content-Type and a Cache-Control header chosen by its content-type class.
+: https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/ServingCompressedFiles.html
+"""
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.html', '.htm', '.css', '.js', '.mjs', '.json', '.map', '.svg', '.xml', '.txt', '.webmanifest', '.ico'
+}
+MIN_COMPRESS_SIZE = 256
+
+CACHE_CONTROL = {
+    'html': 'public, max-age=60, must-revalidate',
+    'asset': 'public, max-age=86400',
+    'immutable': 'public, max-age=31536000, immutable',
+    'default': 'public, max-age=3600'
+}
+ASSET_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.ico',
+    '.woff', '.woff2', '.ttf', '.otf'
+}
+
+
+def cache_class(key):
+    extension = os.path.splitext(key)[1].lower()
+    if is_fingerprinted(key):
+        return 'immutable'
+    if extension in ('.html', '.htm'):
+        return 'html'
+    if extension in ASSET_EXTENSIONS:
+        return 'asset'
+    return 'default'
+
+
+def content_type(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+def compress_file(source_path, target_path):
+    """
+    Runs in a worker process. Writes the gzip copy to target_path when it is smaller than the original (else a plain
+    copy), and returns the encodings that were written.
+    """
+    with open(source_path, 'rb') as source:
+        data = source.read()
+    encodings = []
+    # mtime=0 keeps the output byte-identical between runs, so unchanged files are not re-uploaded by the sync.
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(target_path, 'wb') as target:
+            target.write(compressed)
+        encodings.append('gzip')
+    else:
+        shutil.copyfile(source_path, target_path)
+    return encodings
+
+
+def compress_assets(source_dir, staging_dir, max_workers=None, exclude=('.git',)):
+    """
+    Copy source_dir into staging_dir, compressing text assets on a process pool.
+    Returns {key: upload ExtraArgs} for every file written to staging_dir.
+    """
+    metadata = {}
+    jobs = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = [name for name in dirs if name not in exclude]
+            for name in files:
+                source_path = os.path.join(root, name)
+                key = os.path.relpath(source_path, source_dir).replace(os.sep, '/')
+                target_path = os.path.join(staging_dir, *key.split('/'))
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                metadata[key] = {'ContentType': content_type(key), 'CacheControl': CACHE_CONTROL[cache_class(key)]}
+                if (os.path.splitext(key)[1].lower() in COMPRESSIBLE_EXTENSIONS
+                        and os.path.getsize(source_path) >= MIN_COMPRESS_SIZE):
+                    jobs[key] = pool.submit(compress_file, source_path, target_path)
+                else:
+                    shutil.copyfile(source_path, target_path)
+        for key, job in jobs.items():
+            encodings = job.result()
+            if 'gzip' in encodings:
+                metadata[key]['ContentEncoding'] = 'gzip'
+    return metadata
+
+
+class AssetPublisher():
+    def __init__(self, bucket_name, region, max_workers=None) -> None:
+        self.bucket_name = bucket_name
+        self.region = region
+        self.max_workers = max_workers
+
+    def publish(self, source_dir, delete=False, dry_run=False, fingerprint=False, optimize=False):
+        from Bucket.sync import S3ContentSync
+        with tempfile.TemporaryDirectory() as optimized_dir, tempfile.TemporaryDirectory() as build_dir, tempfile.TemporaryDirectory() as staging_dir:
+            if optimize:
+                from Assets.optimize import AssetOptimizer
+                stats = AssetOptimizer(max_workers=self.max_workers).optimize(source_dir, optimized_dir)
+                print(f"{stats['optimized']} assets optimized, {stats['cached']} from cache, "
+                      f"{stats['bytes_before']} -> {stats['bytes_after']} bytes.")
+                source_dir = optimized_dir
+            if fingerprint:
+                from Assets.fingerprint import fingerprint_assets
+                renames = fingerprint_assets(source_dir, build_dir)
+                print(f'{len(renames)} assets renamed to content-hashed names.')
+                source_dir = build_dir
+            metadata = compress_assets(source_dir, staging_dir, self.max_workers)
+            compressed = sum(1 for args in metadata.values() if args.get('ContentEncoding') == 'gzip')
+            print(f'{compressed} of {len(metadata)} files pre-compressed.')
+            sync = S3ContentSync(self.bucket_name, self.region, object_args=lambda key, path: metadata[key])
+            return sync.sync(staging_dir, delete=delete, dry_run=dry_run)
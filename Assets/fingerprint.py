@@ -0,0 +1,229 @@
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+
+"""
+Content-hashed Asset Names
+: Copies a site into an output directory, renames CSS, JS, images and fonts to <name>.<hash>.<ext> and rewrites
+: the references to them, so the renamed files can be cached with long TTLs.
+: HTML files keep their names (they are the entry points) and are served with a short TTL.
+: References that are rewritten:
+:   HTML  src/href/content attributes, srcset/imagesrcset candidates, url() and inline module imports
+:   CSS   url() and @import
+:   JS    relative ES-module imports: import/export ... from './x.js', import './x.js', import('./x.js')
+: Files are processed in dependency order, leaves first, so the hash of a CSS or JS file covers the hashed names of
+: everything it imports. Files that cannot be renamed safely keep their original names:
+:   - files in an import cycle (their hashes would depend on each other)
+:   - files whose name still appears in a place that is not rewritten, e.g. a JS string or a JSON/XML/SVG file
+"""
+
+HASH_LENGTH = 10
+FINGERPRINT_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.ico',
+    '.woff', '.woff2', '.ttf', '.otf'
+}
+HTML_EXTENSIONS = {'.html', '.htm'}
+# Files whose references are rewritten, and the patterns used for each.
+REWRITTEN_EXTENSIONS = HTML_EXTENSIONS | {'.css', '.js', '.mjs'}
+# Text files searched for asset names that are not rewritten.
+SCANNED_EXTENSIONS = REWRITTEN_EXTENSIONS | {'.json', '.webmanifest', '.map', '.xml', '.svg', '.txt'}
+FINGERPRINTED_NAME = re.compile(r'\.[0-9a-f]{%d}\.[A-Za-z0-9]+$' % HASH_LENGTH)
+HTML_REFERENCE = re.compile(r'''(?P<prefix>\b(?:src|href|content)\s*=\s*["'])(?P<url>[^"']+)(?P<suffix>["'])''', re.IGNORECASE)
+SRCSET_REFERENCE = re.compile(r'''(?P<prefix>\b(?:srcset|imagesrcset)\s*=\s*["'])(?P<url>[^"']+)(?P<suffix>["'])''', re.IGNORECASE)
+CSS_REFERENCE = re.compile(r'''(?P<prefix>url\(\s*["']?)(?P<url>[^"')]+)(?P<suffix>["']?\s*\))''', re.IGNORECASE)
+CSS_IMPORT = re.compile(r'''(?P<prefix>@import\s+["'])(?P<url>[^"']+)(?P<suffix>["'])''', re.IGNORECASE)
+# Only relative specifiers name files of the site; bare ones ('react') are resolved by a bundler or an import map.
+JS_IMPORT = re.compile(
+    r'''(?P<prefix>(?:\b(?:import|export)\s+(?:[\w$*{}\s,]+?\s+from\s*)?|\bimport\s*\(\s*)["'])'''
+    r'''(?P<url>\.{0,2}/[^"'\n]+)(?P<suffix>["'])'''
+)
+PATTERNS = {
+    'html': (HTML_REFERENCE, SRCSET_REFERENCE, CSS_REFERENCE, CSS_IMPORT, JS_IMPORT),
+    'css': (CSS_REFERENCE, CSS_IMPORT),
+    'js': (JS_IMPORT,)
+}
+ASSET_NAME = re.compile(r'[\w.~@+-]+\.(?:' + '|'.join(sorted(extension[1:] for extension in FINGERPRINT_EXTENSIONS)) + r')\b', re.IGNORECASE)
+
+
+def is_fingerprinted(key):
+    return bool(FINGERPRINTED_NAME.search(key))
+
+
+def hashed_name(key, data):
+    root, extension = posixpath.splitext(key)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def extension(key):
+    return posixpath.splitext(key)[1].lower()
+
+
+def kind(key):
+    if extension(key) in HTML_EXTENSIONS:
+        return 'html'
+    if extension(key) == '.css':
+        return 'css'
+    if extension(key) in ('.js', '.mjs'):
+        return 'js'
+    return None
+
+
+def split_url(url):
+    query = re.search(r'[?#]', url)
+    return (url[:query.start()], url[query.start():]) if query else (url, '')
+
+
+def resolve(url, key):
+    """
+    The site key a reference in `key` points at, or None for external, data: and fragment-only URLs.
+    """
+    if re.match(r'^[a-z][a-z0-9+.-]*:|^//|^#', url, re.IGNORECASE):
+        return None
+    path = split_url(url)[0]
+    if not path:
+        return None
+    return posixpath.normpath(path.lstrip('/') if path.startswith('/') else posixpath.join(posixpath.dirname(key), path))
+
+
+def srcset_urls(value):
+    # "a.png 1x, b.png 2x" -> ['a.png', 'b.png']
+    return [candidate.split()[0] for candidate in value.split(',') if candidate.strip()]
+
+
+def references(text, key):
+    """
+    Every site key referenced by a rewritten pattern in `text`.
+    """
+    found = set()
+    for pattern in PATTERNS[kind(key)]:
+        for match in pattern.finditer(text):
+            urls = srcset_urls(match.group('url')) if pattern is SRCSET_REFERENCE else [match.group('url')]
+            found.update(target for target in (resolve(url, key) for url in urls) if target)
+    return found
+
+
+def rewrite_url(url, key, renames):
+    target = resolve(url, key)
+    if target not in renames:
+        return url
+    path, rest = split_url(url)
+    return posixpath.join(posixpath.dirname(path), posixpath.basename(renames[target])) + rest
+
+
+def rewrite_references(text, key, renames, pattern):
+    def replace(match):
+        url = match.group('url')
+        if pattern is SRCSET_REFERENCE:
+            candidates = []
+            for candidate in url.split(','):
+                parts = candidate.split(None, 1)
+                if parts:
+                    leading = candidate[:len(candidate) - len(candidate.lstrip())]
+                    candidates.append(leading + ' '.join([rewrite_url(parts[0], key, renames)] + parts[1:]))
+            new_url = ','.join(candidates)
+        else:
+            new_url = rewrite_url(url, key, renames)
+        return f"{match.group('prefix')}{new_url}{match.group('suffix')}"
+
+    return pattern.sub(replace, text)
+
+
+def unrewritten_names(text, key):
+    """
+    Asset file names mentioned in `text` outside the references that are rewritten (e.g. in a JS string).
+    """
+    if kind(key):
+        for pattern in PATTERNS[kind(key)]:
+            text = pattern.sub('', text)
+    return {name.lower() for name in ASSET_NAME.findall(text)}
+
+
+def dependency_order(keys, dependencies):
+    """
+    Depth-first order with dependencies before dependents. Returns (order, keys that are part of a cycle).
+    """
+    order, cyclic, state = [], set(), {}
+
+    def visit(key, path):
+        if state.get(key) == 'done':
+            return
+        if state.get(key) == 'visiting':
+            cyclic.update(path[path.index(key):])
+            return
+        state[key] = 'visiting'
+        path.append(key)
+        for dependency in sorted(dependencies.get(key, ())):
+            visit(dependency, path)
+        path.pop()
+        state[key] = 'done'
+        order.append(key)
+
+    for key in sorted(keys):
+        visit(key, [])
+    return order, cyclic
+
+
+def fingerprint_assets(source_dir, output_dir, exclude=('.git',)):
+    """
+    Returns {original key: hashed key} for every renamed file.
+    """
+    keys = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = [name for name in dirs if name not in exclude]
+        for name in files:
+            keys.append(os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/'))
+
+    def read(key):
+        with open(os.path.join(source_dir, *key.split('/')), 'rb') as file:
+            return file.read()
+
+    def write(key, data):
+        path = os.path.join(output_dir, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+    texts, dependencies, pinned_names = {}, {}, set()
+    for key in keys:
+        if extension(key) in SCANNED_EXTENSIONS:
+            # Rewritten files must be valid UTF-8; the others are only searched.
+            text = read(key).decode('utf-8') if kind(key) else read(key).decode('utf-8', errors='replace')
+            pinned_names.update(unrewritten_names(text, key))
+            if kind(key):
+                texts[key] = text
+                dependencies[key] = {target for target in references(text, key) if target in keys and target != key}
+
+    order, cyclic = dependency_order(keys, dependencies)
+    # Keep the original name when a reference could not be rewritten to the hashed one.
+    pinned = cyclic | {key for key in keys if posixpath.basename(key).lower() in pinned_names}
+    renames = {}
+    for key in order:
+        if kind(key) == 'html':
+            continue
+        if key in texts:
+            text = texts[key]
+            for pattern in PATTERNS[kind(key)]:
+                text = rewrite_references(text, key, renames, pattern)
+            data = text.encode('utf-8')
+        else:
+            data = None
+        renameable = extension(key) in FINGERPRINT_EXTENSIONS and not is_fingerprinted(key) and key not in pinned
+        if renameable:
+            data = read(key) if data is None else data
+            renames[key] = hashed_name(key, data)
+            write(renames[key], data)
+        elif data is not None:
+            write(key, data)
+        else:
+            destination = os.path.join(output_dir, *key.split('/'))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copyfile(os.path.join(source_dir, *key.split('/')), destination)
+    for key in keys:
+        if kind(key) == 'html':
+            text = texts[key]
+            for pattern in PATTERNS['html']:
+                text = rewrite_references(text, key, renames, pattern)
+            write(key, text.encode('utf-8'))
+    return renames
@@ -0,0 +1,221 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Local Asset Optimization
+: Minifies HTML and CSS, minifies JS when `rjsmin` is installed, and strips metadata from / recompresses JPEG and PNG
+: images when Pillow is installed (the EXIF orientation is applied to the pixels and the ICC profile is kept). HTML attribute values are left as they are, and inline scripts are only minified
+: when their type is JavaScript (JSON, templates and other data blocks are kept).
+: Files are processed on a process pool. Results are kept in a content-addressed cache directory keyed by the source
+: hash and the optimizer settings, so files unchanged since the last run are copied from the cache instead of redone.
+: A result is only used when it is smaller than the source.
+: Runs before fingerprinting and compression (Assets.compress.AssetPublisher), or on its own:
+:   python main.py optimize <source_dir> <output_dir>
+"""
+
+DEFAULT_CACHE_DIR = '.asset-cache'
+OPTIMIZER_VERSION = 3
+JPEG_QUALITY = 85
+TEXT_EXTENSIONS = ('.html', '.htm', '.css', '.js', '.mjs')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+STRING_OR_COMMENT = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)''', re.DOTALL)
+PRESERVED_HTML_BLOCK = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.DOTALL | re.IGNORECASE)
+HTML_COMMENT = re.compile(r'<!--(?!\[if|<!|>).*?-->', re.DOTALL)
+# A tag, including quoted attribute values that contain '>'.
+HTML_TAG = re.compile(r'''(<(?:"[^"]*"|'[^']*'|[^'">])*>)''')
+QUOTED_VALUE = re.compile(r'''("[^"]*"|'[^']*')''')
+SCRIPT_TYPE = re.compile(r'''\btype\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+# https://html.spec.whatwg.org/multipage/scripting.html#javascript-mime-type
+JAVASCRIPT_TYPES = {
+    '', 'module', 'text/javascript', 'application/javascript', 'application/ecmascript', 'application/x-ecmascript',
+    'application/x-javascript', 'text/ecmascript', 'text/javascript1.0', 'text/javascript1.1', 'text/javascript1.2',
+    'text/javascript1.3', 'text/javascript1.4', 'text/javascript1.5', 'text/jscript', 'text/livescript',
+    'text/x-ecmascript', 'text/x-javascript'
+}
+
+
+def minify_css(text):
+    parts = []
+    for index, part in enumerate(STRING_OR_COMMENT.split(text)):
+        if index % 2 == 1:
+            # Strings are kept as they are; comments are dropped except /*! license */ comments.
+            if not part.startswith('/*') or part.startswith('/*!'):
+                parts.append(part)
+            continue
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        # Only the space after ':' goes; 'a :hover' and 'a:hover' are different selectors.
+        part = re.sub(r':\s+', ':', part)
+        part = part.replace(';}', '}')
+        parts.append(part)
+    return ''.join(parts).strip()
+
+
+def minify_js(text):
+    try:
+        import rjsmin
+    except ImportError:
+        # A regex minifier is not safe for JS (regex literals, template strings, ASI); leave it unchanged.
+        return text
+    return rjsmin.jsmin(text)
+
+
+def is_javascript(opening_tag):
+    match = SCRIPT_TYPE.search(opening_tag)
+    script_type = next((value for value in match.groups() if value is not None), '') if match else ''
+    return script_type.split(';')[0].strip().lower() in JAVASCRIPT_TYPES
+
+
+def collapse_whitespace(text):
+    # Whitespace runs collapse to one space (never removed entirely: it is significant between inline elements).
+    # Inside tags, quoted attribute values (title="a   b") are kept as they are.
+    parts = []
+    for index, part in enumerate(HTML_TAG.split(text)):
+        if index % 2 == 1:
+            parts.extend(value if quoted % 2 == 1 else re.sub(r'\s+', ' ', value)
+                         for quoted, value in enumerate(QUOTED_VALUE.split(part)))
+        else:
+            parts.append(re.sub(r'\s+', ' ', part))
+    return ''.join(parts)
+
+
+def minify_html(text):
+    def minify_block(match):
+        block = match.group(1)
+        tag = match.group(2).lower()
+        opening_tag = HTML_TAG.match(block).group(1)
+        body, _, closing = block[len(opening_tag):].rpartition('</')
+        if tag == 'style':
+            return f'{opening_tag}{minify_css(body)}</{closing}'
+        if tag == 'script' and 'src=' not in opening_tag.lower() and is_javascript(opening_tag):
+            return f'{opening_tag}{minify_js(body)}</{closing}'
+        return block
+
+    parts = []
+    for index, part in enumerate(PRESERVED_HTML_BLOCK.split(text)):
+        if index % 3 == 2:
+            continue  # the tag-name group of the previous block
+        if index % 3 == 1:
+            parts.append(minify_block(PRESERVED_HTML_BLOCK.match(part)))
+            continue
+        parts.append(collapse_whitespace(HTML_COMMENT.sub('', part)))
+    return ''.join(parts).strip()
+
+
+def optimize_image(source_path, target_path):
+    """
+    Returns True when the image was written; False when Pillow is not installed.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return False
+    with Image.open(source_path) as image:
+        image_format = image.format
+        icc_profile = image.info.get('icc_profile')
+        # Re-saving without passing `exif`/`info` drops EXIF and comments. The EXIF Orientation is applied to the pixels
+        # first (most phone photos rely on it), and the ICC profile is kept so wide-gamut colours do not shift.
+        image = ImageOps.exif_transpose(image)
+        options = {'optimize': True}
+        if icc_profile:
+            options['icc_profile'] = icc_profile
+        if image_format == 'JPEG':
+            options.update(quality=JPEG_QUALITY, progressive=True)
+        image.save(target_path, image_format, **options)
+    return True
+
+
+def optimize_file(source_path, cache_path, extension):
+    """
+    Runs in a worker process. Writes the optimized file to cache_path and returns whether it was written.
+    """
+    if extension in TEXT_EXTENSIONS:
+        with open(source_path, encoding='utf-8') as source:
+            text = source.read()
+        minify = {'.css': minify_css, '.js': minify_js, '.mjs': minify_js}.get(extension, minify_html)
+        with open(cache_path, 'w', encoding='utf-8') as target:
+            target.write(minify(text))
+        return True
+    return optimize_image(source_path, cache_path + extension)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AssetOptimizer():
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_workers=None) -> None:
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        # Installing Pillow or rjsmin later must invalidate results produced without them.
+        self.settings = json.dumps({
+            'version': OPTIMIZER_VERSION, 'quality': JPEG_QUALITY,
+            'pillow': importlib.util.find_spec('PIL') is not None, 'rjsmin': importlib.util.find_spec('rjsmin') is not None
+        })
+
+    def cache_key(self, source_path):
+        return hashlib.sha256(f'{file_sha256(source_path)}:{self.settings}'.encode()).hexdigest()
+
+    def optimize(self, source_dir, output_dir, exclude=('.git',)):
+        """
+        Copy source_dir to output_dir with every supported file optimized. Returns counters.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        stats = {'optimized': 0, 'cached': 0, 'copied': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+        jobs = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            for root, dirs, files in os.walk(source_dir):
+                dirs[:] = [name for name in dirs if name not in exclude]
+                for name in files:
+                    source_path = os.path.join(root, name)
+                    key = os.path.relpath(source_path, source_dir).replace(os.sep, '/')
+                    target_path = os.path.join(output_dir, *key.split('/'))
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    extension = os.path.splitext(name)[1].lower()
+                    if extension not in TEXT_EXTENSIONS + IMAGE_EXTENSIONS:
+                        shutil.copyfile(source_path, target_path)
+                        stats['copied'] += 1
+                        continue
+                    cache_path = os.path.join(self.cache_dir, self.cache_key(source_path))
+                    if os.path.exists(cache_path + '.json'):
+                        self.place(source_path, target_path, cache_path, extension, stats)
+                        stats['cached'] += 1
+                        continue
+                    jobs[pool.submit(optimize_file, source_path, cache_path, extension)] = (source_path, target_path, cache_path, extension)
+            for job, (source_path, target_path, cache_path, extension) in jobs.items():
+                try:
+                    written = job.result()
+                except Exception as e:
+                    # Published unoptimized and not cached, so it is tried again next run.
+                    print(f'Error optimizing {source_path}: {e}')
+                    shutil.copyfile(source_path, target_path)
+                    stats['failed'] += 1
+                    continue
+                with open(cache_path + '.json', 'w') as marker:
+                    json.dump({'written': written}, marker)
+                self.place(source_path, target_path, cache_path, extension, stats)
+                stats['optimized'] += 1
+        return stats
+
+    def place(self, source_path, target_path, cache_path, extension, stats):
+        with open(cache_path + '.json') as marker:
+            written = json.load(marker)['written']
+        if not written:
+            shutil.copyfile(source_path, target_path)
+            return
+        cached_file = cache_path if extension in TEXT_EXTENSIONS else cache_path + extension
+        source_size = os.path.getsize(source_path)
+        cached_size = os.path.getsize(cached_file)
+        shutil.copyfile(cached_file if cached_size < source_size else source_path, target_path)
+        stats['bytes_before'] += source_size
+        stats['bytes_after'] += min(cached_size, source_size)
@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+"""
+Client Construction Benchmark
+: Builds the boto3 clients of one provisioning run twice in fresh interpreters and compares wall time and memory:
+:   per-manager  one boto3.client() per manager instance, as main.py did before Clients.registry
+:   registry     Clients.registry.get_client(), one client per (service, region)
+: No AWS credentials or network access are needed; only client construction is measured.
+:   python -m Benchmark.clients --runs 5
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The clients one provisioning run built before the registry, in order (one per manager instance).
+PER_MANAGER_CLIENTS = [
+    ('s3', 'ap-southeast-1'),    # S3StaticWebsite -> S3BucketManager
+    ('codepipeline', None),      # CodePipeline
+    ('s3', None),                # CodePipeline (unused)
+    ('route53', None),           # Route53HostedZone (step 3)
+    ('acm', 'us-east-1'),        # CertificateManager
+    ('cloudfront', None),        # CloudFrontDistribution
+    ('cloudfront', None),        # ResponseHeaderPolicy
+    ('s3', 'ap-southeast-1'),    # update_bucket_config -> S3BucketManager
+    ('cloudfront', None),        # DistributionConfig
+    ('cloudfront', None),        # OriginAccessControl
+    ('route53', None),           # Route53HostedZone (step 7)
+]
+
+
+def build_clients(mode, trace_memory):
+    # boto3 is imported up front in both modes, so only client construction is measured.
+    import boto3
+    from Clients.registry import get_client
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if mode == 'per-manager':
+        clients = [boto3.client(service, region_name=region) for service, region in PER_MANAGER_CLIENTS]
+    else:
+        clients = [get_client(service, region) for service, region in PER_MANAGER_CLIENTS]
+    result = {'seconds': time.perf_counter() - start, 'clients': len({id(client) for client in clients})}
+    if trace_memory:
+        result['retained_mb'], result['peak_mb'] = (value / 2**20 for value in tracemalloc.get_traced_memory())
+    return result
+
+
+def run_child(mode, trace_memory):
+    import json
+    import subprocess
+    # A fresh interpreter per sample, so neither mode benefits from service models loaded by the other.
+    command = [sys.executable, '-m', 'Benchmark.clients', '--child', mode] + (['--trace-memory'] if trace_memory else [])
+    environment = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True, env=environment)
+    return json.loads(result.stdout)
+
+
+def measure(mode, runs):
+    """
+    Median construction time of `runs` untraced samples; memory from one sample under tracemalloc (which slows it down).
+    """
+    seconds = sorted(run_child(mode, False)['seconds'] for _ in range(runs))
+    result = run_child(mode, True)
+    result['seconds'] = seconds[len(seconds) // 2]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare boto3 client construction per manager and through the registry.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', choices=('per-manager', 'registry'), help=argparse.SUPPRESS)
+    parser.add_argument('--trace-memory', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        import json
+        print(json.dumps(build_clients(args.child, args.trace_memory)))
+        return 0
+
+    results = {mode: measure(mode, args.runs) for mode in ('per-manager', 'registry')}
+    print(f"{'Mode':<12} {'Clients':>7} {'Seconds':>8} {'Retained MB':>11} {'Peak MB':>8}   (median of {args.runs} runs)")
+    for mode, result in results.items():
+        print(f"{mode:<12} {result['clients']:>7} {result['seconds']:>8.3f} {result['retained_mb']:>11.1f} {result['peak_mb']:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+"""
+Offline Provisioning Benchmark
+: Runs main.provision_site() and the individual managers against moto's in-process AWS stand-in (`pip install -r requirements-dev.txt`)
+: with a configurable latency injected before every API call, and measures per scenario:
+: wall time, API call count, boto3 client construction (count and seconds) and peak Python memory (tracemalloc).
+: Scenarios: managers (each manager on its own), single_site, rerun (second run with the state file), many_sites (fleet).
+: Results are compared with Benchmark/baselines.json; a metric above baseline * --threshold fails the run (exit code 1).
+: Time and memory may also exceed the baseline by ABSOLUTE_TOLERANCE; a call or client count of 0 must stay 0.
+:   python -m Benchmark.provisioning --latency-ms 50
+:   python -m Benchmark.provisioning --update-baseline
+: Real polling delays (certificate issue, INSYNC, Deployed) are scaled by --poll-scale, since moto answers immediately.
+: CloudFront cache policies and response headers policies are not implemented by moto; those calls are answered by
+: UNSUPPORTED_BY_MOTO with empty lists and new ids (still counted and delayed like any other call).
+: https://docs.getmoto.org/en/latest/
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, 'Benchmark', 'baselines.json')
+METRICS = ('wall_seconds', 'api_calls', 'clients_created', 'client_seconds', 'peak_mb')
+COUNT_METRICS = ('api_calls', 'clients_created')
+# Absolute slack for the measured metrics, on top of --threshold.
+ABSOLUTE_TOLERANCE = {'wall_seconds': 0.25, 'client_seconds': 0.25, 'peak_mb': 1.0}
+
+FAKE_ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_SESSION_TOKEN': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    # moto issues ACM certificates after this many seconds (default 60).
+    'MOTO_ACM_VALIDATION_WAIT': '0',
+}
+
+
+def benchmark_site(index):
+    return {
+        'bucket_name': f'bench-site-{index}.example',
+        'region': 'ap-southeast-1',
+        'pipeline_name': f'bench-site-{index}-pipeline',
+        'github_data': {
+            'username': 'example', 'repository': f'site-{index}', 'branch': 'main',
+            'role_arn': 'arn:aws:iam::123456789012:role/benchmark-pipeline',
+            'connection_arn': 'arn:aws:codestar-connections:ap-southeast-1:123456789012:connection/benchmark'
+        },
+        'hostedzone_data': {},
+        'distribution_data': {}
+    }
+
+
+# Modules whose polling sleeps are scaled. Rate limiting (Clients.throttle), botocore retries and the injected
+# latency keep real time.
+POLLING_MODULES = (
+    'CertificateManager.certificate', 'Route53.changebatch', 'CloudFront.create_distribution', 'CloudFront.invalidation',
+    'botocore.waiter'
+)
+
+
+class ScaledTime():
+    """
+    Stands in for the `time` module of a polling module: sleep() is scaled, everything else is the real module.
+    """
+    def __init__(self, scale) -> None:
+        self.scale = scale
+
+    def sleep(self, seconds):
+        time.sleep(seconds * self.scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@contextmanager
+def scaled_sleep(scale, modules=POLLING_MODULES):
+    import importlib
+    from unittest import mock
+    with ExitStack() as stack:
+        for name in modules:
+            stack.enter_context(mock.patch.object(importlib.import_module(name), 'time', ScaledTime(scale)))
+        yield
+
+
+_injected = {'latency_ms': 0, 'hooked': False}
+
+
+def inject_latency(**kwargs):
+    time.sleep(_injected['latency_ms'] / 1000)
+
+
+def new_id():
+    import uuid
+    return str(uuid.uuid4())
+
+
+# (service, operation): parsed response for the APIs moto does not implement.
+UNSUPPORTED_BY_MOTO = {
+    ('cloudfront', 'ListCachePolicies'): lambda: {'CachePolicyList': {'Items': [], 'Quantity': 0, 'MaxItems': 100}},
+    ('cloudfront', 'CreateCachePolicy'): lambda: {'CachePolicy': {'Id': new_id()}, 'ETag': new_id()},
+    ('cloudfront', 'ListResponseHeadersPolicies'): lambda: {
+        'ResponseHeadersPolicyList': {'Items': [], 'Quantity': 0, 'MaxItems': 100}
+    },
+    ('cloudfront', 'CreateResponseHeadersPolicy'): lambda: {'ResponseHeadersPolicy': {'Id': new_id()}, 'ETag': new_id()},
+}
+
+
+def answer_unsupported(model, **kwargs):
+    # Returning (http response, parsed response) from before-call skips the request.
+    from types import SimpleNamespace
+    response = UNSUPPORTED_BY_MOTO.get((model.service_model.service_name, model.name))
+    if response:
+        return SimpleNamespace(status_code=200, headers={}, content=b''), response()
+
+
+def attach_benchmark_hooks(client):
+    events = client.meta.events
+    events.register('before-call.*.*', inject_latency, unique_id='benchmark-latency')
+    events.register('before-call.*.*', answer_unsupported, unique_id='benchmark-unsupported')
+
+
+def create_pipeline_role():
+    # CodePipeline in moto checks that the role can be assumed.
+    import boto3
+    role_name = benchmark_site(0)['github_data']['role_arn'].rsplit('/', 1)[1]
+    boto3.client('iam').create_role(RoleName=role_name, AssumeRolePolicyDocument=json.dumps({
+        'Version': '2012-10-17',
+        'Statement': [{'Effect': 'Allow', 'Principal': {'Service': 'codepipeline.amazonaws.com'}, 'Action': 'sts:AssumeRole'}]
+    }))
+
+
+def fresh_process_state():
+    from Clients import registry, resolver
+    registry.reset_clients()
+    resolver.configure_resolver()
+
+
+def scenario_managers(workdir):
+    from Bucket.bucket import S3BucketManager
+    from CodePipeline.pipeline import CodePipeline
+    from Route53.hostedzone import Route53Manager
+    from CertificateManager.certificate import AWSCertificateManager
+    from CloudFront.create_distribution import CloudFrontDistribution
+    from CloudFront.update_distribution import DistributionConfig
+    site = benchmark_site(0)
+    S3BucketManager(site['bucket_name'], site['region']).configure_bucket()
+    bucket_data = {'s3_bucket': site['bucket_name'], 'artifact_bucket': 'bench-artifacts', 'region': site['region']}
+    CodePipeline(site['pipeline_name'], site['github_data'], bucket_data).configure_pipeline()
+    route53 = Route53Manager()
+    zone_id = route53.create_hosted_zone(site['bucket_name'])
+    certificates = AWSCertificateManager()
+    certificate_arn = certificates.request_certificate(site['bucket_name'], f"*.{site['bucket_name']}")
+    records = certificates.get_validation_records(certificate_arn)
+    batch = route53.change_batch(zone_id)
+    for record in records:
+        batch.add_cname_record('UPSERT', record)
+    route53.wait_for_changes(batch.submit())
+    distribution = CloudFrontDistribution({
+        'cname': [site['bucket_name']],
+        'root_object': 'index.html',
+        'domain_id': f"{site['bucket_name']}.s3.{site['region']}.amazonaws.com",
+        'cache_policy_id': '4135ea2d-6df8-44a3-9df3-4b5a84be39ad',
+        'comment': 'benchmark',
+        'certificate_arn': certificate_arn
+    })
+    distribution_id = distribution.create_distribution()[0]
+    config = DistributionConfig(site['bucket_name'])
+    config.get_distribution_config(distribution_id)
+    config.update_distribution_config(distribution_id)
+    config.update_distribution()
+
+
+def scenario_single_site(workdir):
+    import main
+    main.provision_site(benchmark_site(0))
+
+
+def setup_rerun(workdir):
+    import main
+    from State.store import StateStore
+    main.provision_site(benchmark_site(0), StateStore(os.path.join(workdir, 'state.json')))
+
+
+def scenario_rerun(workdir):
+    import main
+    from State.store import StateStore
+    main.provision_site(benchmark_site(0), StateStore(os.path.join(workdir, 'state.json')))
+
+
+def scenario_many_sites(workdir, sites=10, workers=4):
+    import main
+    from Fleet.fleet import FleetProvisioner
+    fleet = FleetProvisioner([benchmark_site(index) for index in range(sites)], main.provision_site, max_workers=workers)
+    results = fleet.run()
+    failed = [result['site'] for result in results if result['error']]
+    if failed:
+        raise RuntimeError(f'Sites failed: {failed}')
+
+
+SCENARIOS = {
+    'managers': scenario_managers,
+    'single_site': scenario_single_site,
+    'rerun': scenario_rerun,
+    'many_sites': scenario_many_sites,
+}
+# Not measured; e.g. the rerun scenario is measured from a warm state file.
+SETUP = {
+    'rerun': setup_rerun,
+}
+
+
+def run_scenario(name, latency_ms, poll_scale):
+    from moto import mock_aws
+    from Clients import registry, tracing
+
+    with mock_aws(), tempfile.TemporaryDirectory() as workdir, scaled_sleep(poll_scale):
+        fresh_process_state()
+        create_pipeline_role()
+        tracer = tracing.enable_tracing()
+        _injected.update(latency_ms=latency_ms)
+        if not _injected['hooked']:
+            registry.add_client_hook(attach_benchmark_hooks)
+            _injected['hooked'] = True
+
+        error = None
+        if name in SETUP:
+            try:
+                SETUP[name](workdir)
+            except Exception as e:
+                error = f'setup {type(e).__name__}: {e}'
+            fresh_process_state()
+        tracer.calls.clear()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            SCENARIOS[name](workdir)
+        except Exception as e:
+            error = error or f'{type(e).__name__}: {e}'
+        wall_seconds = time.perf_counter() - start
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        stats = registry.client_stats()
+        return {
+            'wall_seconds': round(wall_seconds, 3),
+            'api_calls': len(tracer.calls),
+            'clients_created': stats['created'],
+            'client_seconds': round(stats['construction_seconds'], 3),
+            'peak_mb': round(peak_bytes / 1024 / 1024, 2),
+            'error': error
+        }
+
+
+def allowed(metric, baseline, threshold):
+    """
+    The largest value of a metric that still passes.
+    """
+    if metric in COUNT_METRICS:
+        # A count of 0 must stay 0: e.g. a rerun that makes API calls again is a regression.
+        return baseline * threshold if baseline else 0
+    # Time and memory get an absolute floor, since tiny values (e.g. 0.01s) are too noisy to compare as a ratio.
+    return max(baseline * threshold, baseline + ABSOLUTE_TOLERANCE[metric])
+
+
+def compare(results, baselines, threshold):
+    failures = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            failures.append(f'{name}: no baseline; run with --update-baseline to record one')
+            continue
+        for metric in METRICS:
+            if metric not in baseline:
+                failures.append(f'{name}.{metric}: no baseline; run with --update-baseline to record one')
+            elif result[metric] > allowed(metric, baseline[metric], threshold):
+                failures.append(f'{name}.{metric}: {result[metric]} > {allowed(metric, baseline[metric], threshold):g} '
+                                f'(baseline {baseline[metric]})')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark provisioning against stubbed AWS (moto).')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), help=f'Default: all ({", ".join(SCENARIOS)}).')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Latency injected before every API call.')
+    parser.add_argument('--poll-scale', type=float, default=0.01, help='Multiplier applied to polling sleeps.')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Allowed ratio against the baseline.')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    os.environ.update(FAKE_ENVIRONMENT)
+    sys.path.insert(0, ROOT)
+    results = {}
+    for name in args.scenarios:
+        results[name] = run_scenario(name, args.latency_ms, args.poll_scale)
+        result = results[name]
+        print(f"{name:<12} {result['wall_seconds']:>8.2f}s {result['api_calls']:>5} calls "
+              f"{result['clients_created']:>3} clients ({result['client_seconds']:.2f}s) {result['peak_mb']:>7.2f} MB"
+              + (f"  ERROR {result['error']}" if result['error'] else ''))
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baselines = json.load(baseline_file)
+    if args.update_baseline:
+        baselines.update({name: {metric: result[metric] for metric in METRICS} for name, result in results.items()})
+        baselines['_settings'] = {'latency_ms': args.latency_ms, 'poll_scale': args.poll_scale}
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    failures = compare(results, baselines, args.threshold)
+    errors = [f'{name}: {result["error"]}' for name, result in results.items() if result['error']]
+    for failure in failures + errors:
+        print(f'FAIL: {failure}')
+    return 1 if failures or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
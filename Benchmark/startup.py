@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+
+"""
+CLI Startup Benchmark
+: Runs `python -X importtime main.py <command> --help` in a fresh interpreter and reports the slowest imports.
+: Fails (exit code 1) when the total import time is above --max-ms, or when a module listed in --forbid is imported,
+: e.g. `python -m Benchmark.startup --max-ms 150 --forbid boto3 --forbid botocore`
+: https://docs.python.org/3/using/cmdline.html#cmdoption-X
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append({
+            'name': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us)
+        })
+    return imports
+
+
+def measure(command_args, runs=5):
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', os.path.join(ROOT, 'main.py')] + command_args,
+            cwd=ROOT, capture_output=True, text=True
+        )
+        imports = parse_importtime(result.stderr)
+        total_us = sum(item['self_us'] for item in imports)
+        samples.append((total_us, imports))
+    # The fastest run is the least noisy estimate of the import cost.
+    return min(samples, key=lambda sample: sample[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure main.py import time.')
+    parser.add_argument('command', nargs='*', default=['--help'], help='Arguments passed to main.py (default: --help).')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--max-ms', type=float, default=None, help='Fail when total import time exceeds this.')
+    parser.add_argument('--forbid', action='append', default=[], help='Fail when this top-level module is imported.')
+    args = parser.parse_args(argv)
+
+    total_us, imports = measure(args.command, args.runs)
+    print(f"Total import time: {total_us / 1000:.1f} ms ({len(imports)} modules)")
+    for item in sorted(imports, key=lambda item: item['cumulative_us'], reverse=True)[:args.top]:
+        print(f"{item['cumulative_us'] / 1000:8.1f} ms  {item['name']}")
+
+    failed = False
+    imported = {item['name'].split('.')[0] for item in imports}
+    for module in args.forbid:
+        if module in imported:
+            print(f"FAIL: {module} is imported at startup.")
+            failed = True
+    if args.max_ms is not None and total_us / 1000 > args.max_ms:
+        print(f"FAIL: import time {total_us / 1000:.1f} ms is above {args.max_ms} ms.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
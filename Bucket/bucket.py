@@ -1,25 +1,27 @@
-import boto3
 import json
+from Clients.registry import get_client
 
 class S3BucketManager:
     def __init__(self, bucket_name, region):
-        self.s3_client = boto3.client('s3', region_name=region)
+        self.s3_client = get_client('s3', region)
         self.bucket_name = bucket_name
         self.region = region
 
     def create_bucket(self):
+        # us-east-1 is the default location and rejects an explicit LocationConstraint (InvalidLocationConstraint).
+        bucket_args = {'Bucket': self.bucket_name}
+        if self.region and self.region != 'us-east-1':
+            bucket_args['CreateBucketConfiguration'] = {'LocationConstraint': self.region}
         try:
-            self.s3_client.create_bucket(
-                Bucket=self.bucket_name,
-                CreateBucketConfiguration={'LocationConstraint': self.region}
-            )
+            self.s3_client.create_bucket(**bucket_args)
             print(f'Bucket {self.bucket_name} created successfully.')
+            return True
         except self.s3_client.exceptions.BucketAlreadyExists as e:
             print(f'Bucket name already exists. Please choose a different name. {e}')
-            pass
+            return False
         except self.s3_client.exceptions.BucketAlreadyOwnedByYou as e:
             print(f'Bucket is already owned by you. {e}')
-            pass
+            return True
 
     def block_public_access(self, public_access_block_config):
         try:
@@ -28,8 +30,10 @@ class S3BucketManager:
                 PublicAccessBlockConfiguration=public_access_block_config
             )
             print(f'Public access enabled for bucket {self.bucket_name}.')
+            return True
         except Exception as e:
             print(f'Error enabling public access: {e}')
+            return False
 
     def enable_static_website_hosting(self):
         website_configuration = {
@@ -41,8 +45,10 @@ class S3BucketManager:
                 WebsiteConfiguration=website_configuration
             )
             print(f'Static website hosting enabled for bucket {self.bucket_name}.')
+            return True
         except Exception as e:
             print(f'Error enabling static website hosting: {e}')
+            return False
 
     def set_bucket_policy(self, policy):
         try:
@@ -52,19 +58,39 @@ class S3BucketManager:
                 Policy=policy_json
             )
             print(f'Bucket policy added to {self.bucket_name} successfully.')
+            return True
         except Exception as e:
             print(f'Error adding bucket policy: {e}')
+            return False
+
+    def set_lifecycle_rules(self, rules):
+        try:
+            self.s3_client.put_bucket_lifecycle_configuration(
+                Bucket=self.bucket_name,
+                LifecycleConfiguration={'Rules': rules}
+            )
+            print(f'Lifecycle rules set on {self.bucket_name}.')
+            return True
+        except Exception as e:
+            print(f'Error setting lifecycle rules: {e}')
+            return False
 
     def configure_bucket(self):
-        self.create_bucket()
+        """
+        Returns True when every step succeeded; errors are printed.
+        """
+        if not self.create_bucket():
+            return False
         public_access_block_config = {
             'BlockPublicAcls': False,
             'IgnorePublicAcls': False,
             'BlockPublicPolicy': False,
             'RestrictPublicBuckets': False
         }
-        self.block_public_access(public_access_block_config)
-        self.enable_static_website_hosting()
+        configured = [
+            self.block_public_access(public_access_block_config),
+            self.enable_static_website_hosting()
+        ]
         bucket_policy = {
             "Version": "2012-10-17",
             "Statement": [
@@ -76,4 +102,5 @@ class S3BucketManager:
                 }
             ]
         }
-        self.set_bucket_policy(bucket_policy)
\ No newline at end of file
+        configured.append(self.set_bucket_policy(bucket_policy))
+        return all(configured)
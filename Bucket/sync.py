@@ -0,0 +1,186 @@
+import hashlib
+import json
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+import botocore.exceptions as bexcept
+from Clients.registry import get_client
+
+"""
+Incremental S3 Content Sync
+: Builds a local manifest (size + MD5 per file), compares it with the remote state and uploads only new or changed files.
+: The remote state is read from the manifest stored by the last sync when present, otherwise from the bucket listing.
+: Stored manifests are kept per bucket in a local JSON file (DEFAULT_MANIFEST_FILE), not in the website bucket, whose
+: objects are readable through CloudFront. A manifest object left in the bucket by earlier versions is deleted.
+: Bucket listing ETags equal the MD5 only for single-part uploads, so multipart objects are compared by size and
+: re-uploaded when the stored manifest is missing.
+: The stored manifest is only accurate while this sync is the only writer; pass use_manifest=False after a pipeline deploy.
+: Large files use multipart uploads through boto3's managed transfer.
+: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/customizations/s3.html
+"""
+
+DEFAULT_MANIFEST_FILE = '.sync-manifests.json'
+# Where earlier versions stored the manifest, inside the website bucket.
+LEGACY_MANIFEST_KEY = '.sync-manifest.json'
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+
+
+def file_md5(path, block_size=1024 * 1024):
+    digest = hashlib.md5()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_local_manifest(local_dir, exclude=('.git', DEFAULT_MANIFEST_FILE)):
+    manifest = {}
+    for root, dirs, files in os.walk(local_dir):
+        dirs[:] = [name for name in dirs if name not in exclude]
+        for name in files:
+            if name in exclude:
+                continue
+            path = os.path.join(root, name)
+            key = os.path.relpath(path, local_dir).replace(os.sep, '/')
+            manifest[key] = {'size': os.path.getsize(path), 'md5': file_md5(path)}
+    return manifest
+
+
+class S3ContentSync():
+    def __init__(self, bucket_name, region, max_workers=8, object_args=None, manifest_file=DEFAULT_MANIFEST_FILE) -> None:
+        self.s3_client = get_client('s3', region)
+        self.bucket_name = bucket_name
+        self.region = region
+        self.max_workers = max_workers
+        # Optional callable (key, local_path) -> ExtraArgs for upload_file, e.g. ContentType/CacheControl.
+        self.object_args = object_args
+        self.manifest_file = manifest_file
+        # Set by list_remote_objects; the object is deleted by sync(), never during a dry run.
+        self.legacy_manifest_found = False
+
+    def read_manifests(self):
+        if not self.manifest_file or not os.path.exists(self.manifest_file):
+            return {}
+        with open(self.manifest_file) as file:
+            return json.load(file)
+
+    def get_remote_manifest(self):
+        return self.read_manifests().get(self.bucket_name)
+
+    def save_remote_manifest(self, manifest):
+        if not self.manifest_file:
+            return
+        manifests = self.read_manifests()
+        manifests[self.bucket_name] = manifest
+        temp_path = f'{self.manifest_file}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(manifests, file, sort_keys=True)
+        os.replace(temp_path, self.manifest_file)
+
+    def list_remote_objects(self):
+        """
+        {key: {'size', 'md5'}} of every object. Only reads: a legacy manifest object is noted in legacy_manifest_found.
+        """
+        remote = {}
+        self.legacy_manifest_found = False
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name):
+            for item in page.get('Contents', []):
+                if item['Key'] == LEGACY_MANIFEST_KEY:
+                    self.legacy_manifest_found = True
+                    continue
+                etag = item['ETag'].strip('"')
+                remote[item['Key']] = {'size': item['Size'], 'md5': etag if '-' not in etag else None}
+        return remote
+
+    def delete_legacy_manifest(self):
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=LEGACY_MANIFEST_KEY)
+            print(f'Deleted the publicly readable {LEGACY_MANIFEST_KEY} from {self.bucket_name}.')
+        except bexcept.ClientError as e:
+            print(f'Error deleting {LEGACY_MANIFEST_KEY} from {self.bucket_name}: {e}')
+
+    def diff(self, local, remote):
+        changed = [key for key, entry in local.items()
+                   if key not in remote or remote[key]['size'] != entry['size'] or remote[key].get('md5') != entry['md5']]
+        removed = [key for key in remote if key not in local]
+        return sorted(changed), sorted(removed)
+
+    def transfer_config(self):
+        from boto3.s3.transfer import TransferConfig
+        return TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=MULTIPART_CHUNKSIZE)
+
+    def upload(self, local_dir, key, config):
+        path = os.path.join(local_dir, *key.split('/'))
+        extra_args = dict(self.object_args(key, path)) if self.object_args else {}
+        if 'ContentType' not in extra_args:
+            extra_args['ContentType'] = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self.s3_client.upload_file(path, self.bucket_name, key, ExtraArgs=extra_args, Config=config)
+        return key
+
+    def delete(self, keys):
+        """
+        Delete keys in batches of 1,000. Returns the keys that could not be deleted.
+        """
+        failed = []
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except bexcept.ClientError as e:
+                print(f'Error deleting removed files: {e}')
+                failed.extend(batch)
+                continue
+            # Quiet mode still lists every key that was not deleted.
+            for error in response.get('Errors', []):
+                print(f"Error deleting {error['Key']}: {error.get('Code')} {error.get('Message')}")
+                failed.append(error['Key'])
+        return failed
+
+    def sync(self, local_dir, delete=False, dry_run=False, use_manifest=True):
+        """
+        Upload new and changed files from local_dir, optionally deleting objects that no longer exist locally.
+        Returns {'uploaded': [...], 'deleted': [...], 'failed': [...], 'unchanged': [...]}; the uploaded and deleted keys feed
+        CloudFront invalidation (CloudFront.invalidation), the unchanged ones tell it how much of a directory changed.
+        """
+        local = build_local_manifest(local_dir)
+        remote = self.get_remote_manifest() if use_manifest else None
+        if remote is None:
+            remote = self.list_remote_objects()
+        changed, removed = self.diff(local, remote)
+        print(f'{self.bucket_name}: {len(changed)} changed, {len(removed)} removed, {len(local) - len(changed)} unchanged.')
+        result = {'uploaded': [], 'deleted': [], 'failed': [], 'unchanged': sorted(set(local) - set(changed))}
+        if dry_run:
+            result.update(uploaded=changed, deleted=removed if delete else [])
+            return result
+
+        config = self.transfer_config()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.upload, local_dir, key, config): key for key in changed}
+            for future, key in futures.items():
+                try:
+                    result['uploaded'].append(future.result())
+                except Exception as e:
+                    print(f'Error uploading {key}: {e}')
+                    result['failed'].append(key)
+
+        if self.legacy_manifest_found:
+            self.delete_legacy_manifest()
+        if delete and removed:
+            failed_deletes = set(self.delete(removed))
+            result['deleted'] = [key for key in removed if key not in failed_deletes]
+            result['failed'].extend(sorted(failed_deletes))
+
+        # Failed uploads are left out of the stored manifest so the next sync retries them; objects that were not
+        # deleted stay in it.
+        stored = {key: entry for key, entry in local.items() if key not in result['failed']}
+        stored.update({key: remote[key] for key in removed if key not in result['deleted']})
+        for key in result['failed']:
+            if key in remote:
+                stored[key] = remote[key]
+        self.save_remote_manifest(stored)
+        return result
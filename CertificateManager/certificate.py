@@ -1,10 +1,15 @@
-import boto3
 import botocore.exceptions as bexcept
+import threading
 import time
+from Clients.registry import get_client
+
+# Statuses a certificate does not leave on its own; everything else (PENDING_VALIDATION) is polled again.
+# https://docs.aws.amazon.com/acm/latest/APIReference/API_CertificateDetail.html
+TERMINAL_STATUSES = {'ISSUED', 'FAILED', 'EXPIRED', 'REVOKED', 'VALIDATION_TIMED_OUT', 'INACTIVE'}
 
 class AWSCertificateManager:
     def __init__(self, region_name='us-east-1'):
-        self.acm_client = boto3.client('acm', region_name=region_name)
+        self.acm_client = get_client('acm', region_name)
 
     def request_certificate(self, domain_name, alt_name, validation_method='DNS'):
         try:
@@ -23,17 +28,108 @@ class AWSCertificateManager:
         except bexcept.ClientError as e:
             print(f"Error requesting certificate. {e}")
 
-    def get_certificate_cname(self, certificate_arn):
+    def get_validation_records(self, certificate_arn, timeout=300, delay=1, max_delay=10):
+        """
+        Poll describe_certificate with a short, growing delay until every domain and SAN has its DNS validation record.
+        Returns the de-duplicated records; the apex and wildcard names of a domain share the same record.
+        An ISSUED certificate may return []. Returns None on timeout or error: that certificate cannot be validated.
+        """
+        deadline = time.monotonic() + timeout
         try:
             while True:
                 response = self.acm_client.describe_certificate(CertificateArn=certificate_arn)
-                options = response['Certificate']['DomainValidationOptions']
-                if 'ResourceRecord' in options[0]:
-                    return options[0]['ResourceRecord']
+                options = [option for option in response['Certificate'].get('DomainValidationOptions', [])
+                           if option.get('ValidationMethod', 'DNS') == 'DNS']
+                # A reused, already ISSUED certificate may have no DNS records (e.g. imported); nothing to wait for.
+                issued = response['Certificate']['Status'] == 'ISSUED'
+                if issued or (options and all('ResourceRecord' in option for option in options)):
+                    records = {}
+                    for option in options:
+                        record = option.get('ResourceRecord')
+                        if record:
+                            records[(record['Name'], record['Type'], record['Value'])] = record
+                    return list(records.values())
+                if time.monotonic() + delay > deadline:
+                    print(f'Validation records for {certificate_arn} not available after {timeout}s.')
+                    return None
                 print('Waiting for certificate validation options..')
-                waiter = self.acm_client.get_waiter('certificate_validated')
-                waiter.wait(CertificateArn= certificate_arn)
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
         except self.acm_client.exceptions.ResourceNotFoundException as e:
             print(f"Resource not found. {e}")
         except bexcept.ClientError as e:
-            print(f"Error fetching the certificate data. {e}")
\ No newline at end of file
+            print(f"Error fetching the certificate data. {e}")
+        return None
+
+    def get_certificate_cname(self, certificate_arn):
+        records = self.get_validation_records(certificate_arn)
+        if records:
+            return records[0]
+
+    def wait_for_issued(self, certificate_arn, timeout=1800):
+        return issued_waiter(self.acm_client).wait(certificate_arn, timeout)
+
+
+class CertificateIssuedWaiter():
+    """
+    One polling thread per ACM client checks every certificate that is waiting to be issued,
+    so several sites waiting at the same time share a single describe_certificate loop.
+    """
+    def __init__(self, acm_client, delay=10) -> None:
+        self.acm_client = acm_client
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.waiting = {}
+        self.statuses = {}
+        self.thread = None
+
+    def wait(self, certificate_arn, timeout=1800):
+        with self.lock:
+            if certificate_arn not in self.waiting:
+                # A status from an earlier wait is stale.
+                self.statuses.pop(certificate_arn, None)
+            event = self.waiting.setdefault(certificate_arn, threading.Event())
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.poll, daemon=True)
+                self.thread.start()
+        if not event.wait(timeout):
+            with self.lock:
+                self.waiting.pop(certificate_arn, None)
+        status = self.statuses.get(certificate_arn, 'PENDING_VALIDATION')
+        print(f"Certificate {certificate_arn} status: {status}")
+        return status == 'ISSUED'
+
+    def poll(self):
+        while True:
+            with self.lock:
+                arns = list(self.waiting)
+                if not arns:
+                    self.thread = None
+                    return
+            for certificate_arn in arns:
+                try:
+                    response = self.acm_client.describe_certificate(CertificateArn=certificate_arn)
+                    status = response['Certificate']['Status']
+                except self.acm_client.exceptions.ResourceNotFoundException as e:
+                    print(f"Resource not found. {e}")
+                    status = 'NOT_FOUND'
+                except (bexcept.ClientError, bexcept.BotoCoreError) as e:
+                    # Throttling, connection and other transient errors: try again on the next round.
+                    print(f"Error fetching the certificate data. {e}")
+                    continue
+                self.statuses[certificate_arn] = status
+                if status in TERMINAL_STATUSES or status == 'NOT_FOUND':
+                    with self.lock:
+                        event = self.waiting.pop(certificate_arn, None)
+                    if event:
+                        event.set()
+            time.sleep(self.delay)
+
+
+_waiters = {}
+_waiters_lock = threading.Lock()
+
+
+def issued_waiter(acm_client):
+    with _waiters_lock:
+        return _waiters.setdefault(id(acm_client), CertificateIssuedWaiter(acm_client))
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import botocore.exceptions as bexcept
+from Clients.registry import get_client
+
+"""
+Certificate Reuse Index
+: Answers "which ISSUED certificate already covers these names" before a new certificate is requested, so a rerun or a
+: new site under an existing wildcard skips issuance and DNS validation.
+: The index is built from every page of list_certificates (ISSUED and PENDING_VALIDATION, key types CloudFront accepts);
+: describe_certificate is only called for certificates with more SANs than the list summary returns. It is cached in memory
+: and in a JSON file for `ttl` seconds. A match is confirmed with describe_certificate before it is returned.
+: A miss in the cached index is checked once more against a fresh listing, and certificates requested or reused by the
+: certificate step are added right away, so a certificate requested since the cache was written (by another fleet site
+: or by an earlier run that failed before validation) is reused instead of requested twice. ISSUED ones are preferred.
+: A wildcard name covers exactly one label: '*.example.com' covers 'www.example.com', not 'example.com' or 'a.b.example.com'.
+: https://docs.aws.amazon.com/acm/latest/userguide/acm-certificate.html#wildcard
+"""
+
+DEFAULT_CACHE_FILE = '.certificate-index.json'
+DEFAULT_TTL = 3600
+# RSA 2048 and ECDSA P-256 are the key types CloudFront accepts for viewer certificates.
+KEY_TYPES = ['RSA_2048', 'EC_prime256v1']
+# Certificates expiring sooner than this are not reused.
+MIN_VALID_DAYS = 30
+# A pending certificate is reused too: the certificate step writes its validation records and waits for it.
+REUSABLE_STATUSES = ['ISSUED', 'PENDING_VALIDATION']
+
+
+def covers(certificate_name, domain_name):
+    certificate_name, domain_name = certificate_name.lower().rstrip('.'), domain_name.lower().rstrip('.')
+    if certificate_name == domain_name:
+        return True
+    if certificate_name.startswith('*.') and not domain_name.startswith('*.'):
+        label, _, parent = domain_name.partition('.')
+        return bool(label) and parent == certificate_name[2:]
+    return False
+
+
+# Fleet sites each hold their own index but share the cache file, so the read-modify-write is serialized per process.
+_save_lock = threading.Lock()
+
+
+class CertificateIndex():
+    def __init__(self, region_name='us-east-1', cache_file=DEFAULT_CACHE_FILE, ttl=DEFAULT_TTL) -> None:
+        self.acm_client = get_client('acm', region_name)
+        self.region_name = region_name
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.index = None
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file) as file:
+                cached = json.load(file).get(region_name)
+            if cached and cached['expires'] > time.time():
+                self.index = cached
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with _save_lock:
+            data = {}
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file) as file:
+                    data = json.load(file)
+            data[self.region_name] = self.index
+            temp_path = f'{self.cache_file}.tmp'
+            with open(temp_path, 'w') as file:
+                json.dump(data, file, indent=2)
+            os.replace(temp_path, self.cache_file)
+
+    def describe_names(self, certificate_arn):
+        certificate = self.acm_client.describe_certificate(CertificateArn=certificate_arn)['Certificate']
+        return certificate.get('SubjectAlternativeNames', [certificate['DomainName']])
+
+    def build(self):
+        certificates = []
+        incomplete = []
+        paginator = self.acm_client.get_paginator('list_certificates')
+        for page in paginator.paginate(CertificateStatuses=REUSABLE_STATUSES, Includes={'keyTypes': KEY_TYPES}):
+            for summary in page['CertificateSummaryList']:
+                certificate = {
+                    'arn': summary['CertificateArn'],
+                    'names': summary.get('SubjectAlternativeNameSummaries') or [summary['DomainName']],
+                    'type': summary.get('Type'),
+                    'status': summary.get('Status', 'ISSUED'),
+                    'not_after': summary['NotAfter'].timestamp() if summary.get('NotAfter') else None
+                }
+                certificates.append(certificate)
+                if summary.get('HasAdditionalSubjectAlternativeNames'):
+                    incomplete.append(certificate)
+        if incomplete:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                for certificate, names in zip(incomplete, pool.map(self.describe_names, [item['arn'] for item in incomplete])):
+                    certificate['names'] = names
+        return {'expires': time.time() + self.ttl, 'certificates': certificates}
+
+    def certificates(self, refresh=False):
+        with self.lock:
+            if refresh or self.index is None or self.index['expires'] <= time.time():
+                self.index = self.build()
+                self.save()
+            return self.index['certificates']
+
+    def candidates(self, domain_names, refresh=False):
+        valid_after = time.time() + MIN_VALID_DAYS * 86400
+        matches = [
+            certificate for certificate in self.certificates(refresh)
+            if (certificate['not_after'] is None or certificate['not_after'] > valid_after)
+            and all(any(covers(name, domain_name) for name in certificate['names']) for domain_name in domain_names)
+        ]
+        # Issued before pending; ACM renews the certificates it issued, so prefer those, then the one valid the longest.
+        return sorted(matches, key=lambda certificate: (
+            certificate.get('status', 'ISSUED') == 'ISSUED', certificate['type'] == 'AMAZON_ISSUED', certificate['not_after'] or 0
+        ), reverse=True)
+
+    def first_usable(self, candidates):
+        for certificate in candidates:
+            # The cached index may be up to `ttl` old: the certificate could have been deleted, revoked or failed since.
+            try:
+                status = self.acm_client.describe_certificate(CertificateArn=certificate['arn'])['Certificate']['Status']
+            except self.acm_client.exceptions.ResourceNotFoundException:
+                status = None
+            if status in REUSABLE_STATUSES:
+                return certificate['arn']
+            with self.lock:
+                self.index = None
+        return None
+
+    def find(self, domain_names):
+        """
+        Return the ARN of an ISSUED (or else PENDING_VALIDATION) certificate covering every name in domain_names, or None.
+        """
+        try:
+            with self.lock:
+                cached = self.index is not None and self.index['expires'] > time.time()
+            certificate_arn = self.first_usable(self.candidates(domain_names))
+            if certificate_arn is None and cached:
+                certificate_arn = self.first_usable(self.candidates(domain_names, refresh=True))
+            return certificate_arn
+        except bexcept.ClientError as e:
+            print(f"Error reading the certificate index. {e}")
+        return None
+
+    def add(self, certificate_arn, names, status='PENDING_VALIDATION'):
+        """
+        Record a certificate requested or reused by the certificate step, so the next lookup finds it without a listing.
+        """
+        with self.lock:
+            # Without an index the next lookup lists the certificates anyway.
+            if self.index is None or any(certificate['arn'] == certificate_arn for certificate in self.index['certificates']):
+                return
+            self.index['certificates'].append({
+                'arn': certificate_arn, 'names': list(names), 'type': 'AMAZON_ISSUED', 'status': status, 'not_after': None
+            })
+            self.save()
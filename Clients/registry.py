@@ -0,0 +1,94 @@
+import threading
+import time
+from Clients import throttle
+
+"""
+Shared boto3 Session and Client Registry
+: Clients are created lazily, once per (service, region), from a single process-wide session.
+: Clients built from the same session share the loaded service models, and each client keeps its own HTTP connection pool,
+: so reusing the client reuses the pool.
+: boto3 itself is imported on first use, so importing this module does not slow CLI startup.
+: boto3 clients are thread-safe, but creating them from a shared session is not, so construction is guarded by a lock.
+: Every client is rate limited per service (Clients.throttle) and retries throttling errors with adaptive backoff.
+: https://boto3.amazonaws.com/v1/documentation/api/latest/guide/clients.html#multithreading-or-multiprocessing-with-clients
+"""
+
+MAX_POOL_CONNECTIONS = 20
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_client_hooks = []
+_stats = {'created': 0, 'reused': 0, 'construction_seconds': 0.0}
+_account_ids = {}
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            import boto3
+            _session = boto3.session.Session()
+        return _session
+
+
+def get_client(service_name, region_name=None):
+    key = (service_name, region_name)
+    client = _clients.get(key)
+    if client is not None:
+        with _lock:
+            _stats['reused'] += 1
+        return client
+    session = get_session()
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            from botocore.config import Config
+            start = time.perf_counter()
+            client = session.client(
+                service_name,
+                region_name=region_name,
+                config=Config(max_pool_connections=MAX_POOL_CONNECTIONS, retries=throttle.RETRY_CONFIG)
+            )
+            throttle.attach(client, region_name)
+            _stats['construction_seconds'] += time.perf_counter() - start
+            _stats['created'] += 1
+            for hook in _client_hooks:
+                hook(client)
+            _clients[key] = client
+        else:
+            _stats['reused'] += 1
+    return client
+
+
+def account_id():
+    """
+    The account of the session's credentials (one STS call per process).
+    """
+    if 'account' not in _account_ids:
+        _account_ids['account'] = get_client('sts').get_caller_identity()['Account']
+    return _account_ids['account']
+
+
+def add_client_hook(hook):
+    """
+    Call hook(client) for every client already built and every client built later (e.g. to register event handlers).
+    """
+    with _lock:
+        _client_hooks.append(hook)
+        for client in _clients.values():
+            hook(client)
+
+
+def client_stats():
+    with _lock:
+        return dict(_stats, clients=sorted(f"{service}:{region or 'default'}" for service, region in _clients))
+
+
+def reset_clients():
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _account_ids.clear()
+        _stats.update({'created': 0, 'reused': 0, 'construction_seconds': 0.0})
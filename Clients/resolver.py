@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from Clients.registry import account_id, get_client
+
+"""
+Name-to-ID Resolver
+: Builds a name -> ID index per resource type by walking every page of the list call, caches it with a TTL
+: (in memory, and optionally in a JSON file) and answers lookups from the index.
+: Create paths check the index first instead of relying on a failed create followed by an unpaginated list call.
+: CloudFront list calls for these types have no boto3 paginator, so the Marker/NextMarker loop is done here.
+: Each resource type has its own lock, so listing one type does not hold up lookups of another.
+: Cached indexes are keyed by account ID, so a cache file shared between profiles never returns another account's IDs.
+"""
+
+DEFAULT_TTL = 300
+
+
+def list_response_headers_policies():
+    cf_client = get_client('cloudfront')
+    marker = None
+    while True:
+        kwargs = {'Type': 'custom', 'Marker': marker} if marker else {'Type': 'custom'}
+        page = cf_client.list_response_headers_policies(**kwargs)['ResponseHeadersPolicyList']
+        for item in page.get('Items', []):
+            policy = item['ResponseHeadersPolicy']
+            yield policy['ResponseHeadersPolicyConfig']['Name'], policy['Id']
+        marker = page.get('NextMarker')
+        if not marker:
+            return
+
+
+def list_cache_policies():
+    cf_client = get_client('cloudfront')
+    marker = None
+    while True:
+        kwargs = {'Type': 'custom', 'Marker': marker} if marker else {'Type': 'custom'}
+        page = cf_client.list_cache_policies(**kwargs)['CachePolicyList']
+        for item in page.get('Items', []):
+            policy = item['CachePolicy']
+            yield policy['CachePolicyConfig']['Name'], policy['Id']
+        marker = page.get('NextMarker')
+        if not marker:
+            return
+
+
+def list_origin_access_controls():
+    cf_client = get_client('cloudfront')
+    marker = None
+    while True:
+        page = cf_client.list_origin_access_controls(**({'Marker': marker} if marker else {}))['OriginAccessControlList']
+        for item in page.get('Items', []):
+            yield item['Name'], item['Id']
+        marker = page.get('NextMarker')
+        if not marker:
+            return
+
+
+def list_hosted_zones():
+    paginator = get_client('route53').get_paginator('list_hosted_zones')
+    for page in paginator.paginate():
+        for zone in page['HostedZones']:
+            # Public zones win over private zones with the same name.
+            if not zone['Config'].get('PrivateZone'):
+                yield zone['Name'].rstrip('.'), zone['Id']
+
+
+LISTERS = {
+    'response_headers_policy': list_response_headers_policies,
+    'cache_policy': list_cache_policies,
+    'origin_access_control': list_origin_access_controls,
+    'hosted_zone': list_hosted_zones,
+}
+
+
+class NameResolver():
+    def __init__(self, ttl=DEFAULT_TTL, cache_file=None) -> None:
+        self.ttl = ttl
+        self.cache_file = cache_file
+        # Guards self.indexes, self.type_locks and the cache file; listing happens under the lock of its type.
+        self.lock = threading.Lock()
+        self.type_locks = {}
+        self.indexes = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file) as file:
+                self.indexes = json.load(file)
+
+    def normalize(self, resource_type, name):
+        return name.rstrip('.').lower() if resource_type == 'hosted_zone' else name
+
+    def cache_key(self, resource_type):
+        return f'{account_id()}/{resource_type}'
+
+    def save(self):
+        # Called with self.lock held.
+        if self.cache_file:
+            temp_path = f'{self.cache_file}.tmp'
+            with open(temp_path, 'w') as file:
+                json.dump(self.indexes, file)
+            os.replace(temp_path, self.cache_file)
+
+    def type_lock(self, resource_type):
+        with self.lock:
+            return self.type_locks.setdefault(resource_type, threading.Lock())
+
+    def index(self, resource_type, refresh=False):
+        key = self.cache_key(resource_type)
+        with self.type_lock(resource_type):
+            with self.lock:
+                cached = self.indexes.get(key)
+            if cached and not refresh and cached['expires'] > time.time():
+                return cached['names']
+            names = {}
+            for name, resource_id in LISTERS[resource_type]():
+                names.setdefault(self.normalize(resource_type, name), resource_id)
+            with self.lock:
+                self.indexes[key] = {'expires': time.time() + self.ttl, 'names': names}
+                self.save()
+            return names
+
+    def lookup(self, resource_type, name, refresh=False):
+        return self.index(resource_type, refresh).get(self.normalize(resource_type, name))
+
+    def remember(self, resource_type, name, resource_id):
+        key = self.cache_key(resource_type)
+        with self.lock:
+            cached = self.indexes.get(key)
+            if cached:
+                cached['names'][self.normalize(resource_type, name)] = resource_id
+                self.save()
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = NameResolver()
+        return _resolver
+
+
+def configure_resolver(ttl=DEFAULT_TTL, cache_file=None):
+    global _resolver
+    with _resolver_lock:
+        _resolver = NameResolver(ttl, cache_file)
+        return _resolver
@@ -0,0 +1,106 @@
+import threading
+import time
+
+"""
+Client-side Rate Limiting
+: A token bucket per (service, region) - per operation where the service documents per-operation quotas - is drawn
+: from before every attempt is sent, so concurrent steps and sites share the allowed rate instead of being throttled.
+: Throttling responses are still retried by botocore's adaptive retry mode (exponential backoff with jitter plus
+: its own client-side rate adjustment), configured in Clients.registry.
+: Quotas (requests per second):
+:   Route 53: 5 per account  https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/DNSLimitations.html#limits-api-requests
+:   ACM: per operation       https://docs.aws.amazon.com/acm/latest/userguide/acm-limits.html#api-rate-limits
+:   CloudFront, CodePipeline: conservative defaults, the control planes are low-rate.
+"""
+
+RETRY_CONFIG = {'mode': 'adaptive', 'max_attempts': 10}
+
+# service: (requests per second, burst); None means no client-side limit (e.g. S3 data plane).
+SERVICE_LIMITS = {
+    'route53': (5, 5),
+    'cloudfront': (5, 5),
+    'acm': (10, 10),
+    'codepipeline': (5, 5),
+    's3': None,
+    'sts': None,
+}
+OPERATION_LIMITS = {
+    ('acm', 'RequestCertificate'): (5, 5),
+    ('acm', 'DescribeCertificate'): (10, 10),
+    ('acm', 'ListCertificates'): (8, 8),
+    ('acm', 'DeleteCertificate'): (10, 10),
+}
+THROTTLING_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException', 'TooManyRequestsException',
+    'RequestLimitExceeded', 'PriorRequestNotComplete', 'RequestThrottled', 'SlowDown'
+}
+
+
+class TokenBucket():
+    def __init__(self, rate, burst) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'waited_seconds': 0.0, 'throttled': 0}
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.stats['requests'] += 1
+            self.stats['waited_seconds'] += wait
+        # Sleeping outside the lock: the negative balance already reserves this caller's slot.
+        if wait:
+            time.sleep(wait)
+
+
+_lock = threading.Lock()
+_buckets = {}
+
+
+def get_bucket(service, region, operation):
+    if (service, operation) in OPERATION_LIMITS:
+        key, limit = (service, region, operation), OPERATION_LIMITS[(service, operation)]
+    else:
+        key, limit = (service, region, None), SERVICE_LIMITS.get(service, (10, 10))
+    if limit is None:
+        return None
+    with _lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(*limit)
+        return _buckets[key]
+
+
+def attach(client, region_name=None):
+    service = client.meta.service_model.service_name
+    # Route 53 and CloudFront are global; their quota is per account, not per region.
+    region = None if service in ('route53', 'cloudfront') else region_name
+
+    def before_send(event_name, **kwargs):
+        bucket = get_bucket(service, region, event_name.rsplit('.', 1)[-1])
+        if bucket:
+            bucket.acquire()
+
+    def needs_retry(event_name, response=None, **kwargs):
+        if response and response[1].get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            bucket = get_bucket(service, region, event_name.rsplit('.', 1)[-1])
+            if bucket:
+                with bucket.lock:
+                    bucket.stats['throttled'] += 1
+        return None
+
+    client.meta.events.register('before-send.*.*', before_send, unique_id='throttle-before-send')
+    client.meta.events.register('needs-retry.*.*', needs_retry, unique_id='throttle-needs-retry')
+
+
+def throttle_stats():
+    with _lock:
+        return {
+            ':'.join(part or '-' for part in key): dict(bucket.stats, rate=bucket.rate)
+            for key, bucket in _buckets.items()
+        }
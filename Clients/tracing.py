@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from Clients.throttle import THROTTLING_ERROR_CODES
+
+"""
+Per-API-Call Tracing
+: Hooks botocore's event system on every client built by Clients.registry and records, for each API call:
+: service, operation, provisioning step, latency, attempts (retries), throttles and request/response payload size.
+: The step is set per thread with `with traced_step('s3_bucket'):`; the task graph does this for every step.
+: Export as Chrome trace-event JSON (open in chrome://tracing or https://ui.perfetto.dev) or as a summary table.
+: https://boto3.amazonaws.com/v1/documentation/api/latest/guide/events.html
+"""
+
+
+_local = threading.local()
+
+
+def current_step():
+    return getattr(_local, 'step', None)
+
+
+class Tracer():
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.calls = []
+        self.steps = []
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def attach(self, client):
+        events = client.meta.events
+        service = client.meta.service_model.service_name
+        events.register('before-call.*.*', self.before_call, unique_id=f'tracing-before-call-{service}')
+        events.register('request-created.*.*', self.request_created, unique_id=f'tracing-request-created-{service}')
+        events.register('needs-retry.*.*', self.needs_retry, unique_id=f'tracing-needs-retry-{service}')
+        events.register('after-call.*.*', self.after_call, unique_id=f'tracing-after-call-{service}')
+        events.register('after-call-error.*.*', self.after_call_error, unique_id=f'tracing-after-call-error-{service}')
+
+    def before_call(self, model, context, **kwargs):
+        context['trace'] = {
+            'service': model.service_model.service_name,
+            'operation': model.name,
+            'step': current_step() or '-',
+            'thread': threading.get_ident(),
+            'start_us': self.now_us(),
+            'attempts': 0,
+            'throttles': 0,
+            'request_bytes': 0,
+            'response_bytes': 0,
+            'error': None
+        }
+
+    def request_created(self, request, **kwargs):
+        record = getattr(request, 'context', {}).get('trace')
+        if record is None:
+            return
+        record['attempts'] += 1
+        if isinstance(request.data, (bytes, str)):
+            record['request_bytes'] += len(request.data)
+
+    def needs_retry(self, response=None, request_dict=None, **kwargs):
+        record = (request_dict or {}).get('context', {}).get('trace')
+        if record is None or not response:
+            return None
+        if response[1].get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            record['throttles'] += 1
+        return None
+
+    def finish(self, record):
+        record['duration_us'] = self.now_us() - record['start_us']
+        with self.lock:
+            self.calls.append(record)
+
+    def after_call(self, http_response, context, **kwargs):
+        record = context.get('trace')
+        if record is None:
+            return
+        record['response_bytes'] = len(http_response.content or b'') if http_response is not None else 0
+        if http_response is not None and http_response.status_code >= 300:
+            record['error'] = str(http_response.status_code)
+        self.finish(record)
+
+    def after_call_error(self, exception, context, **kwargs):
+        record = context.get('trace')
+        if record is None:
+            return
+        record['error'] = type(exception).__name__
+        self.finish(record)
+
+    def record_step(self, name, start_us):
+        with self.lock:
+            self.steps.append({
+                'step': name, 'thread': threading.get_ident(), 'start_us': start_us, 'duration_us': self.now_us() - start_us
+            })
+
+    def chrome_trace(self):
+        events = []
+        for step in self.steps:
+            events.append({
+                'name': step['step'], 'cat': 'step', 'ph': 'X', 'pid': 1, 'tid': step['thread'],
+                'ts': step['start_us'], 'dur': step['duration_us']
+            })
+        for call in self.calls:
+            events.append({
+                'name': f"{call['service']}.{call['operation']}", 'cat': call['step'], 'ph': 'X', 'pid': 1,
+                'tid': call['thread'], 'ts': call['start_us'], 'dur': call['duration_us'],
+                'args': {key: call[key] for key in ('step', 'attempts', 'throttles', 'request_bytes', 'response_bytes', 'error')}
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+    def summary(self):
+        rows = {}
+        for call in self.calls:
+            key = (call['step'], call['service'], call['operation'])
+            row = rows.setdefault(key, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'retries': 0, 'throttles': 0, 'bytes': 0, 'errors': 0})
+            duration_ms = call['duration_us'] / 1000
+            row['calls'] += 1
+            row['total_ms'] += duration_ms
+            row['max_ms'] = max(row['max_ms'], duration_ms)
+            row['retries'] += max(call['attempts'] - 1, 0)
+            row['throttles'] += call['throttles']
+            row['bytes'] += call['request_bytes'] + call['response_bytes']
+            row['errors'] += 1 if call['error'] else 0
+        return sorted(((key, row) for key, row in rows.items()), key=lambda item: item[1]['total_ms'], reverse=True)
+
+    def print_summary(self):
+        print(f"{'Step':<22} {'Operation':<42} {'Calls':>5} {'Total ms':>10} {'Max ms':>9} {'Retries':>7} {'Throttles':>9} {'Bytes':>9} {'Errors':>6}")
+        for (step, service, operation), row in self.summary():
+            print(f"{step:<22} {service + '.' + operation:<42} {row['calls']:>5} {row['total_ms']:>10.1f} {row['max_ms']:>9.1f} "
+                  f"{row['retries']:>7} {row['throttles']:>9} {row['bytes']:>9} {row['errors']:>6}")
+        for step in sorted(self.steps, key=lambda step: step['duration_us'], reverse=True):
+            print(f"step {step['step']}: {step['duration_us'] / 1e6:.1f}s")
+
+
+_tracer = None
+
+
+def enable_tracing():
+    """
+    Start tracing every client the registry has built or will build.
+    """
+    global _tracer
+    from Clients import registry
+    if _tracer is None:
+        _tracer = Tracer()
+        registry.add_client_hook(_tracer.attach)
+    return _tracer
+
+
+@contextmanager
+def traced_step(name):
+    previous = current_step()
+    _local.step = name
+    start_us = _tracer.now_us() if _tracer else None
+    try:
+        yield
+    finally:
+        _local.step = previous
+        if _tracer:
+            _tracer.record_step(name, start_us)
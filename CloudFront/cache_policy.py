@@ -0,0 +1,68 @@
+from Clients.registry import get_client
+from Clients.resolver import get_resolver
+
+"""
+CloudFront Cache Policies
+: Creates (or looks up) tuned cache policies to replace the managed CachingDisabled policy.
+:   - html: short default TTL. CloudFront honors a longer Cache-Control max-age from the origin up to MaxTTL,
+:     so fingerprinted assets uploaded with `immutable` (Assets.fingerprint) are still cached for a year.
+:   - assets: long TTLs for path patterns that only serve content-hashed file names.
+: Other TTLs (e.g. per path pattern in distribution_data['cache_behaviors']) get a policy named after them, so
+: behaviors with the same TTLs share one policy.
+: Gzip and brotli are part of the cache key so CloudFront can cache and serve compressed variants.
+: https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/controlling-the-cache-key.html
+"""
+
+ONE_YEAR = 31536000
+
+CACHE_POLICIES = {
+    'html': {'MinTTL': 0, 'DefaultTTL': 60, 'MaxTTL': ONE_YEAR},
+    'assets': {'MinTTL': 86400, 'DefaultTTL': ONE_YEAR, 'MaxTTL': ONE_YEAR},
+}
+
+
+class CachePolicyManager():
+    def __init__(self, name_prefix='StaticSite') -> None:
+        self.cf_client = get_client('cloudfront')
+        self.name_prefix = name_prefix
+
+    def policy_name(self, kind):
+        return f'{self.name_prefix}-{kind}'
+
+    def policy_config(self, name, ttls, comment):
+        return {
+            'Name': name,
+            'Comment': comment,
+            'MinTTL': ttls['MinTTL'],
+            'DefaultTTL': ttls['DefaultTTL'],
+            'MaxTTL': ttls['MaxTTL'],
+            'ParametersInCacheKeyAndForwardedToOrigin': {
+                'EnableAcceptEncodingGzip': True,
+                'EnableAcceptEncodingBrotli': True,
+                'HeadersConfig': {'HeaderBehavior': 'none'},
+                'CookiesConfig': {'CookieBehavior': 'none'},
+                'QueryStringsConfig': {'QueryStringBehavior': 'none'}
+            }
+        }
+
+    def create_policy(self, name, ttls, comment=None):
+        resolver = get_resolver()
+        policy_id = resolver.lookup('cache_policy', name)
+        if policy_id:
+            return policy_id
+        try:
+            response = self.cf_client.create_cache_policy(
+                CachePolicyConfig=self.policy_config(name, ttls, comment or f'Cache policy {name}')
+            )
+            print(f"Created Cache Policy {name}: {response['CachePolicy']['Id']}")
+            resolver.remember('cache_policy', name, response['CachePolicy']['Id'])
+            return response['CachePolicy']['Id']
+        except self.cf_client.exceptions.CachePolicyAlreadyExists as e:
+            return resolver.lookup('cache_policy', name, refresh=True)
+
+    def get_policy_id(self, kind):
+        return self.create_policy(self.policy_name(kind), CACHE_POLICIES[kind], f'{kind} cache policy for static websites')
+
+    def get_ttl_policy_id(self, min_ttl, default_ttl, max_ttl):
+        ttls = {'MinTTL': min_ttl, 'DefaultTTL': default_ttl, 'MaxTTL': max_ttl}
+        return self.create_policy(self.policy_name(f'ttl-{min_ttl}-{default_ttl}-{max_ttl}'), ttls)
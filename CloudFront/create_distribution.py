@@ -1,14 +1,37 @@
-import boto3
-#from create_response_header_policy import ResponseHeaderPolicy
-import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+import botocore.exceptions
 
-sys.path.append('codepipeline-resume-website/')
+from CloudFront.cache_policy import CachePolicyManager
 from CloudFront.create_response_header_policy import ResponseHeaderPolicy
+from CloudFront.origin_access_control import OriginAccessControl
+from Clients.registry import get_client
+
+"""
+Distribution Definition
+: Built from distribution_data. Besides the required keys (cname, root_object, domain_id, cache_policy_id, comment,
+: certificate_arn) it accepts:
+:   cache_behaviors: ordered list, evaluated top to bottom by CloudFront, of
+:     {'path_pattern': 'images/*', 'cache_policy_id': ...            # or
+:      'cache_policy': 'assets',                                     # a CachePolicyManager kind, or
+:      'ttl': {'min': 0, 'default': 86400, 'max': 31536000},         # a policy created for these TTLs
+:      'compress': True, 'viewer_protocol_policy': 'redirect-to-https'}
+:   compress: compression of the default behavior (default True)
+:   origin_shield_region: enables Origin Shield in that region, ideally the bucket's region
+:   http_version: default 'http2and3'; price_class: default 'PriceClass_100'
+: A rerun with changed distribution_data updates the existing distribution (get_distribution_config for the ETag, then
+: update_distribution) instead of creating a second one.
+: https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/origin-shield.html
+"""
+
+DEFAULT_HTTP_VERSION = 'http2and3'
+DEFAULT_PRICE_CLASS = 'PriceClass_100'
+
+_waiter_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cloudfront-deployed')
 
 class CloudFrontDistribution():
     def __init__(self, distribution_data) -> None:
-        self.cf_client = boto3.client('cloudfront')
+        self.cf_client = get_client('cloudfront')
         self.header_policy = ResponseHeaderPolicy()
         self.header_policy_id = self.header_policy.create_header_policy()
         self.cname = distribution_data['cname']
@@ -17,9 +40,57 @@ class CloudFrontDistribution():
         self.cache_policy_id = distribution_data['cache_policy_id']
         self.comment = distribution_data['comment']
         self.certificate_arn = distribution_data['certificate_arn']
+        self.cache_behaviors = distribution_data.get('cache_behaviors', [])
+        self.compress = distribution_data.get('compress', True)
+        self.origin_shield_region = distribution_data.get('origin_shield_region')
+        self.http_version = distribution_data.get('http_version', DEFAULT_HTTP_VERSION)
+        self.price_class = distribution_data.get('price_class', DEFAULT_PRICE_CLASS)
+        # Standard logging to an S3 bucket (see CloudFront.logs.prepare_log_bucket).
+        self.log_bucket = distribution_data.get('log_bucket')
+        self.log_prefix = distribution_data.get('log_prefix', '')
+        # The OAC is attached when the distribution is created, so it is deployed once in its final form.
+        self.origin_access_control_id = distribution_data.get('origin_access_control_id')
+        if not self.origin_access_control_id:
+            oac_name = distribution_data.get('origin_access_control_name', self.domain_id.split('.s3.')[0])
+            self.origin_access_control_id = OriginAccessControl(oac_name).create_originacess()
+
+    def behavior_cache_policy_id(self, behavior):
+        if behavior.get('cache_policy_id'):
+            return behavior['cache_policy_id']
+        if behavior.get('cache_policy'):
+            return CachePolicyManager().get_policy_id(behavior['cache_policy'])
+        if behavior.get('ttl'):
+            ttl = behavior['ttl']
+            return CachePolicyManager().get_ttl_policy_id(ttl.get('min', 0), ttl['default'], ttl.get('max', ttl['default']))
+        return self.cache_policy_id
+
+    def cache_behavior_items(self):
+        return [
+            {
+                'PathPattern': behavior['path_pattern'],
+                'TargetOriginId': self.domain_id,
+                'ViewerProtocolPolicy': behavior.get('viewer_protocol_policy', 'redirect-to-https'),
+                'Compress': behavior.get('compress', True),
+                'CachePolicyId': self.behavior_cache_policy_id(behavior),
+                'ResponseHeadersPolicyId': self.header_policy_id,
+            }
+            for behavior in self.cache_behaviors
+        ]
 
+    def origin(self):
+        origin = {
+            'Id': self.domain_id, # Use this value to specify the TargetOriginId in a CacheBehavior or DefaultCacheBehavior.
+            'DomainName': self.domain_id, # https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/distribution-web-values-specify.html#DownloadDistValuesDomainName
+            'OriginAccessControlId': self.origin_access_control_id, # Resolved or created before the distribution (no second deployment)
+            'S3OriginConfig': {
+                'OriginAccessIdentity': ''
+            },
+        }
+        if self.origin_shield_region:
+            origin['OriginShield'] = {'Enabled': True, 'OriginShieldRegion': self.origin_shield_region}
+        return origin
 
-    def create_distribution(self):
+    def distribution_config(self, caller_reference):
         """
         Important!
         If you add a CNAME for www.example.com to your distribution (Aliases, check distribution_definition), you also must do the following:
@@ -28,7 +99,7 @@ class CloudFrontDistribution():
         """
 
         distribution_definition = {
-            'CallerReference': str(time.time()),
+            'CallerReference': caller_reference,
             'Aliases': {
                 'Quantity': len(self.cname),
                 'Items': self.cname
@@ -36,27 +107,22 @@ class CloudFrontDistribution():
             'DefaultRootObject': self.root_object,
             'Origins': {
                 'Quantity': 1,
-                'Items': [
-                    {
-                        'Id': self.domain_id, # Use this value to specify the TargetOriginId in a CacheBehavior or DefaultCacheBehavior.
-                        'DomainName': self.domain_id, # https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/distribution-web-values-specify.html#DownloadDistValuesDomainName
-                        'OriginAccessControlId': '', # Update this distribution after creating OriginAccessControl 
-                        'S3OriginConfig': {
-                            'OriginAccessIdentity': ''
-                        },
-                    },
-                ]
+                'Items': [self.origin()]
             },
             
             'DefaultCacheBehavior': {
                 'TargetOriginId': self.domain_id,
                 'ViewerProtocolPolicy': 'redirect-to-https',
-                'Compress': True,
+                'Compress': self.compress,
                 'CachePolicyId': self.cache_policy_id, # CachingDisabled https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/using-managed-cache-policies.html
                 'ResponseHeadersPolicyId': self.header_policy_id,
             },
+            'CacheBehaviors': {
+                'Quantity': len(self.cache_behaviors),
+                'Items': self.cache_behavior_items()
+            },
             'Comment': self.comment, # Describe distribution
-            'PriceClass': 'PriceClass_100',
+            'PriceClass': self.price_class,
             'Enabled': True, #  enable or disable the selected distribution.
             'ViewerCertificate': {
                 'CloudFrontDefaultCertificate': False,
@@ -64,10 +130,27 @@ class CloudFrontDistribution():
                 'SSLSupportMethod': 'sni-only',
                 'MinimumProtocolVersion': 'TLSv1.2_2021',
             },
-            'HttpVersion': 'http2'
+            'HttpVersion': self.http_version
         }
+        if self.log_bucket:
+            distribution_definition['Logging'] = {
+                'Enabled': True,
+                'IncludeCookies': False,
+                'Bucket': self.log_bucket if self.log_bucket.endswith('.amazonaws.com') else f'{self.log_bucket}.s3.amazonaws.com',
+                'Prefix': self.log_prefix
+            }
+        return distribution_definition
+
+    def create_distribution(self, distribution_id=None):
+        """
+        Creates the distribution, or updates it when it already exists: distribution_id is the one recorded by an earlier
+        run, and a distribution that already uses the CNAMEs is found by its aliases.
+        Returns (id, arn, domain name), or None when the distribution could not be created or updated.
+        """
+        if distribution_id:
+            return self.update_distribution(distribution_id)
         try:
-            response = self.cf_client.create_distribution(DistributionConfig=distribution_definition)
+            response = self.cf_client.create_distribution(DistributionConfig=self.distribution_config(str(time.time())))
             self.response_id = response['Distribution']['Id']
             self.response_arn = response['Distribution']['ARN']
             self.response_domain = response['Distribution']['DomainName']
@@ -75,4 +158,73 @@ class CloudFrontDistribution():
             return (self.response_id, self.response_arn, self.response_domain)
         
         except self.cf_client.exceptions.DistributionAlreadyExists as e:
-            print(e)
\ No newline at end of file
+            print(e)
+        except self.cf_client.exceptions.CNAMEAlreadyExists as e:
+            print(f"CNAMEs already in use. {e}")
+            distribution_id = self.find_distribution_id()
+            if distribution_id:
+                return self.update_distribution(distribution_id)
+        except botocore.exceptions.ClientError as e:
+            print(f"Error creating the distribution. {e}")
+
+    def find_distribution_id(self):
+        """
+        The distribution in this account whose aliases include the first CNAME, if any.
+        """
+        try:
+            paginator = self.cf_client.get_paginator('list_distributions')
+            for page in paginator.paginate():
+                for summary in page['DistributionList'].get('Items', []):
+                    if self.cname[0] in summary.get('Aliases', {}).get('Items', []):
+                        return summary['Id']
+        except botocore.exceptions.ClientError as e:
+            print(f"Error listing distributions. {e}")
+            return None
+        print(f"No distribution of this account uses {self.cname[0]}.")
+
+    def update_distribution(self, distribution_id):
+        """
+        Applies distribution_data to an existing distribution. The update needs the current ETag, and the
+        CallerReference cannot change.
+        """
+        try:
+            current = self.cf_client.get_distribution_config(Id=distribution_id)
+            caller_reference = current['DistributionConfig']['CallerReference']
+            response = self.cf_client.update_distribution(
+                Id=distribution_id,
+                IfMatch=current['ETag'],
+                DistributionConfig=self.distribution_config(caller_reference)
+            )
+        except self.cf_client.exceptions.NoSuchDistribution as e:
+            print(f"Distribution {distribution_id} no longer exists, creating a new one. {e}")
+            return self.create_distribution()
+        except botocore.exceptions.ClientError as e:
+            print(f"Error updating the distribution {distribution_id}. {e}")
+            return None
+        self.response_id = response['Distribution']['Id']
+        self.response_arn = response['Distribution']['ARN']
+        self.response_domain = response['Distribution']['DomainName']
+        print(f"CloudFront Distribution updated. ARN - {self.response_arn}")
+        return (self.response_id, self.response_arn, self.response_domain)
+
+
+def wait_deployed(distribution_id, on_progress=None, delay=20, timeout=3600):
+    """
+    Returns a Future right away; it resolves to True once the distribution status is Deployed (False on timeout).
+    on_progress(status, elapsed_seconds) is called after every poll.
+    """
+    cf_client = get_client('cloudfront')
+
+    def poll():
+        start = time.monotonic()
+        while True:
+            status = cf_client.get_distribution(Id=distribution_id)['Distribution']['Status']
+            elapsed = time.monotonic() - start
+            if on_progress:
+                on_progress(status, elapsed)
+            if status == 'Deployed':
+                return True
+            if elapsed + delay > timeout:
+                return False
+            time.sleep(delay)
+    return _waiter_pool.submit(poll)
@@ -1,4 +1,5 @@
-import boto3
+from Clients.registry import get_client
+from Clients.resolver import get_resolver
 
 """
 Create Response Header Policy
@@ -7,15 +8,20 @@ Create Response Header Policy
 """
 
 class ResponseHeaderPolicy():
-    def __init__(self) -> None:
-        self.cf_client = boto3.client('cloudfront')
+    def __init__(self, policy_name='MyHeaderPolicy') -> None:
+        self.cf_client = get_client('cloudfront')
+        self.policy_name = policy_name
 
     def create_header_policy(self):
+        resolver = get_resolver()
+        policy_id = resolver.lookup('response_headers_policy', self.policy_name)
+        if policy_id:
+            return policy_id
         try:
             response = self.cf_client.create_response_headers_policy(
                 ResponseHeadersPolicyConfig={
                     'Comment': 'Custom response header policy for my cloudfront distribution.',
-                    'Name': 'MyHeaderPolicy',
+                    'Name': self.policy_name,
                     'CorsConfig': {
                         'AccessControlAllowOrigins': {
                             'Quantity': 1,
@@ -47,12 +53,8 @@ class ResponseHeaderPolicy():
                     },     
                 }
             )
+            resolver.remember('response_headers_policy', self.policy_name, response['ResponseHeadersPolicy']['Id'])
             return response['ResponseHeadersPolicy']['Id']
         except self.cf_client.exceptions.ResponseHeadersPolicyAlreadyExists as e:
-            response = self.cf_client.list_response_headers_policies(
-                Type= 'custom'
-            )
-            response_items = response['ResponseHeadersPolicyList']['Items']
-            for item in response_items:
-                if item['ResponseHeadersPolicy']['ResponseHeadersPolicyConfig']['Name'] == 'MyHeaderPolicy':
-                    return item['ResponseHeadersPolicy']['Id']
\ No newline at end of file
+            # Created by someone else after the index was built.
+            return resolver.lookup('response_headers_policy', self.policy_name, refresh=True)
\ No newline at end of file
@@ -0,0 +1,218 @@
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import quote
+import botocore.exceptions
+from Clients.registry import get_client
+
+"""
+CloudFront Invalidation Coalescer
+: Turns the object keys changed by a deploy (Bucket.sync / Assets.compress results) into a small set of invalidation
+: paths. A directory becomes '/dir/*' when at least `min_files` of its files changed and - when the full key list is
+: known - at least `min_fraction` of them, so a wildcard only replaces paths that would have been invalidated anyway.
+: Paths are then collapsed further until they fit what the distribution still allows in progress:
+:   3,000 file paths and 15 wildcard paths per distribution
+: https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/cloudfront-limits.html#limits-invalidations
+: InvalidationQueue merges requests that arrive within `delay` seconds (back-to-back deploys, fleet runs) into one
+: invalidation, waits for room when the limits are reached and polls the submitted invalidation. Keys whose paths an
+: in-progress invalidation already covers (same path or a wildcard over it) are not invalidated again; the request then
+: also waits for that invalidation to complete.
+: Every flush runs on its own daemon thread: polling can take up to `timeout` (30 minutes), and a fixed-size pool
+: would make the distributions of a fleet wait for each other.
+"""
+
+MAX_IN_PROGRESS_PATHS = 3000
+MAX_IN_PROGRESS_WILDCARDS = 15
+
+
+def object_paths(keys):
+    paths = set()
+    for key in keys:
+        paths.add('/' + quote(key, safe="/-_.~"))
+        # The default root object is also served as '/'.
+        if key == 'index.html':
+            paths.add('/')
+    return paths
+
+
+def parent_dirs(path):
+    """
+    '/a/b/c.css' -> ['/', '/a/', '/a/b/']; a wildcard '/a/b/*' -> ['/', '/a/'].
+    """
+    parts = path.rstrip('*').split('/')[1:-1] if path.endswith('*') else path.split('/')[1:-1]
+    return ['/' + ''.join(part + '/' for part in parts[:depth]) for depth in range(len(parts) + 1)]
+
+
+def collapse(paths, directory):
+    under = {path for path in paths if path.startswith(directory) and path != directory + '*'}
+    return (paths - under) | {directory + '*'}
+
+
+def covered(path, in_progress_paths):
+    # '/a/*' covers '/a/b.css' and '/a/b/c.css'; '/*' covers everything.
+    return path in in_progress_paths or any(
+        other.endswith('*') and path.startswith(other[:-1]) for other in in_progress_paths
+    )
+
+
+def count(paths):
+    wildcards = sum(1 for path in paths if path.endswith('*'))
+    return len(paths) - wildcards, wildcards
+
+
+def coalesce_paths(keys, all_keys=None, max_paths=MAX_IN_PROGRESS_PATHS, max_wildcards=MAX_IN_PROGRESS_WILDCARDS,
+                   min_files=5, min_fraction=0.5):
+    """
+    Returns the sorted invalidation paths for the changed keys, or None when they cannot fit the given limits.
+    """
+    paths = object_paths(keys)
+    changed, total = {}, {}
+    for path in paths:
+        for directory in parent_dirs(path):
+            changed[directory] = changed.get(directory, 0) + 1
+    for path in object_paths(all_keys or ()):
+        for directory in parent_dirs(path):
+            total[directory] = total.get(directory, 0) + 1
+
+    # Deepest directories first, so a parent decides on counts that already include its children.
+    for directory in sorted(changed, key=lambda directory: directory.count('/'), reverse=True):
+        if changed[directory] < min_files or directory == '/':
+            continue
+        if all_keys is not None and changed[directory] < min_fraction * total.get(directory, changed[directory]):
+            continue
+        if count(paths)[1] < max_wildcards or any(path.startswith(directory) and path.endswith('*') for path in paths):
+            paths = collapse(paths, directory)
+
+    # Over the limits: collapse the directory that fixes the excess while covering the fewest files.
+    while True:
+        files, wildcards = count(paths)
+        excess_files, excess_wildcards = files - max_paths, wildcards - max_wildcards
+        if excess_files <= 0 and excess_wildcards <= 0:
+            return sorted(paths)
+        if max_wildcards < 1:
+            return None
+        candidates = []
+        for directory in {directory for path in paths for directory in parent_dirs(path)}:
+            after_files, after_wildcards = count(collapse(paths, directory))
+            candidates.append((after_files <= max_paths and after_wildcards <= max_wildcards,
+                               files - after_files + wildcards - after_wildcards, directory))
+        fitting = [candidate for candidate in candidates if candidate[0]]
+        if fitting:
+            # Smallest subtree that is enough on its own.
+            directory = min(fitting, key=lambda candidate: (total.get(candidate[2], changed.get(candidate[2], 0)), -candidate[2].count('/')))[2]
+        else:
+            directory = max(candidates, key=lambda candidate: (candidate[1], candidate[2].count('/')))[2]
+        paths = collapse(paths, directory)
+
+
+class InvalidationQueue():
+    def __init__(self, distribution_id, delay=2.0, poll_delay=20, timeout=1800) -> None:
+        self.cf_client = get_client('cloudfront')
+        self.distribution_id = distribution_id
+        self.delay = delay
+        self.poll_delay = poll_delay
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pending_keys = set()
+        self.all_keys = None
+        self.pending_future = None
+
+    def in_progress_invalidations(self):
+        """
+        {invalidation id: set of paths} of the distribution's invalidations that are still in progress.
+        """
+        in_progress = {}
+        paginator = self.cf_client.get_paginator('list_invalidations')
+        for page in paginator.paginate(DistributionId=self.distribution_id):
+            for summary in page['InvalidationList'].get('Items', []):
+                if summary['Status'] != 'InProgress':
+                    continue
+                invalidation = self.cf_client.get_invalidation(DistributionId=self.distribution_id, Id=summary['Id'])
+                in_progress[summary['Id']] = set(invalidation['Invalidation']['InvalidationBatch']['Paths'].get('Items', []))
+        return in_progress
+
+    def request(self, keys, all_keys=None):
+        """
+        Queue changed keys for invalidation. Requests made before the queued ones are sent are merged into them.
+        Returns a Future that resolves to True once the invalidation covering these keys is completed.
+        """
+        with self.lock:
+            self.pending_keys.update(keys)
+            if all_keys is not None:
+                self.all_keys = (self.all_keys or set()) | set(all_keys)
+            if self.pending_future is None:
+                self.pending_future = Future()
+                threading.Thread(target=self.flush_after_delay, daemon=True, name='cloudfront-invalidation').start()
+            return self.pending_future
+
+    def flush_after_delay(self):
+        time.sleep(self.delay)
+        with self.lock:
+            keys, all_keys, future = self.pending_keys, self.all_keys, self.pending_future
+            self.pending_keys, self.all_keys, self.pending_future = set(), None, None
+        try:
+            future.set_result(self.submit(keys, all_keys))
+        except Exception as e:
+            future.set_exception(e)
+
+    def submit(self, keys, all_keys=None):
+        if not keys:
+            return True
+        deadline = time.monotonic() + self.timeout
+        while True:
+            in_progress = self.in_progress_invalidations()
+            # Keys an in-progress invalidation already covers are only waited for.
+            waiting_for = set()
+            remaining = set()
+            for key in keys:
+                covering = {
+                    invalidation_id for invalidation_id, in_progress_paths in in_progress.items()
+                    if all(covered(path, in_progress_paths) for path in object_paths([key]))
+                }
+                if covering:
+                    waiting_for.add(min(covering))
+                else:
+                    remaining.add(key)
+            if not remaining:
+                print(f'{self.distribution_id}: {len(keys)} changed keys are covered by invalidations in progress.')
+                return self.poll_all_completed(waiting_for)
+            usage = [count(in_progress_paths) for in_progress_paths in in_progress.values()]
+            files = sum(in_progress_files for in_progress_files, _ in usage)
+            wildcards = sum(in_progress_wildcards for _, in_progress_wildcards in usage)
+            paths = coalesce_paths(remaining, all_keys, MAX_IN_PROGRESS_PATHS - files, MAX_IN_PROGRESS_WILDCARDS - wildcards)
+            if paths is not None:
+                break
+            if time.monotonic() + self.poll_delay > deadline:
+                print(f'No room for another invalidation on {self.distribution_id} after {self.timeout}s.')
+                return False
+            print(f'{self.distribution_id}: {files} paths and {wildcards} wildcards in progress, waiting to invalidate.')
+            time.sleep(self.poll_delay)
+        try:
+            response = self.cf_client.create_invalidation(
+                DistributionId=self.distribution_id,
+                InvalidationBatch={
+                    'Paths': {'Quantity': len(paths), 'Items': paths},
+                    'CallerReference': str(time.time())
+                }
+            )
+        except botocore.exceptions.ClientError as e:
+            print(f'Error creating invalidation for {self.distribution_id}: {e}')
+            return False
+        invalidation_id = response['Invalidation']['Id']
+        print(f'Invalidation {invalidation_id}: {len(remaining)} changed keys as {len(paths)} paths'
+              + (f', {len(keys) - len(remaining)} covered by invalidations in progress.' if waiting_for else '.'))
+        # Already on the flush thread, so poll here.
+        return self.poll_all_completed(waiting_for | {invalidation_id})
+
+    def poll_completed(self, invalidation_id):
+        start = time.monotonic()
+        while True:
+            response = self.cf_client.get_invalidation(DistributionId=self.distribution_id, Id=invalidation_id)
+            if response['Invalidation']['Status'] == 'Completed':
+                return True
+            if time.monotonic() - start + self.poll_delay > self.timeout:
+                return False
+            time.sleep(self.poll_delay)
+
+    def poll_all_completed(self, invalidation_ids):
+        return all([self.poll_completed(invalidation_id) for invalidation_id in sorted(invalidation_ids)])
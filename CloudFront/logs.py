@@ -0,0 +1,272 @@
+import gzip
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+"""
+CloudFront Standard Logs
+: Logging is turned on per distribution with distribution_data['log_bucket'] (and optionally 'log_prefix');
+: prepare_log_bucket() creates that bucket with ACLs enabled (required for log delivery) and a lifecycle expiry.
+: https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/AccessLogs.html
+: LogAnalyzer streams the gzipped W3C log files line by line on a process pool, so memory stays bounded per worker,
+: and reports cache hit ratio, top missed URIs, bytes served, time-taken p50/p95/p99 and a
+: per-edge-location breakdown. Latencies go into a millisecond histogram, so results from many files merge exactly.
+: Totals and the names of processed files are kept in a checkpoint file, so a rerun only reads new logs. It is written
+: every CHECKPOINT_EVERY_FILES files or CHECKPOINT_SECONDS seconds and at the end. The file names stay bounded: per
+: location, a high-water hour taken from the log names (<distribution>.YYYY-MM-DD-HH.<id>.gz) covers every older file,
+: and only names from that hour on are kept. The mark trails the current time by LATE_DELIVERY_HOURS, since CloudFront
+: can deliver a log file hours after the requests in it.
+:   python main.py logs <log-dir or s3://bucket/prefix>
+"""
+
+DEFAULT_CHECKPOINT_FILE = '.cloudfront-logs.json'
+HIT_RESULT_TYPES = ('Hit', 'RefreshHit')
+MAX_TRACKED_URIS = 10000
+MAX_LATENCY_MS = 60000
+CHECKPOINT_EVERY_FILES = 100
+CHECKPOINT_SECONDS = 5
+LATE_DELIVERY_HOURS = 24
+LOG_NAME_HOUR = re.compile(r'\.(\d{4}-\d{2}-\d{2}-\d{2})\.[^./]+\.gz$')
+
+
+def prepare_log_bucket(bucket_name, region, expiration_days=90):
+    from Bucket.bucket import S3BucketManager
+    bucket_manager = S3BucketManager(bucket_name, region)
+    bucket_manager.create_bucket()
+    try:
+        # CloudFront delivers logs with an ACL grant, which buckets with BucketOwnerEnforced ownership reject.
+        bucket_manager.s3_client.put_bucket_ownership_controls(
+            Bucket=bucket_name,
+            OwnershipControls={'Rules': [{'ObjectOwnership': 'BucketOwnerPreferred'}]}
+        )
+    except Exception as e:
+        print(f'Error enabling ACLs on {bucket_name}: {e}')
+    bucket_manager.set_lifecycle_rules([
+        {
+            'ID': 'ExpireAccessLogs',
+            'Filter': {'Prefix': ''},
+            'Status': 'Enabled',
+            'Expiration': {'Days': expiration_days}
+        }
+    ])
+    return f'{bucket_name}.s3.amazonaws.com'
+
+
+def empty_totals():
+    return {'requests': 0, 'hits': 0, 'misses': 0, 'errors': 0, 'bytes': 0, 'latency_ms': {}, 'missed_uris': {}, 'edges': {}}
+
+
+def open_log(source):
+    if source.startswith('s3://'):
+        from Clients.registry import get_client
+        bucket, key = source[5:].split('/', 1)
+        body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body']
+        return gzip.open(body, 'rt', encoding='utf-8', errors='replace')
+    return gzip.open(source, 'rt', encoding='utf-8', errors='replace')
+
+
+def analyze_file(source):
+    """
+    Runs in a worker process. Returns the totals of one log file.
+    """
+    totals = empty_totals()
+    latency, missed, edges = Counter(), Counter(), {}
+    fields = {}
+    with open_log(source) as log:
+        for line in log:
+            if line.startswith('#Fields:'):
+                fields = {name: index for index, name in enumerate(line.split()[1:])}
+                continue
+            if line.startswith('#') or not fields:
+                continue
+            values = line.rstrip('\n').split('\t')
+            result_type = values[fields['x-edge-result-type']]
+            sent = int(values[fields['sc-bytes']]) if values[fields['sc-bytes']].isdigit() else 0
+            milliseconds = min(int(float(values[fields['time-taken']]) * 1000), MAX_LATENCY_MS)
+            edge = edges.setdefault(values[fields['x-edge-location']], {'requests': 0, 'hits': 0, 'misses': 0, 'bytes': 0, 'latency_ms': Counter()})
+            totals['requests'] += 1
+            totals['bytes'] += sent
+            edge['requests'] += 1
+            edge['bytes'] += sent
+            edge['latency_ms'][milliseconds] += 1
+            latency[milliseconds] += 1
+            if result_type in HIT_RESULT_TYPES:
+                totals['hits'] += 1
+                edge['hits'] += 1
+            elif result_type == 'Miss':
+                totals['misses'] += 1
+                edge['misses'] += 1
+                missed[values[fields['cs-uri-stem']]] += 1
+            elif result_type == 'Error':
+                totals['errors'] += 1
+    totals['latency_ms'] = dict(latency)
+    totals['missed_uris'] = dict(missed.most_common(MAX_TRACKED_URIS))
+    totals['edges'] = {name: dict(edge, latency_ms=dict(edge['latency_ms'])) for name, edge in edges.items()}
+    return totals
+
+
+def merge_counts(target, source):
+    for key, value in source.items():
+        # JSON turns the histogram keys into strings.
+        key = str(key)
+        target[key] = target.get(key, 0) + value
+
+
+def merge_totals(target, source):
+    for key in ('requests', 'hits', 'misses', 'errors', 'bytes'):
+        target[key] += source[key]
+    merge_counts(target['latency_ms'], source['latency_ms'])
+    merge_counts(target['missed_uris'], source['missed_uris'])
+    if len(target['missed_uris']) > MAX_TRACKED_URIS:
+        # Approximate beyond MAX_TRACKED_URIS distinct URIs: only the most missed ones are kept.
+        target['missed_uris'] = dict(Counter(target['missed_uris']).most_common(MAX_TRACKED_URIS))
+    for name, edge in source['edges'].items():
+        merged = target['edges'].setdefault(name, {'requests': 0, 'hits': 0, 'misses': 0, 'bytes': 0, 'latency_ms': {}})
+        for key in ('requests', 'hits', 'misses', 'bytes'):
+            merged[key] += edge[key]
+        merge_counts(merged['latency_ms'], edge['latency_ms'])
+
+
+def log_hour(source):
+    # 'E2EXAMPLE.2024-05-01-13.abcd1234.gz' -> '2024-05-01-13'; None for other names.
+    match = LOG_NAME_HOUR.search(source)
+    return match.group(1) if match else None
+
+
+def histogram_percentile(histogram, fraction):
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for milliseconds, count in sorted((int(key), value) for key, value in histogram.items()):
+        seen += count
+        if seen >= rank:
+            return milliseconds
+    return None
+
+
+class LogAnalyzer():
+    def __init__(self, checkpoint_file=DEFAULT_CHECKPOINT_FILE, max_workers=None) -> None:
+        self.checkpoint_file = checkpoint_file
+        self.max_workers = max_workers
+        self.checkpoint = {'processed': [], 'files': 0, 'high_water': {}, 'totals': empty_totals()}
+        if checkpoint_file and os.path.exists(checkpoint_file):
+            with open(checkpoint_file) as file:
+                self.checkpoint = json.load(file)
+            self.checkpoint.setdefault('files', len(self.checkpoint['processed']))
+            self.checkpoint.setdefault('high_water', {})
+
+    def save(self):
+        if not self.checkpoint_file:
+            return
+        temp_path = f'{self.checkpoint_file}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.checkpoint, file)
+        os.replace(temp_path, self.checkpoint_file)
+
+    def list_sources(self, location):
+        if location.startswith('s3://'):
+            from Clients.registry import get_client
+            bucket, _, prefix = location[5:].partition('/')
+            paginator = get_client('s3').get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                for item in page.get('Contents', []):
+                    if item['Key'].endswith('.gz'):
+                        yield f"s3://{bucket}/{item['Key']}"
+            return
+        for root, dirs, files in os.walk(location):
+            for name in sorted(files):
+                if name.endswith('.gz'):
+                    yield os.path.join(root, name)
+
+    def analyze(self, location):
+        """
+        Read every log file under location that is not in the checkpoint yet. Returns the number of files read.
+        """
+        processed = set(self.checkpoint['processed'])
+        high_water = self.checkpoint['high_water'].get(location)
+
+        def is_new(source):
+            hour = log_hour(source)
+            return not (high_water and hour and hour < high_water) and source not in processed
+
+        sources = [source for source in self.list_sources(location) if is_new(source)]
+        failed = []
+        unsaved, saved_at = 0, time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(analyze_file, source): source for source in sources}
+            for future in as_completed(futures):
+                try:
+                    totals = future.result()
+                except Exception as e:
+                    # Not checkpointed, so the file is read again next run.
+                    print(f'Error reading {futures[future]}: {e}')
+                    failed.append(futures[future])
+                    continue
+                merge_totals(self.checkpoint['totals'], totals)
+                self.checkpoint['processed'].append(futures[future])
+                self.checkpoint['files'] += 1
+                unsaved += 1
+                # Totals and names are saved together, so after a crash only the unsaved files are read again.
+                if unsaved >= CHECKPOINT_EVERY_FILES or time.monotonic() - saved_at >= CHECKPOINT_SECONDS:
+                    self.save()
+                    unsaved, saved_at = 0, time.monotonic()
+        self.advance_high_water(location, failed)
+        self.save()
+        return len(sources)
+
+    def advance_high_water(self, location, failed):
+        """
+        Move the location's high-water hour up to LATE_DELIVERY_HOURS ago (never past a file that failed) and drop the
+        processed names it now covers.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=LATE_DELIVERY_HOURS)).strftime('%Y-%m-%d-%H')
+        mark = min([cutoff] + [hour for hour in map(log_hour, failed) if hour])
+        mark = max(mark, self.checkpoint['high_water'].get(location) or mark)
+        self.checkpoint['high_water'][location] = mark
+        self.checkpoint['processed'] = [
+            source for source in self.checkpoint['processed']
+            if not (source.startswith(location) and log_hour(source) and log_hour(source) < mark)
+        ]
+
+    def report(self, top=10):
+        totals = self.checkpoint['totals']
+        cacheable = totals['hits'] + totals['misses']
+        report = {
+            'requests': totals['requests'],
+            'bytes': totals['bytes'],
+            'hit_ratio': totals['hits'] / cacheable if cacheable else None,
+            'errors': totals['errors'],
+            'latency_ms': {f'p{int(fraction * 100)}': histogram_percentile(totals['latency_ms'], fraction) for fraction in (0.5, 0.95, 0.99)},
+            'top_misses': Counter(totals['missed_uris']).most_common(top),
+            'edges': {}
+        }
+        for name, edge in sorted(totals['edges'].items(), key=lambda item: item[1]['requests'], reverse=True):
+            edge_cacheable = edge['hits'] + edge['misses']
+            report['edges'][name] = {
+                'requests': edge['requests'],
+                'hit_ratio': edge['hits'] / edge_cacheable if edge_cacheable else None,
+                'bytes': edge['bytes'],
+                'p95_ms': histogram_percentile(edge['latency_ms'], 0.95)
+            }
+        return report
+
+    def print_report(self, top=10, edges=10):
+        report = self.report(top)
+        hit_ratio = f"{report['hit_ratio']:.1%}" if report['hit_ratio'] is not None else '-'
+        print(f"{self.checkpoint['files']} log files, {report['requests']} requests, {report['bytes']} bytes, "
+              f"hit ratio {hit_ratio}, {report['errors']} errors")
+        latency = report['latency_ms']
+        print(f"time-taken p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+        print('Top missed URIs:')
+        for uri, count in report['top_misses']:
+            print(f'  {count:>8}  {uri}')
+        print(f"{'Edge location':<14} {'Requests':>9} {'Hit ratio':>9} {'Bytes':>12} {'p95 ms':>7}")
+        for name, edge in list(report['edges'].items())[:edges]:
+            edge_hit_ratio = f"{edge['hit_ratio']:.1%}" if edge['hit_ratio'] is not None else '-'
+            print(f"{name:<14} {edge['requests']:>9} {edge_hit_ratio:>9} {edge['bytes']:>12} {edge['p95_ms']:>7}")
@@ -1,19 +1,24 @@
-import boto3
+from Clients.registry import get_client
+from Clients.resolver import get_resolver
 
 """
 PREREQUISITES:
-Before you create and set up origin access control (OAC), you must have a CloudFront distribution (create_cloudfront.py) with an Amazon S3 bucket origin.
+The OAC is created (or resolved by name) before the CloudFront distribution (create_distribution.py) and attached to its Amazon S3 bucket origin.
 This origin must be a regular S3 bucket, not a bucket configured as a website endpoint.
 When you use OAC to secure your S3 bucket origin, communication between CloudFront and Amazon S3 is always through HTTPS, regardless of your specific settings.
 """
 
 
 class OriginAccessControl():
-    def __init__(self) -> None:
-        self.cf_client = boto3.client('cloudfront')
-        self.oac_name = "jd-espiritu.website"
+    def __init__(self, oac_name="jd-espiritu.website") -> None:
+        self.cf_client = get_client('cloudfront')
+        self.oac_name = oac_name
 
     def create_originacess(self):
+        resolver = get_resolver()
+        oac_id = resolver.lookup('origin_access_control', self.oac_name)
+        if oac_id:
+            return oac_id
         try:
             response = self.cf_client.create_origin_access_control(
                 OriginAccessControlConfig={
@@ -25,14 +30,9 @@ class OriginAccessControl():
                 }
             )
             print(f"Created Origin Access Control : {response['OriginAccessControl']['Id']}")
+            resolver.remember('origin_access_control', self.oac_name, response['OriginAccessControl']['Id'])
             return response['OriginAccessControl']['Id']
             
         except self.cf_client.exceptions.OriginAccessControlAlreadyExists as e:
-            if True:
-                # print(f"Origin Access Control Already Exists.")
-                response = self.cf_client.list_origin_access_controls()
-                for item in response['OriginAccessControlList']['Items']:
-                    if item['Name'] == self.oac_name:
-                        return item['Id']
-                    
-                
\ No newline at end of file
+            # Created by someone else after the index was built.
+            return resolver.lookup('origin_access_control', self.oac_name, refresh=True)
@@ -1,18 +1,17 @@
-import boto3
-import sys
-sys.path.append('codepipeline-resume-website/')
 from CloudFront.origin_access_control import OriginAccessControl
+from Clients.registry import get_client
 
 """
 Update CloudFront Distribution to attach Origin Access Control Id
+: Only needed for distributions created without an OAC; new distributions get the OAC at creation time.
 : https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudfront/client/update_distribution.html
 : https://docs.aws.amazon.com/cloudfront/latest/APIReference/API_UpdateDistribution.html
 """
 
 class DistributionConfig():
-    def __init__(self) -> None:
-        self.cf_client = boto3.client('cloudfront')
-        self.origin_access = OriginAccessControl()
+    def __init__(self, oac_name="jd-espiritu.website") -> None:
+        self.cf_client = get_client('cloudfront')
+        self.origin_access = OriginAccessControl(oac_name)
         self.origin_access_id = self.origin_access.create_originacess()
 
     def get_distribution_config(self, distribution_id):
@@ -27,7 +26,7 @@ class DistributionConfig():
     def update_distribution_config(self, distribution_id):
         self.response['IfMatch'] = self.response.pop('ETag')
         for item in self.response['DistributionConfig']['Origins']['Items']:
-            if item['OriginAccessControlId'] == '':
+            if not item.get('OriginAccessControlId'):
                 item['OriginAccessControlId'] = f"{self.origin_access_id}"
         self.response['Id'] = f"{distribution_id}"
         
@@ -0,0 +1,140 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import botocore.exceptions
+from Clients.registry import get_client
+
+"""
+Commit-to-Live Deploy Latency
+: Reads pipeline executions incrementally and records, per execution: time in the Source stage, time in the Deploy stage
+: and total time from start to the last action finishing.
+: list_pipeline_executions returns newest first, so paging stops at the first execution already seen (the stored cursor);
+: executions still InProgress are not recorded yet and are picked up again on the next run.
+: Reports p50/p95 over a time window from the stored history.
+: https://docs.aws.amazon.com/codepipeline/latest/APIReference/API_ListActionExecutions.html
+"""
+
+DEFAULT_HISTORY_FILE = '.deploy-latency.json'
+FINISHED_STATUSES = ('Succeeded', 'Failed', 'Stopped', 'Superseded', 'Cancelled')
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    index = fraction * (len(values) - 1)
+    lower = int(index)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (index - lower)
+
+
+class DeployLatencyTracker():
+    def __init__(self, pipeline_name, region, history_file=DEFAULT_HISTORY_FILE) -> None:
+        self.codepipeline_client = get_client('codepipeline', region)
+        self.pipeline_name = pipeline_name
+        self.history_file = history_file
+        self.history = {'cursor': None, 'executions': []}
+        if os.path.exists(history_file):
+            with open(history_file) as file:
+                self.history = json.load(file).get(pipeline_name, self.history)
+
+    def save(self):
+        data = {}
+        if os.path.exists(self.history_file):
+            with open(self.history_file) as file:
+                data = json.load(file)
+        data[self.pipeline_name] = self.history
+        temp_path = f'{self.history_file}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(data, file, indent=2)
+        os.replace(temp_path, self.history_file)
+
+    def new_executions(self):
+        """
+        Yield executions newer than the cursor, newest first.
+        """
+        paginator = self.codepipeline_client.get_paginator('list_pipeline_executions')
+        for page in paginator.paginate(pipelineName=self.pipeline_name):
+            for summary in page['pipelineExecutionSummaries']:
+                if summary['pipelineExecutionId'] == self.history['cursor']:
+                    return
+                yield summary
+
+    def stage_times(self, execution_id):
+        stages = {}
+        paginator = self.codepipeline_client.get_paginator('list_action_executions')
+        for page in paginator.paginate(pipelineName=self.pipeline_name, filter={'pipelineExecutionId': execution_id}):
+            for action in page['actionExecutionDetails']:
+                start, end = action.get('startTime'), action.get('lastUpdateTime')
+                if not start or not end:
+                    continue
+                stage = stages.setdefault(action['stageName'], [start, end])
+                stage[0], stage[1] = min(stage[0], start), max(stage[1], end)
+        return stages
+
+    def record(self, summary):
+        stages = self.stage_times(summary['pipelineExecutionId'])
+        if not stages:
+            return None
+        start = summary['startTime']
+        end = max(stage[1] for stage in stages.values())
+        source = stages.get('Source')
+        deploy = stages.get('Deploy')
+        return {
+            'id': summary['pipelineExecutionId'],
+            'status': summary['status'],
+            'start': start.timestamp(),
+            'commit': next((artifact.get('revisionId') for artifact in summary.get('sourceRevisions', [])), None),
+            'source_seconds': (source[1] - source[0]).total_seconds() if source else None,
+            'deploy_seconds': (deploy[1] - deploy[0]).total_seconds() if deploy else None,
+            'total_seconds': (end - start).total_seconds()
+        }
+
+    def update(self):
+        """
+        Fetch executions finished since the last update. Returns the number of executions added.
+        """
+        added = []
+        newest_finished = None
+        known = {execution['id'] for execution in self.history['executions']}
+        try:
+            for summary in self.new_executions():
+                if summary['status'] not in FINISHED_STATUSES:
+                    # The cursor must stay older than every unfinished execution so it is read again next time.
+                    newest_finished = None
+                    continue
+                newest_finished = newest_finished or summary['pipelineExecutionId']
+                if summary['pipelineExecutionId'] in known:
+                    continue
+                execution = self.record(summary)
+                if execution:
+                    added.append(execution)
+        except botocore.exceptions.ClientError as e:
+            print(f'Error reading executions of {self.pipeline_name}: {e}')
+            return 0
+        added.reverse()
+        self.history['executions'].extend(added)
+        if newest_finished:
+            self.history['cursor'] = newest_finished
+        self.save()
+        return len(added)
+
+    def report(self, days=7, status='Succeeded'):
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).timestamp()
+        executions = [execution for execution in self.history['executions']
+                      if execution['start'] >= since and (status is None or execution['status'] == status)]
+        report = {'executions': len(executions), 'window_days': days}
+        for metric in ('source_seconds', 'deploy_seconds', 'total_seconds'):
+            values = [execution[metric] for execution in executions if execution[metric] is not None]
+            report[metric] = {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95)}
+        return report
+
+    def print_report(self, days=7):
+        report = self.report(days)
+        print(f"{self.pipeline_name}: {report['executions']} succeeded executions in the last {days} days")
+        for metric in ('source_seconds', 'deploy_seconds', 'total_seconds'):
+            values = report[metric]
+            if values['p50'] is None:
+                print(f"  {metric:<15} -")
+            else:
+                print(f"  {metric:<15} p50 {values['p50']:7.1f}s  p95 {values['p95']:7.1f}s")
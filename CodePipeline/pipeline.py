@@ -1,9 +1,31 @@
-import boto3
+import hashlib
+import re
 import botocore.exceptions
-import sys
-sys.path.append('codepipeline-resume-website/')
 
 from Bucket.bucket import S3BucketManager
+from Clients.registry import account_id, get_client
+
+"""
+Artifact Bucket
+: The artifact store is named from the account, region and pipeline, so every run reuses the same bucket instead of
+: creating a new randomly named one. Bucket names are at most 63 lowercase letters, digits and hyphens; longer names
+: are truncated and suffixed with a hash of the full name so they stay unique.
+: Lifecycle rules expire artifacts after `artifact_expiration_days` (bucket_data, default 30) and abort incomplete
+: multipart uploads after a day.
+: https://docs.aws.amazon.com/AmazonS3/latest/userguide/bucketnamingrules.html
+: https://docs.aws.amazon.com/AmazonS3/latest/userguide/object-lifecycle-mgmt.html
+"""
+
+ARTIFACT_EXPIRATION_DAYS = 30
+
+
+def artifact_bucket_name(region, pipeline_name, account=None):
+    name = re.sub(r'[^a-z0-9-]+', '-', f'codepipeline-{region}-{account or account_id()}-{pipeline_name}'.lower())
+    name = re.sub(r'-{2,}', '-', name).strip('-')
+    if len(name) > 63:
+        digest = hashlib.sha256(name.encode()).hexdigest()[:8]
+        name = f"{name[:54].rstrip('-')}-{digest}"
+    return name
 
 
 class CodePipeline:
@@ -12,11 +34,12 @@ class CodePipeline:
         self.github_username = github_data['username']
         self.github_repo = github_data['repository']
         self.github_branch = github_data['branch']
+        self.github_data = github_data
         self.s3_bucket = bucket_data['s3_bucket']
         self.region = bucket_data['region']
-        self.artifact_bucket = bucket_data['artifact_bucket']
-        self.codepipeline_client = boto3.client('codepipeline')
-        self.s3_client = boto3.client('s3')
+        self.artifact_bucket = bucket_data.get('artifact_bucket') or artifact_bucket_name(self.region, pipeline_name)
+        self.artifact_expiration_days = bucket_data.get('artifact_expiration_days', ARTIFACT_EXPIRATION_DAYS)
+        self.codepipeline_client = get_client('codepipeline', self.region)
         
     def create_artifact_bucket(self):
         # Bucket policy for the Artifact Store (S3 Bucket) that AWS CodePipeline uses to store artifacts used by pipelines.
@@ -51,13 +74,73 @@ class CodePipeline:
             ]
         }
         bucket_manager = S3BucketManager(self.artifact_bucket, self.region)
-        bucket_manager.create_bucket()
-        bucket_manager.set_bucket_policy(bucket_policy)
+        if not bucket_manager.create_bucket():
+            return False
+        policy_set = bucket_manager.set_bucket_policy(bucket_policy)
+        rules_set = bucket_manager.set_lifecycle_rules([
+            {
+                'ID': 'ExpirePipelineArtifacts',
+                'Filter': {'Prefix': ''},
+                'Status': 'Enabled',
+                'Expiration': {'Days': self.artifact_expiration_days},
+                'NoncurrentVersionExpiration': {'NoncurrentDays': 1},
+                'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': 1}
+            }
+        ])
+        return policy_set and rules_set
+
+    def trigger_filters(self):
+        """
+        Git trigger filters for V2 pipelines, read from github_data:
+            include_paths / exclude_paths, branches / exclude_branches, tags / exclude_tags
+        File-path filters need a branch filter, so the pipeline branch is used when no branches are given.
+        """
+        def include_exclude(includes, excludes):
+            pattern = {}
+            if self.github_data.get(includes):
+                pattern['includes'] = list(self.github_data[includes])
+            if self.github_data.get(excludes):
+                pattern['excludes'] = list(self.github_data[excludes])
+            return pattern
+
+        push = []
+        branches = include_exclude('branches', 'exclude_branches')
+        file_paths = include_exclude('include_paths', 'exclude_paths')
+        if branches or file_paths:
+            branch_filter = {'branches': branches or {'includes': [self.github_branch]}}
+            if file_paths:
+                branch_filter['filePaths'] = file_paths
+            push.append(branch_filter)
+        tags = include_exclude('tags', 'exclude_tags')
+        if tags:
+            push.append({'tags': tags})
+        if not push:
+            return []
+        return [
+            {
+                'providerType': 'CodeStarSourceConnection',
+                'gitConfiguration': {
+                    'sourceActionName': 'SourceAction',
+                    'push': push
+                }
+            }
+        ]
+
+    def pipeline_variables(self):
+        # github_data['variables']: {name: default value}, referenced in action configuration as #{variables.name}
+        return [
+            {'name': name, 'defaultValue': str(value), 'description': f'Pipeline variable {name}'}
+            for name, value in self.github_data.get('variables', {}).items()
+        ]
 
     def create_pipeline(self):
+        triggers = self.trigger_filters()
+        variables = self.pipeline_variables()
+        # Trigger filters and pipeline-level variables are only available on V2 pipelines.
+        pipeline_type = self.github_data.get('pipeline_type', 'V2' if triggers or variables else 'V1')
         pipeline_definition = {
             'name': self.pipeline_name,
-            'roleArn': '', # Enter IAM Role ARN
+            'roleArn': self.github_data.get('role_arn', ''), # Enter IAM Role ARN (or github_data['role_arn'])
             'artifactStore': {
                 'type': 'S3',
                 'location': self.artifact_bucket, 
@@ -76,7 +159,7 @@ class CodePipeline:
                             },
                             'runOrder': 1,
                             'configuration': {
-                                'ConnectionArn': '', # Enter IAM Role ARN (CodeStar Connections)
+                                'ConnectionArn': self.github_data.get('connection_arn', ''), # Enter CodeStar Connections ARN (or github_data['connection_arn'])
                                 'FullRepositoryId': f'{self.github_username}/{self.github_repo}',
                                 'BranchName': self.github_branch,
                                 'OutputArtifactFormat': 'CODE_ZIP',
@@ -121,17 +204,31 @@ class CodePipeline:
             ],
             'version': 1,
             'executionMode': 'SUPERSEDED',
-            'pipelineType': 'V1'
+            'pipelineType': pipeline_type
         }
+        if triggers:
+            pipeline_definition['triggers'] = triggers
+        if variables:
+            pipeline_definition['variables'] = variables
 
         try:
             self.codepipeline_client.create_pipeline(pipeline=pipeline_definition)
             print("Successfully created the pipeline.")
+            return True
         except self.codepipeline_client.exceptions.PipelineNameInUseException as e:
             print(f'Pipeline Name already in use. {e}')
-        except botocore.exceptions.ClientError as e:
+            # Apply changed trigger filters, variables or pipeline type to the existing pipeline.
+            try:
+                self.codepipeline_client.update_pipeline(pipeline=pipeline_definition)
+                print("Successfully updated the pipeline.")
+                return True
+            except botocore.exceptions.ClientError as e:
+                print(f'Error updating the pipeline. {e}')
+        except (botocore.exceptions.ClientError, botocore.exceptions.ParamValidationError) as e:
+            # e.g. roleArn / ConnectionArn not filled in
             print(f'Error creating the pipeline. {e}')
+        return False
         
     def configure_pipeline(self):
-        self.create_artifact_bucket()
-        self.create_pipeline()
+        # The pipeline cannot store artifacts without its bucket.
+        return self.create_artifact_bucket() and self.create_pipeline()
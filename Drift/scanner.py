@@ -0,0 +1,269 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import botocore.exceptions
+from CertificateManager.index import covers
+from Clients.registry import get_client
+from Clients.resolver import get_resolver
+from CloudFront.create_distribution import DEFAULT_HTTP_VERSION, DEFAULT_PRICE_CLASS
+
+"""
+Drift Scanner
+: Read-only comparison of a site's live configuration with what main.build_site_graph() provisions for it.
+: Fetches the bucket policy, public access block, website configuration, pipeline, hosted zone records, certificate,
+: distribution configuration and response headers policy concurrently, then reports each resource as
+: ok / drift / missing / error with the differing fields.
+: IDs and ARNs recorded in the state file (State.store) are used when present; otherwise the distribution is found by
+: its alias, the certificate through the distribution and the hosted zone and policies by name (Clients.resolver).
+: Sites are scanned concurrently as well (DriftScanner.scan_sites), each with its own pool for the per-resource calls.
+:   python main.py scan
+:   python main.py scan --manifest sites.json
+"""
+
+CLOUDFRONT_HOSTED_ZONE_ID = 'Z2FDTNDATAQYW2'
+CERTIFICATE_RENEWAL_DAYS = 30
+MISSING_ERROR_CODES = {
+    'NoSuchBucket', 'NoSuchBucketPolicy', 'NoSuchWebsiteConfiguration', 'NoSuchPublicAccessBlockConfiguration',
+    'PipelineNotFoundException', 'NoSuchDistribution', 'ResourceNotFoundException', 'NoSuchHostedZone',
+    'NoSuchResponseHeadersPolicy'
+}
+RESOURCES = (
+    'bucket_policy', 'public_access_block', 'website', 'pipeline', 'records', 'certificate', 'distribution', 'header_policy'
+)
+
+
+class MissingResource(Exception):
+    pass
+
+
+def compare(differences, label, actual, expected):
+    if actual != expected:
+        differences.append(f'{label}: expected {expected!r}, found {actual!r}')
+
+
+class DriftScanner():
+    def __init__(self, site, known=None, max_workers=8) -> None:
+        """
+        site: the graph inputs of one site (main.site_inputs); known: outputs recorded in the state file, if any.
+        """
+        self.site = site
+        self.known = known or {}
+        self.max_workers = max_workers
+        self.domain_name = site['hostedzone_data']['domain_name']
+        self.aliases = sorted([self.domain_name, site['alt_name']])
+        self.s3_client = get_client('s3', site['region'])
+        self.codepipeline_client = get_client('codepipeline', site['region'])
+        self.route53_client = get_client('route53')
+        self.cf_client = get_client('cloudfront')
+        self.acm_client = get_client('acm', 'us-east-1')
+
+    def find_distribution(self):
+        """
+        The distribution ID, ARN and config: from the state file when known, else by alias.
+        """
+        distribution_id = self.known.get('distribution_id')
+        if not distribution_id:
+            paginator = self.cf_client.get_paginator('list_distributions')
+            for page in paginator.paginate():
+                for summary in page['DistributionList'].get('Items', []):
+                    if self.domain_name in summary['Aliases'].get('Items', []):
+                        distribution_id = summary['Id']
+                        break
+                if distribution_id:
+                    break
+        if not distribution_id:
+            raise MissingResource(f'No distribution with alias {self.domain_name}')
+        response = self.cf_client.get_distribution(Id=distribution_id)['Distribution']
+        return {
+            'id': distribution_id, 'arn': response['ARN'], 'domain': response['DomainName'],
+            'status': response['Status'], 'config': response['DistributionConfig']
+        }
+
+    def check_bucket_policy(self, distribution):
+        policy = json.loads(self.s3_client.get_bucket_policy(Bucket=self.site['bucket_name'])['Policy'])
+        differences = []
+        grants = {(json.dumps(statement.get('Principal'), sort_keys=True), json.dumps(statement.get('Condition'), sort_keys=True))
+                  for statement in policy['Statement'] if statement.get('Effect') == 'Allow'}
+        if distribution:
+            # After the CloudFront step only the distribution may read the bucket.
+            expected = (json.dumps({'Service': 'cloudfront.amazonaws.com'}, sort_keys=True),
+                        json.dumps({'StringEquals': {'AWS:SourceArn': distribution['arn']}}, sort_keys=True))
+        else:
+            expected = (json.dumps('*'), json.dumps(None))
+        if expected not in grants:
+            differences.append(f'no Allow statement for principal {expected[0]} with condition {expected[1]}')
+        extra = grants - {expected}
+        if extra:
+            differences.append(f'{len(extra)} other Allow statement(s)')
+        return differences
+
+    def check_public_access_block(self, distribution):
+        config = self.s3_client.get_public_access_block(Bucket=self.site['bucket_name'])['PublicAccessBlockConfiguration']
+        blocked = bool(distribution)
+        differences = []
+        for key in ('BlockPublicAcls', 'IgnorePublicAcls', 'BlockPublicPolicy', 'RestrictPublicBuckets'):
+            compare(differences, key, config.get(key), blocked)
+        return differences
+
+    def check_website(self, distribution):
+        config = self.s3_client.get_bucket_website(Bucket=self.site['bucket_name'])
+        differences = []
+        compare(differences, 'IndexDocument', config.get('IndexDocument', {}).get('Suffix'), 'index.html')
+        return differences
+
+    def check_pipeline(self, distribution):
+        from CodePipeline.pipeline import artifact_bucket_name
+        pipeline = self.codepipeline_client.get_pipeline(name=self.site['pipeline_name'])['pipeline']
+        bucket_data, github_data = self.site['bucket_data'], self.site['github_data']
+        differences = []
+        expected_bucket = bucket_data.get('artifact_bucket') or artifact_bucket_name(self.site['region'], self.site['pipeline_name'])
+        compare(differences, 'artifactStore', pipeline['artifactStore']['location'], expected_bucket)
+        actions = {action['name']: action for stage in pipeline['stages'] for action in stage['actions']}
+        source = actions.get('SourceAction', {}).get('configuration', {})
+        compare(differences, 'FullRepositoryId', source.get('FullRepositoryId'), f"{github_data['username']}/{github_data['repository']}")
+        compare(differences, 'BranchName', source.get('BranchName'), github_data['branch'])
+        compare(differences, 'Deploy BucketName', actions.get('DeployAction', {}).get('configuration', {}).get('BucketName'), self.site['bucket_name'])
+        return differences
+
+    def check_records(self, distribution):
+        zone_id = self.known.get('hostedzone_id') or get_resolver().lookup('hosted_zone', self.domain_name)
+        if not zone_id:
+            raise MissingResource(f'No hosted zone for {self.domain_name}')
+        records = {}
+        paginator = self.route53_client.get_paginator('list_resource_record_sets')
+        for page in paginator.paginate(HostedZoneId=zone_id):
+            for record in page['ResourceRecordSets']:
+                name = record['Name'].rstrip('.').replace('\\052', '*')
+                records[(name, record['Type'])] = record
+        differences = []
+        for name in self.aliases:
+            alias = records.get((name, 'A'), {}).get('AliasTarget')
+            if not alias:
+                differences.append(f'{name}: no alias A record')
+            elif distribution:
+                compare(differences, f'{name} alias', (alias['DNSName'].rstrip('.'), alias['HostedZoneId']),
+                        (distribution['domain'], CLOUDFRONT_HOSTED_ZONE_ID))
+        for cname in self.known.get('cname_records') or []:
+            record = records.get((cname['Name'].rstrip('.'), 'CNAME'))
+            values = [value['Value'] for value in record['ResourceRecords']] if record else None
+            compare(differences, f"{cname['Name']} validation CNAME", values, [cname['Value']])
+        return differences
+
+    def check_certificate(self, distribution):
+        certificate_arn = self.known.get('certificate_arn')
+        if not certificate_arn and distribution:
+            certificate_arn = distribution['config'].get('ViewerCertificate', {}).get('ACMCertificateArn')
+        if not certificate_arn:
+            raise MissingResource('No certificate ARN in the state file or on the distribution')
+        certificate = self.acm_client.describe_certificate(CertificateArn=certificate_arn)['Certificate']
+        differences = []
+        compare(differences, 'Status', certificate['Status'], 'ISSUED')
+        # Any certificate that covers every alias will do, e.g. one with extra names or a reused wildcard certificate.
+        names = certificate.get('SubjectAlternativeNames') or [certificate['DomainName']]
+        aliases = self.site['distribution_data'].get('cname', self.aliases)
+        uncovered = [alias for alias in aliases if not any(covers(name, alias) for name in names)]
+        if uncovered:
+            differences.append(f'SubjectAlternativeNames: {sorted(names)} do not cover {uncovered}')
+        not_after = certificate.get('NotAfter')
+        if not_after and not_after.timestamp() - time.time() < CERTIFICATE_RENEWAL_DAYS * 86400:
+            differences.append(f'expires {not_after:%Y-%m-%d}')
+        return differences
+
+    def check_distribution(self, distribution):
+        if not distribution:
+            raise MissingResource(f'No distribution with alias {self.domain_name}')
+        config = distribution['config']
+        distribution_data = self.site['distribution_data']
+        differences = []
+        compare(differences, 'Aliases', sorted(config['Aliases'].get('Items', [])), sorted(distribution_data.get('cname', self.aliases)))
+        compare(differences, 'DefaultRootObject', config['DefaultRootObject'], distribution_data.get('root_object', 'index.html'))
+        compare(differences, 'Enabled', config['Enabled'], True)
+        origin_domain = distribution_data.get('domain_id', f"{self.site['bucket_name']}.s3.{self.site['region']}.amazonaws.com")
+        origins = config['Origins']['Items']
+        compare(differences, 'Origins', [origin['DomainName'] for origin in origins], [origin_domain])
+        if not any(origin.get('OriginAccessControlId') for origin in origins):
+            differences.append('origin has no origin access control')
+        if self.known.get('certificate_arn'):
+            compare(differences, 'ACMCertificateArn', config['ViewerCertificate'].get('ACMCertificateArn'), self.known['certificate_arn'])
+        expected_cache_policy = distribution_data.get('cache_policy_id') or get_resolver().lookup('cache_policy', 'StaticSite-html')
+        compare(differences, 'DefaultCacheBehavior.CachePolicyId', config['DefaultCacheBehavior'].get('CachePolicyId'), expected_cache_policy)
+        compare(differences, 'DefaultCacheBehavior.ViewerProtocolPolicy', config['DefaultCacheBehavior']['ViewerProtocolPolicy'], 'redirect-to-https')
+        compare(differences, 'HttpVersion', config.get('HttpVersion'), distribution_data.get('http_version', DEFAULT_HTTP_VERSION))
+        compare(differences, 'PriceClass', config.get('PriceClass'), distribution_data.get('price_class', DEFAULT_PRICE_CLASS))
+        compare(differences, 'CacheBehaviors', [behavior['PathPattern'] for behavior in config.get('CacheBehaviors', {}).get('Items', [])],
+                [behavior['path_pattern'] for behavior in distribution_data.get('cache_behaviors', [])])
+        return differences
+
+    def check_header_policy(self, distribution):
+        policy_id = get_resolver().lookup('response_headers_policy', 'MyHeaderPolicy')
+        if not policy_id:
+            raise MissingResource('Response headers policy MyHeaderPolicy does not exist')
+        differences = []
+        if distribution:
+            compare(differences, 'DefaultCacheBehavior.ResponseHeadersPolicyId',
+                    distribution['config']['DefaultCacheBehavior'].get('ResponseHeadersPolicyId'), policy_id)
+        return differences
+
+    def run_check(self, resource, distribution):
+        try:
+            differences = getattr(self, f'check_{resource}')(distribution)
+            return {'status': 'drift' if differences else 'ok', 'differences': differences}
+        except MissingResource as e:
+            return {'status': 'missing', 'differences': [str(e)]}
+        except botocore.exceptions.ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            return {'status': 'missing' if code in MISSING_ERROR_CODES else 'error', 'differences': [str(e)]}
+
+    def scan(self):
+        """
+        Returns {resource: {'status': ..., 'differences': [...]}}.
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # Resources that do not need the distribution are fetched while it is being looked up.
+            distribution_future = pool.submit(self.find_distribution)
+            independent = {resource: pool.submit(self.run_check, resource, None) for resource in ('website', 'pipeline')}
+            try:
+                distribution = distribution_future.result()
+            except MissingResource:
+                distribution = None
+            except botocore.exceptions.ClientError as e:
+                print(f"Error looking up the distribution of {self.site['bucket_name']}: {e}")
+                distribution = None
+            dependent = {resource: pool.submit(self.run_check, resource, distribution)
+                         for resource in RESOURCES if resource not in independent}
+            results = {resource: future.result() for resource, future in {**independent, **dependent}.items()}
+        self.seconds = time.perf_counter() - start
+        return {resource: results[resource] for resource in RESOURCES}
+
+    @staticmethod
+    def scan_sites(scanners, max_workers=4):
+        """
+        Scan many sites concurrently. Returns [(site name, report or None, error or None)].
+        """
+        def scan_site(scanner):
+            try:
+                return scanner.site['bucket_name'], scanner.scan(), None
+            except Exception as e:
+                return scanner.site['bucket_name'], None, str(e)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(scan_site, scanners))
+
+
+def print_report(results):
+    drifted = 0
+    for site_name, report, error in results:
+        if error:
+            print(f'{site_name}: scan failed. {error}')
+            drifted += 1
+            continue
+        statuses = {resource: result['status'] for resource, result in report.items()}
+        site_drifted = any(status != 'ok' for status in statuses.values())
+        drifted += site_drifted
+        print(f"{site_name}: {'DRIFT' if site_drifted else 'ok'}")
+        for resource, result in report.items():
+            print(f"  {resource:<20} {result['status']}")
+            for difference in result['differences']:
+                print(f"    - {difference}")
+    print(f'{len(results)} sites scanned, {drifted} with drift.')
+    return drifted
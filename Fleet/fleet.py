@@ -0,0 +1,65 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Fleet Provisioning
+: Provision many static websites from one JSON manifest, a list of site definitions with the same shape as main.DEFAULT_SITE:
+:   [{"bucket_name": "example.com", "region": "ap-southeast-1", "pipeline_name": "example-pipeline",
+:     "github_data": {"username": "...", "repository": "...", "branch": "main"},
+:     "hostedzone_data": {...}, "distribution_data": {...}}, ...]
+: Sites run concurrently on a bounded thread pool. A failing site is recorded in its own result and does not stop the others.
+"""
+
+REQUIRED_KEYS = ('bucket_name', 'region', 'pipeline_name', 'github_data')
+
+
+def load_manifest(path):
+    with open(path) as manifest_file:
+        manifest = json.load(manifest_file)
+    sites = manifest['sites'] if isinstance(manifest, dict) else manifest
+    for index, site in enumerate(sites):
+        missing = [key for key in REQUIRED_KEYS if key not in site]
+        if missing:
+            raise ValueError(f"Site #{index} in {path} is missing {missing}")
+    names = [site['bucket_name'] for site in sites]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate sites in {path}: {sorted(duplicates)}")
+    return sites
+
+
+class FleetProvisioner():
+    def __init__(self, sites, provision_site, max_workers=4) -> None:
+        self.sites = sites
+        self.provision_site = provision_site
+        self.max_workers = max_workers
+
+    def run_site(self, site):
+        start = time.perf_counter()
+        result = {'site': site['bucket_name'], 'values': None, 'timings': {}, 'error': None}
+        try:
+            result['values'], result['timings'] = self.provision_site(site)
+        except Exception as e:
+            print(f"Site {site['bucket_name']} failed. {e}")
+            result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    def run(self):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self.run_site, self.sites))
+        self.total_seconds = time.perf_counter() - start
+        return results
+
+    def print_summary(self, results):
+        width = max([len(result['site']) for result in results] + [4])
+        print(f"{'Site':<{width}}  {'Status':<6}  {'Total':>8}  Slowest step")
+        for result in sorted(results, key=lambda result: result['seconds'], reverse=True):
+            status = 'FAILED' if result['error'] else 'OK'
+            slowest = max(result['timings'].items(), key=lambda item: item[1], default=None)
+            slowest_text = f"{slowest[0]} ({slowest[1]:.1f}s)" if slowest else '-'
+            print(f"{result['site']:<{width}}  {status:<6}  {result['seconds']:>7.1f}s  {slowest_text}")
+        failed = sum(1 for result in results if result['error'])
+        print(f"{len(results)} sites, {failed} failed, {self.total_seconds:.1f}s wall time with {self.max_workers} workers.")
@@ -0,0 +1,128 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import botocore.exceptions as bexcept
+from Clients.registry import get_client
+
+"""
+Route 53 Change Batch Builder
+: Collects record changes for one hosted zone and submits them with as few change_resource_record_sets calls as possible.
+: A batch is split automatically at the API limits:
+:   - 1,000 ResourceRecord elements per request (UPSERT counts twice)
+:   - 32,000 characters across all Value elements per request (UPSERT counts twice)
+: https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/DNSLimitations.html#limits-api-requests-changeresourcerecordsets
+"""
+
+MAX_RECORDS = 1000
+MAX_VALUE_CHARACTERS = 32000
+
+
+def change_cost(change):
+    record_set = change['ResourceRecordSet']
+    multiplier = 2 if change['Action'] == 'UPSERT' else 1
+    values = [record['Value'] for record in record_set.get('ResourceRecords', [])]
+    # An alias record has no ResourceRecord elements but still takes a slot in the request.
+    records = max(len(values), 1) * multiplier
+    characters = sum(len(value) for value in values) * multiplier
+    return records, characters
+
+
+class RecordChangeBatch():
+    def __init__(self, hosted_zone_id, comment=None) -> None:
+        self.route53_client = get_client('route53')
+        self.hosted_zone_id = hosted_zone_id
+        self.comment = comment
+        self.changes = []
+
+    def __len__(self):
+        return len(self.changes)
+
+    def add(self, action, record_set):
+        self.changes.append({'Action': action, 'ResourceRecordSet': record_set})
+        return self
+
+    def add_alias_a_record(self, action, domain_name, alias_target_dns, alias_hosted_zone_id):
+        return self.add(action, {
+            'Name': domain_name,
+            'Type': 'A',
+            'AliasTarget': {
+                'HostedZoneId': alias_hosted_zone_id,
+                'DNSName': alias_target_dns,
+                'EvaluateTargetHealth': False
+            }
+        })
+
+    def add_cname_record(self, action, cname_record, ttl=300):
+        return self.add(action, {
+            'Name': cname_record['Name'],
+            'Type': cname_record['Type'],
+            'TTL': ttl,
+            'ResourceRecords': [{'Value': cname_record['Value']}]
+        })
+
+    def split(self):
+        batches = []
+        current, records, characters = [], 0, 0
+        for change in self.changes:
+            change_records, change_characters = change_cost(change)
+            if current and (records + change_records > MAX_RECORDS or characters + change_characters > MAX_VALUE_CHARACTERS):
+                batches.append(current)
+                current, records, characters = [], 0, 0
+            current.append(change)
+            records += change_records
+            characters += change_characters
+        if current:
+            batches.append(current)
+        return batches
+
+    def submit_changes(self, changes):
+        change_batch = {'Changes': changes}
+        if self.comment:
+            change_batch['Comment'] = self.comment
+        response = self.route53_client.change_resource_record_sets(
+            HostedZoneId=self.hosted_zone_id,
+            ChangeBatch=change_batch
+        )
+        return response['ChangeInfo']['Id']
+
+    def submit(self, max_workers=1):
+        """
+        Submit every collected change and return the change IDs, one per request.
+        By default batches are sent in order, so a later batch never races an earlier one for the same record.
+        Pass max_workers > 1 only when no record set appears in more than one change (e.g. a zone file import).
+        """
+        def submit_batch(changes):
+            try:
+                return self.submit_changes(changes)
+            except bexcept.ClientError as e:
+                print(f"Error submitting {len(changes)} record changes to {self.hosted_zone_id}: {e}")
+                return None
+
+        batches = self.split()
+        self.changes = []
+        if max_workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                change_ids = list(pool.map(submit_batch, batches))
+        else:
+            change_ids = [submit_batch(changes) for changes in batches]
+        return [change_id for change_id in change_ids if change_id]
+
+
+def wait_for_changes(change_ids, timeout=300, delay=2, max_delay=15):
+    """
+    Poll get_change until every change is INSYNC. Only changes that are still PENDING are polled again.
+    Returns the change IDs that did not reach INSYNC before the timeout.
+    """
+    route53_client = get_client('route53')
+    pending = list(change_ids)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        still_pending = []
+        for change_id in pending:
+            response = route53_client.get_change(Id=change_id)
+            if response['ChangeInfo']['Status'] != 'INSYNC':
+                still_pending.append(change_id)
+        pending = still_pending
+        if pending:
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, max_delay)
+    return pending
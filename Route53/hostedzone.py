@@ -1,13 +1,20 @@
-import boto3
 import time
 import botocore.exceptions as bexcept
+from Clients.registry import get_client
+from Clients.resolver import get_resolver
+from Route53.changebatch import RecordChangeBatch, wait_for_changes
+from Route53 import zonefile
 
 class Route53Manager:
     def __init__(self):
-        self.route53_client = boto3.client('route53')
+        self.route53_client = get_client('route53')
 
     def create_hosted_zone(self, domain_name):
         try:
+            hosted_zone_id = get_resolver().lookup('hosted_zone', domain_name)
+            if hosted_zone_id:
+                print(f"Hosted zone for domain {domain_name} already exists.")
+                return hosted_zone_id
             response = self.route53_client.create_hosted_zone(
                 Name=domain_name,
                 CallerReference=str(time.time()),
@@ -16,12 +23,20 @@ class Route53Manager:
                         'PrivateZone': False
                     }
             )
+            get_resolver().remember('hosted_zone', domain_name, response['HostedZone']['Id'])
             return response['HostedZone']['Id']
         except self.route53_client.exceptions.HostedZoneAlreadyExists as e:
                 print(f"Hosted zone for domain {domain_name} already exists.")
+                return get_resolver().lookup('hosted_zone', domain_name, refresh=True)
         except bexcept.ClientError as e:
             print(f"Error creating hosted zone: {e}")
     
+    def get_hosted_zone_id(self, domain_name):
+        try:
+            return get_resolver().lookup('hosted_zone', domain_name)
+        except bexcept.ClientError as e:
+            print(f"Error looking up hosted zone: {e}")
+
     def create_alias_a_record(self, hosted_zone_id, record_action, domain_name, alias_target_dns, alias_hosted_zone_id):
         try:
             response = self.route53_client.change_resource_record_sets(
@@ -67,4 +82,34 @@ class Route53Manager:
             )
             return response
         except bexcept.ClientError as e:
-            print(f"Error creating CNAME record: {e}")
\ No newline at end of file
+            print(f"Error creating CNAME record: {e}")
+
+    def change_batch(self, hosted_zone_id, comment=None):
+        return RecordChangeBatch(hosted_zone_id, comment)
+
+    def wait_for_changes(self, change_ids, timeout=300):
+        pending = wait_for_changes(change_ids, timeout)
+        if pending:
+            print(f"Changes not yet INSYNC after {timeout}s: {pending}")
+        return not pending
+
+    # Bring records across from another DNS provider: only the record sets that differ are changed.
+    def import_zone_file(self, hosted_zone_id, path, origin=None, delete=False, dry_run=False):
+        try:
+            with open(path) as zone_file:
+                counts, change_ids = zonefile.import_zone(hosted_zone_id, zone_file, origin, delete, dry_run)
+        except (bexcept.ClientError, ValueError) as e:
+            print(f"Error importing {path} into {hosted_zone_id}: {e}")
+            return None
+        print(f"Zone file {path}: {counts or 'no changes'}" + (' (dry run)' if dry_run else ''))
+        return change_ids
+
+    def export_zone_file(self, hosted_zone_id, path):
+        try:
+            with open(path, 'w') as zone_file:
+                count = zonefile.export_zone(hosted_zone_id, zone_file)
+        except bexcept.ClientError as e:
+            print(f"Error exporting {hosted_zone_id}: {e}")
+            return None
+        print(f"{count} record sets written to {path}.")
+        return count
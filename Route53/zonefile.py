@@ -0,0 +1,206 @@
+import re
+from Clients.registry import get_client
+from Route53.changebatch import RecordChangeBatch
+
+"""
+BIND Zone File Import / Export
+: parse_zone() reads a zone file line by line and yields one (name, ttl, type, value) per resource record.
+: It supports $ORIGIN, $TTL, '@', owner names carried over from the previous line, relative names, parenthesised
+: multi-line records, quoted strings and ';' comments. SOA and apex NS records are skipped because Route 53 manages
+: them for the hosted zone.
+: import_zone() groups the records into record sets and streams the zone's existing records page by page. Record sets
+: that already match are left alone, so only the needed CREATE/UPSERT (and, with delete=True, DELETE) changes are sent.
+: DELETE never touches SOA, the apex NS or alias records.
+: The changes go through RecordChangeBatch, which splits them at the API limits. Every record set appears in only one
+: batch, so the batches are submitted concurrently (Clients.throttle keeps the calls within the Route 53 rate).
+: export_zone() writes the zone one page at a time. Alias records have no BIND form and are written as comments.
+: https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/resource-record-sets-creating-import.html
+"""
+
+SUPPORTED_TYPES = {'A', 'AAAA', 'CAA', 'CNAME', 'DS', 'MX', 'NAPTR', 'NS', 'PTR', 'SPF', 'SRV', 'TXT'}
+# Record types whose last field (or only field) is a domain name that may be relative to $ORIGIN.
+NAME_TARGET_TYPES = {'CNAME', 'MX', 'NS', 'PTR', 'SRV'}
+CLASSES = {'IN', 'CH', 'HS'}
+TTL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|[^\s"]+')
+
+
+def parse_ttl(text):
+    if text.isdigit():
+        return int(text)
+    parts = re.findall(r'(\d+)([smhdwSMHDW])', text)
+    if not parts or ''.join(number + unit for number, unit in parts) != text:
+        raise ValueError(f'Invalid TTL {text!r}')
+    return sum(int(number) * TTL_UNITS[unit.lower()] for number, unit in parts)
+
+
+def is_ttl(token):
+    return bool(re.fullmatch(r'\d+|(\d+[smhdwSMHDW])+', token))
+
+
+def qualify(name, origin):
+    if name == '@':
+        return origin
+    if name.endswith('.'):
+        return name
+    return f'{name}.{origin}' if origin != '.' else f'{name}.'
+
+
+def strip_comment(line):
+    in_quotes = False
+    for index, character in enumerate(line):
+        if character == '"' and (index == 0 or line[index - 1] != '\\'):
+            in_quotes = not in_quotes
+        elif character == ';' and not in_quotes:
+            return line[:index]
+    return line
+
+
+def logical_lines(lines):
+    """
+    Join parenthesised records into one line. Yields (starts_with_whitespace, text).
+    """
+    buffer, depth, indented = [], 0, False
+    for line in lines:
+        line = strip_comment(line.rstrip('\n'))
+        if not buffer:
+            indented = line[:1] in (' ', '\t')
+        depth += line.count('(') - line.count(')')
+        buffer.append(line.replace('(', ' ').replace(')', ' '))
+        if depth <= 0:
+            text = ' '.join(buffer).strip()
+            buffer, depth = [], 0
+            if text:
+                yield indented, text
+
+
+def parse_zone(lines, origin=None, default_ttl=3600):
+    """
+    Yield (name, ttl, type, value) for every record in an iterable of zone-file lines (e.g. an open file).
+    Names are absolute and lower case, with a trailing dot.
+    """
+    origin = qualify(origin, '.').lower() if origin else None
+    ttl = default_ttl
+    owner = None
+    for indented, text in logical_lines(lines):
+        tokens = TOKEN.findall(text)
+        directive = tokens[0].upper()
+        if directive == '$ORIGIN':
+            origin = qualify(tokens[1], origin or '.').lower()
+            continue
+        if directive == '$TTL':
+            ttl = parse_ttl(tokens[1])
+            continue
+        if directive.startswith('$'):
+            raise ValueError(f'Unsupported directive {tokens[0]}')
+        if not indented:
+            if origin is None and tokens[0] == '@':
+                raise ValueError('@ used before $ORIGIN; pass origin=')
+            owner = qualify(tokens.pop(0), origin or '.').lower()
+        if owner is None:
+            raise ValueError(f'Record without an owner name: {text}')
+        record_ttl = ttl
+        # [ttl] [class] or [class] [ttl] precede the type.
+        while tokens and (is_ttl(tokens[0]) or tokens[0].upper() in CLASSES):
+            token = tokens.pop(0)
+            if is_ttl(token):
+                record_ttl = parse_ttl(token)
+        record_type = tokens.pop(0).upper()
+        if record_type == 'SOA' or (record_type == 'NS' and owner == origin):
+            continue
+        if record_type not in SUPPORTED_TYPES:
+            raise ValueError(f'Record type {record_type} is not supported by Route 53 ({owner})')
+        if record_type in NAME_TARGET_TYPES:
+            tokens[-1] = qualify(tokens[-1], origin or '.')
+        yield owner, record_ttl, record_type, ' '.join(tokens)
+
+
+def group_record_sets(records):
+    record_sets = {}
+    for name, ttl, record_type, value in records:
+        record_set = record_sets.setdefault((name, record_type), {
+            'Name': name, 'Type': record_type, 'TTL': ttl, 'ResourceRecords': []
+        })
+        # Route 53 allows one TTL per record set; the lowest one in the file wins.
+        record_set['TTL'] = min(record_set['TTL'], ttl)
+        if {'Value': value} not in record_set['ResourceRecords']:
+            record_set['ResourceRecords'].append({'Value': value})
+    return record_sets
+
+
+def record_key(record_set):
+    return record_set['Name'].replace('\\052', '*').lower(), record_set['Type']
+
+
+def iter_record_sets(hosted_zone_id):
+    paginator = get_client('route53').get_paginator('list_resource_record_sets')
+    for page in paginator.paginate(HostedZoneId=hosted_zone_id):
+        yield from page['ResourceRecordSets']
+
+
+def zone_apex(hosted_zone_id):
+    return get_client('route53').get_hosted_zone(Id=hosted_zone_id)['HostedZone']['Name'].lower()
+
+
+def deletable(record_set, apex):
+    """
+    Record sets a delete=True import may remove. Never SOA or the apex NS (managed by Route 53) and never alias records,
+    which have no BIND form and so can never be in the file. Delegation NS records for subdomains are removed.
+    """
+    if 'AliasTarget' in record_set or record_set['Type'] == 'SOA':
+        return False
+    return not (record_set['Type'] == 'NS' and record_key(record_set)[0] == apex)
+
+
+def same_record_set(existing, wanted):
+    existing_values = sorted(record['Value'] for record in existing.get('ResourceRecords', []))
+    wanted_values = sorted(record['Value'] for record in wanted['ResourceRecords'])
+    return 'AliasTarget' not in existing and existing.get('TTL') == wanted['TTL'] and existing_values == wanted_values
+
+
+def import_zone(hosted_zone_id, lines, origin=None, delete=False, dry_run=False, max_workers=4):
+    """
+    Apply a zone file to a hosted zone. Returns (counts per action, change IDs).
+    """
+    wanted = group_record_sets(parse_zone(lines, origin))
+    batch = RecordChangeBatch(hosted_zone_id, comment='Zone file import')
+    apex = zone_apex(hosted_zone_id) if delete else None
+    for existing in iter_record_sets(hosted_zone_id):
+        key = record_key(existing)
+        record_set = wanted.pop(key, None)
+        if record_set is not None:
+            if not same_record_set(existing, record_set):
+                batch.add('UPSERT', record_set)
+        elif delete and deletable(existing, apex):
+            batch.add('DELETE', existing)
+    for record_set in wanted.values():
+        batch.add('CREATE', record_set)
+    counts = {}
+    for change in batch.changes:
+        counts[change['Action']] = counts.get(change['Action'], 0) + 1
+    if dry_run:
+        return counts, []
+    return counts, batch.submit(max_workers=max_workers)
+
+
+def format_record_set(record_set):
+    name = record_set['Name'].replace('\\052', '*')
+    if 'AliasTarget' in record_set:
+        alias = record_set['AliasTarget']
+        return [f"; {name} ALIAS {record_set['Type']} {alias['DNSName']} (zone {alias['HostedZoneId']})"]
+    return [
+        f"{name} {record_set['TTL']} IN {record_set['Type']} {record['Value']}"
+        for record in record_set.get('ResourceRecords', [])
+    ]
+
+
+def export_zone(hosted_zone_id, out):
+    """
+    Write every record set of the hosted zone to the file object `out`, one page at a time. Returns the record set count.
+    """
+    count = 0
+    for record_set in iter_record_sets(hosted_zone_id):
+        for line in format_record_set(record_set):
+            out.write(line + '\n')
+        count += 1
+    return count
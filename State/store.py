@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+"""
+Local Provisioning State
+: A JSON file that records, per site and per step, the hash of the step's inputs and the IDs/ARNs it produced.
+: On a rerun the task graph skips every step whose inputs hash to the stored value and reuses the stored outputs,
+: so an unchanged site makes no API calls at all.
+: Writes go to a temporary file that replaces the state file, so an interrupted run never leaves a half-written file.
+"""
+
+DEFAULT_STATE_FILE = '.provision-state.json'
+
+
+def input_hash(values):
+    encoded = json.dumps(values, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class StateStore():
+    def __init__(self, path=DEFAULT_STATE_FILE) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {}
+        if os.path.exists(path):
+            with open(path) as state_file:
+                self.data = json.load(state_file)
+
+    def save(self):
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as state_file:
+            json.dump(self.data, state_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def get_step(self, site, step, inputs_hash):
+        with self.lock:
+            record = self.data.get(site, {}).get('steps', {}).get(step)
+        if record and record['input_hash'] == inputs_hash:
+            return record['outputs']
+        return None
+
+    def put_step(self, site, step, inputs_hash, outputs):
+        with self.lock:
+            steps = self.data.setdefault(site, {}).setdefault('steps', {})
+            steps[step] = {'input_hash': inputs_hash, 'outputs': outputs, 'updated': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            self.save()
+
+    def site_outputs(self, site):
+        """
+        Every output recorded for a site, merged across steps (e.g. distribution_id, certificate_arn, hostedzone_id).
+        """
+        with self.lock:
+            steps = self.data.get(site, {}).get('steps', {})
+            outputs = {}
+            for record in steps.values():
+                outputs.update(record['outputs'])
+            return outputs
@@ -0,0 +1,138 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+"""
+Task Graph Executor
+: Each task declares the values it needs (inputs) and the values it produces (outputs).
+: A task is started as soon as all of its inputs are available, so independent branches
+: (e.g. S3 bucket, CodePipeline, Route 53 / ACM) run concurrently on a thread pool.
+"""
+
+
+class TaskGraphError(Exception):
+    pass
+
+
+class Task():
+    def __init__(self, name, func, inputs=(), outputs=()) -> None:
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def run(self, values):
+        kwargs = {key: values[key] for key in self.inputs}
+        result = self.func(**kwargs)
+        if not self.outputs:
+            return {}
+        # A single output is the return value itself, even when that value is a dict (e.g. a boto3 response).
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        if not isinstance(result, dict):
+            raise TaskGraphError(f"Task '{self.name}' must return a dict with the outputs {list(self.outputs)}.")
+        missing = [key for key in self.outputs if key not in result]
+        if missing:
+            raise TaskGraphError(f"Task '{self.name}' did not produce outputs: {missing}")
+        return {key: result[key] for key in self.outputs}
+
+
+class TaskGraph():
+    def __init__(self, max_workers=4, state=None, namespace=None) -> None:
+        self.max_workers = max_workers
+        # Optional State.store.StateStore: steps whose inputs are unchanged since the last successful run are skipped.
+        self.state = state
+        self.namespace = namespace
+        self.tasks = {}
+        self.producers = {}
+        self.timings = {}
+        self.skipped = []
+
+    def add_task(self, name, func, inputs=(), outputs=()):
+        if name in self.tasks:
+            raise TaskGraphError(f"Task '{name}' is already defined.")
+        task = Task(name, func, inputs, outputs)
+        for key in task.outputs:
+            if key in self.producers:
+                raise TaskGraphError(f"Output '{key}' is produced by both '{self.producers[key]}' and '{name}'.")
+            self.producers[key] = name
+        self.tasks[name] = task
+        return task
+
+    def dependencies(self, task):
+        return {self.producers[key] for key in task.inputs if key in self.producers}
+
+    def validate(self, initial):
+        for task in self.tasks.values():
+            for key in task.inputs:
+                if key not in self.producers and key not in initial:
+                    raise TaskGraphError(f"Task '{task.name}' needs '{key}' but nothing provides it.")
+        # Kahn's algorithm, only to detect cycles before anything is started.
+        remaining = {name: len(self.dependencies(task)) for name, task in self.tasks.items()}
+        ready = [name for name, count in remaining.items() if count == 0]
+        visited = 0
+        while ready:
+            name = ready.pop()
+            visited += 1
+            for other in self.tasks.values():
+                if name in self.dependencies(other):
+                    remaining[other.name] -= 1
+                    if remaining[other.name] == 0:
+                        ready.append(other.name)
+        if visited != len(self.tasks):
+            raise TaskGraphError("Task graph contains a cycle.")
+
+    def run_task(self, task, values):
+        if self.state is None:
+            return task.run(values)
+        from State.store import input_hash
+        inputs_hash = input_hash({key: values[key] for key in task.inputs})
+        outputs = self.state.get_step(self.namespace, task.name, inputs_hash)
+        if outputs is not None:
+            self.skipped.append(task.name)
+            return outputs
+        outputs = task.run(values)
+        # Managers print and return None (or an empty list) on errors; such a step is retried on the next run.
+        if all(outputs.values()):
+            self.state.put_step(self.namespace, task.name, inputs_hash, outputs)
+        return outputs
+
+    def run(self, initial=None):
+        values = dict(initial or {})
+        self.validate(values)
+        pending = dict(self.tasks)
+        running = {}
+        errors = {}
+
+        def is_ready(task):
+            return all(key in values for key in task.inputs)
+
+        def timed(task, snapshot):
+            from Clients.tracing import traced_step
+            start = time.perf_counter()
+            try:
+                with traced_step(task.name):
+                    return self.run_task(task, snapshot)
+            finally:
+                self.timings[task.name] = time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                if not errors:
+                    for name, task in list(pending.items()):
+                        if is_ready(task):
+                            del pending[name]
+                            running[pool.submit(timed, task, dict(values))] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        values.update(future.result())
+                    except Exception as e:
+                        print(f"Task '{name}' failed. {e}")
+                        errors[name] = e
+
+        if errors:
+            raise TaskGraphError(f"Failed tasks: {', '.join(errors)}. Skipped tasks: {', '.join(pending) or 'none'}")
+        return values
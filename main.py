@@ -1,14 +1,13 @@
+import argparse
 import sys
-import random
 
-sys.path.append('codepipeline-resume-website/')
+from TaskGraph.executor import TaskGraph
+from State.store import DEFAULT_STATE_FILE
 
-from Bucket.bucket import S3BucketManager
-from CodePipeline.pipeline import CodePipeline
-from Route53.hostedzone import Route53Manager
-from CertificateManager.certificate import AWSCertificateManager
-from CloudFront.create_distribution import CloudFrontDistribution
-from CloudFront.update_distribution import DistributionConfig
+"""
+Service modules (and boto3/botocore behind them) are imported inside the methods that use them,
+so a command only pays for the services it touches.
+"""
 
 
 class S3StaticWebsite():
@@ -17,19 +16,20 @@ class S3StaticWebsite():
         self.region = region
 
     def s3_bucket(self):
+        from Bucket.bucket import S3BucketManager
         manager = S3BucketManager(self.bucket_name, self.region)
-        manager.configure_bucket()
+        return manager.configure_bucket()
 
 class PipelineS3Github():
-    def __init__(self, pipeline_name, random_integer, bucket_data, github_data):
+    def __init__(self, pipeline_name, bucket_data, github_data):
         self.pipeline_name = pipeline_name
-        self.random_integer = random_integer
         self.bucket_data = bucket_data
         self.github_data = github_data
     
     def manage_pipeline(self):
+        from CodePipeline.pipeline import CodePipeline
         manager = CodePipeline(self.pipeline_name, self.github_data, self.bucket_data)
-        manager.configure_pipeline()
+        return manager.configure_pipeline()
 
 class Route53HostedZone():
     def __init__(self, hostedzone_data):
@@ -37,42 +37,65 @@ class Route53HostedZone():
         self.record_action = hostedzone_data['record_action']
         self.alias_target_dns = hostedzone_data['alias_target_dns']
         self.alias_hosted_zone_id = hostedzone_data['alias_hosted_zone_id']
+        from Route53.hostedzone import Route53Manager
         self.route53_manager = Route53Manager()
 
     def create_hostedzone(self, domain_name):
         hosted_zone_id = self.route53_manager.create_hosted_zone(domain_name)
         return hosted_zone_id
     
-    def create_A_record(self, hosted_zone_id, domain_name):
-        alias_a_record_response = self.route53_manager.create_alias_a_record(
-            hosted_zone_id, self.record_action, domain_name, self.alias_target_dns, self.alias_hosted_zone_id
-        )
-        print("Alias A record created:", alias_a_record_response)
+    # All A records go out in one change batch instead of one request per record.
+    def create_A_records(self, hosted_zone_id, domain_names, wait=False):
+        change_batch = self.route53_manager.change_batch(hosted_zone_id)
+        for domain_name in domain_names:
+            change_batch.add_alias_a_record(self.record_action, domain_name, self.alias_target_dns, self.alias_hosted_zone_id)
+        change_ids = change_batch.submit()
+        print(f"Alias A records submitted for {', '.join(domain_names)}: {change_ids}")
+        if wait and self.route53_manager.wait_for_changes(change_ids):
+            print(f"Alias A records for {', '.join(domain_names)} are INSYNC.")
+        return change_ids
 
-    def create_cname_record(self, hosted_zone_id, cname_record):
-        cname_response = self.route53_manager.create_cname_record(hosted_zone_id, cname_record)
-        return cname_response 
+    def create_cname_records(self, hosted_zone_id, cname_records):
+        change_batch = self.route53_manager.change_batch(hosted_zone_id)
+        for cname_record in cname_records:
+            change_batch.add_cname_record('UPSERT', cname_record)
+        return change_batch.submit()
 
 class CertificateManager():
     def __init__(self, domain_name, alt_name):
         self.domain_name = domain_name
         self.alt_name = alt_name
+        from CertificateManager.certificate import AWSCertificateManager
         self.certificate_manager = AWSCertificateManager()
 
+    # An ISSUED certificate that already covers both names is reused, which skips DNS validation entirely.
+    # A PENDING_VALIDATION one (e.g. from a run that failed before validation) is reused instead of requesting another.
     def request_public_certificate(self):
-        certificate_arn = self.certificate_manager.request_certificate(self.domain_name, self.alt_name)
+        from CertificateManager.index import CertificateIndex
+        index = CertificateIndex()
+        names = [self.domain_name, self.alt_name]
+        certificate_arn = index.find(names)
+        if certificate_arn:
+            print(f"Reusing certificate {certificate_arn}")
+        else:
+            certificate_arn = self.certificate_manager.request_certificate(self.domain_name, self.alt_name)
+        if certificate_arn:
+            index.add(certificate_arn, names)
         return certificate_arn
     
-    def get_cname_record(self, certificate_arn):
-        cname_record = self.certificate_manager.get_certificate_cname(certificate_arn)
-        return cname_record
+    def get_validation_records(self, certificate_arn):
+        return self.certificate_manager.get_validation_records(certificate_arn)
+
+    def wait_for_issued(self, certificate_arn):
+        return self.certificate_manager.wait_for_issued(certificate_arn)
     
 class CloudFront():
     def __init__(self, distribution_data):
+        from CloudFront.create_distribution import CloudFrontDistribution
         self.cloudfront_manager = CloudFrontDistribution(distribution_data)
 
-    def create_distribution(self):
-        distribution_response = self.cloudfront_manager.create_distribution()
+    def create_distribution(self, distribution_id=None):
+        distribution_response = self.cloudfront_manager.create_distribution(distribution_id)
         return distribution_response
         
     # Giving the origin access control permission to access the S3 bucket
@@ -109,116 +132,534 @@ class CloudFront():
             'RestrictPublicBuckets': True
         }
 
+        from Bucket.bucket import S3BucketManager
         bucket_manager = S3BucketManager(bucket_name, region)
         bucket_manager.set_bucket_policy(bucket_policy)
         bucket_manager.block_public_access(public_access_block_config)
 
-    # Update CloudFront Distribution to attach Origin Access Control Id
-    # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudfront/client/update_distribution.html
-    def add_oac_distribution(self, distribution_id):
-        origin_access_manager = DistributionConfig()
-        origin_access_manager.get_distribution_config(distribution_id)
-        origin_access_manager.update_distribution_config(distribution_id)
-        origin_access_manager.update_distribution()
 
+def build_site_graph(state=None, namespace=None):
+    """
+    Each step declares the values it needs and the values it produces.
+    S3, CodePipeline and Route 53 / ACM do not depend on each other until the CloudFront step, so they run concurrently.
+    With a state store, steps whose inputs did not change since the last successful run are skipped.
+    """
+    graph = TaskGraph(max_workers=4, state=state, namespace=namespace)
 
-def main():
     """
     Step 1: Create S3 Bucket as a Origin for the files of your static website.
         Note: If you will setup a Domain Name for your static website, make sure the domain name matches the bucket name. 
     """
-    bucket_name = 'jd-espiritu.website'
-    region = 'ap-southeast-1'
-    bucket_manager = S3StaticWebsite(bucket_name, region)
-    bucket_manager.s3_bucket()
+    # Every later step uses the bucket, so a failure stops the graph; it is retried on the next run.
+    def create_bucket(bucket_name, region):
+        bucket_manager = S3StaticWebsite(bucket_name, region)
+        if not bucket_manager.s3_bucket():
+            raise RuntimeError(f"Bucket {bucket_name} is not configured.")
+        return True
+    graph.add_task('s3_bucket', create_bucket, inputs=['bucket_name', 'region'], outputs=['bucket_ready'])
 
     """
     Step 2: Create a pipeline in AWSCodePipeline
+        Note: The pipeline starts its first execution on creation, so it waits for the website bucket.
     """
-    pipeline_name = 'jd-espiritu-pipeline'
-    random_integer = random.randint(10**11, (10**12)-1)
-    bucket_data = {
-        's3_bucket' : bucket_name,
-        'artifact_bucket' : f'pipeline-artifact-bucket-ap-southeast-1-{random_integer}',
-        'region' : region
-    }
-    github_data = {
-        'username' : 'jdavid19',
-        'repository' : 'resume-website-v2',
-        'branch' : 'main'
-    }
-    pipeline_manager = PipelineS3Github(pipeline_name, random_integer, bucket_data, github_data)
-    pipeline_manager.manage_pipeline()
-    
+    def create_pipeline(pipeline_name, bucket_data, github_data, bucket_ready):
+        # Nothing depends on the pipeline: a failed pipeline is not recorded and is retried on the next run.
+        pipeline_manager = PipelineS3Github(pipeline_name, bucket_data, github_data)
+        return pipeline_manager.manage_pipeline()
+    graph.add_task('codepipeline', create_pipeline,
+                   inputs=['pipeline_name', 'bucket_data', 'github_data', 'bucket_ready'],
+                   outputs=['pipeline_ready'])
+
     """
     Step 3: Create Hosted Zone in Route 53 (in my case, I purchased the domain from a 3rd party registrar)
         Note: If you purchased the domain name in Route53, it will automatically create the hosted zone. You can skip this step.
         After this step, you can check and verify if your static website is up and running using your purchased domain name.
     """
-    hostedzone_data = {
-        'domain_name' : f'{bucket_name}',
-        'record_action' : 'CREATE',
-        'alias_target_dns' : 's3-website-ap-southeast-1.amazonaws.com',
-        'alias_hosted_zone_id' : 'Z3O0J2DXBE1FTB',
-    }
-    hostedzone_manager = Route53HostedZone(hostedzone_data)
-    hostedzone_id = hostedzone_manager.create_hostedzone(hostedzone_data["domain_name"])
-    print(f"Hosted Zone created with ID: {hostedzone_id}")
-    hostedzone_manager.create_A_record(hostedzone_id, hostedzone_data["domain_name"])
-    alt_name = f"*.{hostedzone_data['domain_name']}"
-    hostedzone_manager.create_A_record(hostedzone_id, alt_name)
+    def create_hostedzone(hostedzone_data):
+        hostedzone_manager = Route53HostedZone(hostedzone_data)
+        hostedzone_id = hostedzone_manager.create_hostedzone(hostedzone_data["domain_name"])
+        print(f"Hosted Zone created with ID: {hostedzone_id}")
+        return hostedzone_id
+    graph.add_task('hosted_zone', create_hostedzone, inputs=['hostedzone_data'], outputs=['hostedzone_id'])
+
+    def create_website_records(hostedzone_data, hostedzone_id, alt_name):
+        hostedzone_manager = Route53HostedZone(hostedzone_data)
+        return hostedzone_manager.create_A_records(hostedzone_id, [hostedzone_data["domain_name"], alt_name])
+    graph.add_task('website_records', create_website_records,
+                   inputs=['hostedzone_data', 'hostedzone_id', 'alt_name'], outputs=['website_change_ids'])
 
     """
     Step 4: Request public certificate from AWS Certificate Manager
     """
-    certificate_manager = CertificateManager(hostedzone_data['domain_name'], alt_name)
-    certificate_arn = certificate_manager.request_public_certificate()
-    print(f"Certificate requested with ARN: {certificate_arn}")
+    def request_certificate(hostedzone_data, alt_name):
+        certificate_manager = CertificateManager(hostedzone_data['domain_name'], alt_name)
+        certificate_arn = certificate_manager.request_public_certificate()
+        print(f"Certificate requested with ARN: {certificate_arn}")
+        return certificate_arn
+    graph.add_task('certificate', request_certificate, inputs=['hostedzone_data', 'alt_name'], outputs=['certificate_arn'])
 
     """
     Step 5 : Validate Domain Ownership
     """
-    # Get CNAME record for certificate validation
-    cname_record = certificate_manager.get_cname_record(certificate_arn)
-    print(f"CNAME record for validation: {cname_record}")
+    # Get the CNAME records for certificate validation (one per distinct domain/SAN record)
+    def get_validation_records(hostedzone_data, alt_name, certificate_arn):
+        certificate_manager = CertificateManager(hostedzone_data['domain_name'], alt_name)
+        cname_records = certificate_manager.get_validation_records(certificate_arn)
+        # None (timeout, missing certificate, API error) fails the step instead of waiting for an issue that cannot happen.
+        if cname_records is None:
+            raise RuntimeError(f"No validation records for certificate {certificate_arn}.")
+        print(f"CNAME records for validation: {cname_records}")
+        return cname_records
+    graph.add_task('validation_records', get_validation_records,
+                   inputs=['hostedzone_data', 'alt_name', 'certificate_arn'], outputs=['cname_records'])
 
-    # Create CNAME record in Route 53
-    cname_response = hostedzone_manager.create_cname_record(hostedzone_id, cname_record)
-    print("CNAME record created:", cname_response)
+    # Create the CNAME records in Route 53
+    def create_validation_records(hostedzone_data, hostedzone_id, cname_records):
+        hostedzone_manager = Route53HostedZone(hostedzone_data)
+        change_ids = hostedzone_manager.create_cname_records(hostedzone_id, cname_records)
+        print("CNAME records submitted:", change_ids)
+        return change_ids
+    graph.add_task('validation_dns', create_validation_records,
+                   inputs=['hostedzone_data', 'hostedzone_id', 'cname_records'], outputs=['validation_change_ids'])
+
+    # CloudFront only accepts an ISSUED certificate
+    def wait_for_certificate(hostedzone_data, alt_name, certificate_arn, validation_change_ids):
+        certificate_manager = CertificateManager(hostedzone_data['domain_name'], alt_name)
+        if not certificate_manager.wait_for_issued(certificate_arn):
+            raise RuntimeError(f"Certificate {certificate_arn} was not issued.")
+        return True
+    graph.add_task('certificate_issued', wait_for_certificate,
+                   inputs=['hostedzone_data', 'alt_name', 'certificate_arn', 'validation_change_ids'], outputs=['certificate_issued'])
 
     """
     Step 6: Create CloudFront Distribution
+        The origin access control is resolved first (concurrently with the certificate validation) and attached at creation,
+        so the distribution is deployed only once.
         Giving the origin access control permission to access the S3 bucket
     """
-    distribution_data = {
-        'cname' : [f"{hostedzone_data['domain_name']}", alt_name],
-        'root_object' : 'index.html',
-        'domain_id' : f'{bucket_name}.s3.{region}.amazonaws.com',
-        'cache_policy_id' : '4135ea2d-6df8-44a3-9df3-4b5a84be39ad', # CachingDisabled https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/using-managed-cache-policies.html
-        'comment' : f'Distribution for {bucket_name}',
-        'certificate_arn' : certificate_arn
-    }
+    def create_origin_access_control(bucket_name):
+        from CloudFront.origin_access_control import OriginAccessControl
+        return OriginAccessControl(bucket_name).create_originacess()
+    graph.add_task('origin_access_control', create_origin_access_control, inputs=['bucket_name'], outputs=['origin_access_control_id'])
 
-    cloudfront_manager = CloudFront(distribution_data)
-    distribution_response = cloudfront_manager.create_distribution()
-    distribution_id = distribution_response[0]
-    distribution_arn = distribution_response[1]
-    distribution_domain = distribution_response[2]
-    cloudfront_manager.update_bucket_config(bucket_name, region, distribution_arn)
-    cloudfront_manager.add_oac_distribution(distribution_id)
+    def create_distribution(bucket_name, region, hostedzone_data, alt_name, distribution_data, origin_access_control_id, certificate_arn, certificate_issued, bucket_ready):
+        overrides = distribution_data
+        distribution_data = {
+            'cname' : [f"{hostedzone_data['domain_name']}", alt_name],
+            'root_object' : 'index.html',
+            'domain_id' : f'{bucket_name}.s3.{region}.amazonaws.com',
+            'comment' : f'Distribution for {bucket_name}',
+            'certificate_arn' : certificate_arn,
+            'origin_access_control_id' : origin_access_control_id
+        }
+        distribution_data.update(overrides)
+        if 'cache_policy_id' not in distribution_data:
+            # Short TTL for HTML; content-hashed assets published with `immutable` keep their one-year Cache-Control.
+            from CloudFront.cache_policy import CachePolicyManager
+            distribution_data['cache_policy_id'] = CachePolicyManager().get_policy_id('html')
+        if distribution_data.get('log_bucket'):
+            from CloudFront.logs import prepare_log_bucket
+            prepare_log_bucket(distribution_data['log_bucket'], region)
+
+        cloudfront_manager = CloudFront(distribution_data)
+        # A distribution recorded by an earlier run is updated when distribution_data (or the certificate) changed.
+        known_id = state.site_outputs(namespace).get('distribution_id') if state else None
+        distribution_response = cloudfront_manager.create_distribution(known_id)
+        if not distribution_response:
+            raise RuntimeError(f"Distribution for {bucket_name} was not created or updated.")
+        distribution_id = distribution_response[0]
+        distribution_arn = distribution_response[1]
+        distribution_domain = distribution_response[2]
+        cloudfront_manager.update_bucket_config(bucket_name, region, distribution_arn)
+        return {
+            'distribution_id' : distribution_id,
+            'distribution_arn' : distribution_arn,
+            'distribution_domain' : distribution_domain
+        }
+    graph.add_task('cloudfront', create_distribution,
+                   inputs=['bucket_name', 'region', 'hostedzone_data', 'alt_name', 'distribution_data', 'origin_access_control_id', 'certificate_arn', 'certificate_issued', 'bucket_ready'],
+                   outputs=['distribution_id', 'distribution_arn', 'distribution_domain'])
 
     """
     Step 7: Update the A record in Hosted Zone
     """
-    hostedzone_data.update({
-        'record_action' : 'UPSERT',
-        'alias_target_dns' : distribution_domain,
-        'alias_hosted_zone_id' : 'Z2FDTNDATAQYW2' #This is always the hosted zone ID when you create an alias record that routes traffic to a CloudFront distribution. https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/aws-properties-route53-recordset-aliastarget.html
-    })
-    hostedzone_manager = Route53HostedZone(hostedzone_data)
-    hostedzone_manager.create_A_record(hostedzone_id, hostedzone_data['domain_name'])
-    hostedzone_manager.create_A_record(hostedzone_id, alt_name)
+    def update_website_records(hostedzone_data, hostedzone_id, alt_name, distribution_domain, website_change_ids):
+        hostedzone_data = dict(hostedzone_data)
+        hostedzone_data.update({
+            'record_action' : 'UPSERT',
+            'alias_target_dns' : distribution_domain,
+            'alias_hosted_zone_id' : 'Z2FDTNDATAQYW2' #This is always the hosted zone ID when you create an alias record that routes traffic to a CloudFront distribution. https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/aws-properties-route53-recordset-aliastarget.html
+        })
+        hostedzone_manager = Route53HostedZone(hostedzone_data)
+        return hostedzone_manager.create_A_records(hostedzone_id, [hostedzone_data['domain_name'], alt_name], wait=True)
+    graph.add_task('cloudfront_records', update_website_records,
+                   inputs=['hostedzone_data', 'hostedzone_id', 'alt_name', 'distribution_domain', 'website_change_ids'],
+                   outputs=['cloudfront_change_ids'])
+
+    # Runs alongside Step 7; the alias records can point at the distribution before it is Deployed.
+    def wait_for_distribution(distribution_id):
+        from CloudFront.create_distribution import wait_deployed
+        def progress(status, elapsed):
+            print(f"Distribution {distribution_id}: {status} after {elapsed:.0f}s")
+        if not wait_deployed(distribution_id, progress).result():
+            raise RuntimeError(f"Distribution {distribution_id} is not Deployed yet.")
+        return True
+    graph.add_task('distribution_deployed', wait_for_distribution, inputs=['distribution_id'], outputs=['distribution_deployed'])
+
+    return graph
+
+
+DEFAULT_SITE = {
+    'bucket_name' : 'jd-espiritu.website',
+    'region' : 'ap-southeast-1',
+    'pipeline_name' : 'jd-espiritu-pipeline',
+    'github_data' : {
+        'username' : 'jdavid19',
+        'repository' : 'resume-website-v2',
+        'branch' : 'main'
+    },
+    'hostedzone_data' : {
+        'alias_target_dns' : 's3-website-ap-southeast-1.amazonaws.com',
+        'alias_hosted_zone_id' : 'Z3O0J2DXBE1FTB', # S3 website endpoint hosted zone ID for ap-southeast-1 https://docs.aws.amazon.com/general/latest/gr/s3.html#s3_website_region_endpoints
+    },
+    'distribution_data' : {}
+}
+
+# S3 website endpoint and its Route 53 hosted zone ID per region, used for the initial alias A records.
+# https://docs.aws.amazon.com/general/latest/gr/s3.html#s3_website_region_endpoints
+S3_WEBSITE_ENDPOINTS = {
+    'us-east-1' : ('s3-website-us-east-1.amazonaws.com', 'Z3AQBSTGFYJSTF'),
+    'us-east-2' : ('s3-website.us-east-2.amazonaws.com', 'Z2O1EMRO9K5GLX'),
+    'us-west-1' : ('s3-website-us-west-1.amazonaws.com', 'Z2F56UZL2M1ACD'),
+    'us-west-2' : ('s3-website-us-west-2.amazonaws.com', 'Z3BJ6K6RIION7M'),
+    'af-south-1' : ('s3-website.af-south-1.amazonaws.com', 'Z83WF9RJE8B12'),
+    'ap-east-1' : ('s3-website.ap-east-1.amazonaws.com', 'ZNB98KWMFR0R6'),
+    'ap-south-1' : ('s3-website.ap-south-1.amazonaws.com', 'Z11RGJOFQNVJUP'),
+    'ap-northeast-1' : ('s3-website-ap-northeast-1.amazonaws.com', 'Z2M4EHUR26P7ZW'),
+    'ap-northeast-2' : ('s3-website.ap-northeast-2.amazonaws.com', 'Z3W03O7B5YMIYP'),
+    'ap-northeast-3' : ('s3-website.ap-northeast-3.amazonaws.com', 'Z2YQB5RD63NC85'),
+    'ap-southeast-1' : ('s3-website-ap-southeast-1.amazonaws.com', 'Z3O0J2DXBE1FTB'),
+    'ap-southeast-2' : ('s3-website-ap-southeast-2.amazonaws.com', 'Z1WCIGYICN2BYD'),
+    'ca-central-1' : ('s3-website.ca-central-1.amazonaws.com', 'Z1QDHH18159H29'),
+    'eu-central-1' : ('s3-website.eu-central-1.amazonaws.com', 'Z21DNDUVLTQW6Q'),
+    'eu-west-1' : ('s3-website-eu-west-1.amazonaws.com', 'Z1BKCTXD74EZPE'),
+    'eu-west-2' : ('s3-website.eu-west-2.amazonaws.com', 'Z3GKZC51ZF0DB4'),
+    'eu-west-3' : ('s3-website.eu-west-3.amazonaws.com', 'Z3R1K369G5AVDG'),
+    'eu-south-1' : ('s3-website.eu-south-1.amazonaws.com', 'Z30OZKI7KPW7MI'),
+    'eu-north-1' : ('s3-website.eu-north-1.amazonaws.com', 'Z3BAZG2TWCNX0D'),
+    'me-south-1' : ('s3-website.me-south-1.amazonaws.com', 'Z1MPMWCPA7YB62'),
+    'sa-east-1' : ('s3-website-sa-east-1.amazonaws.com', 'Z7KQH4QJS55SO'),
+}
+
+
+def site_inputs(site=None):
+    """
+    Build the graph inputs for one site definition.
+    A site definition has the same shape as DEFAULT_SITE; hostedzone_data and distribution_data only need the keys that differ.
+    """
+    site = site or DEFAULT_SITE
+    bucket_name = site['bucket_name']
+    region = site['region']
+    pipeline_name = site['pipeline_name']
+    # The artifact bucket name is derived from the account, region and pipeline (CodePipeline.pipeline.artifact_bucket_name).
+    bucket_data = {
+        's3_bucket' : bucket_name,
+        'region' : region
+    }
+    bucket_data.update(site.get('bucket_data', {}))
+    github_data = dict(site['github_data'])
+    hostedzone_data = {
+        'domain_name' : f'{bucket_name}',
+        'record_action' : 'CREATE',
+    }
+    if region in S3_WEBSITE_ENDPOINTS:
+        hostedzone_data['alias_target_dns'], hostedzone_data['alias_hosted_zone_id'] = S3_WEBSITE_ENDPOINTS[region]
+    hostedzone_data.update(site.get('hostedzone_data', {}))
+    missing = [key for key in ('alias_target_dns', 'alias_hosted_zone_id') if key not in hostedzone_data]
+    if missing:
+        raise ValueError(f"{bucket_name}: no S3 website endpoint known for {region}; set {missing} in hostedzone_data.")
+    alt_name = f"*.{hostedzone_data['domain_name']}"
+    return {
+        'bucket_name' : bucket_name,
+        'region' : region,
+        'pipeline_name' : pipeline_name,
+        'bucket_data' : bucket_data,
+        'github_data' : github_data,
+        'hostedzone_data' : hostedzone_data,
+        'distribution_data' : dict(site.get('distribution_data', {})),
+        'alt_name' : alt_name
+    }
+
+
+def provision_site(site=None, state=None):
+    site = site or DEFAULT_SITE
+    graph = build_site_graph(state, site['bucket_name'])
+    values = graph.run(site_inputs(site))
+    if graph.skipped:
+        print(f"{site['bucket_name']}: skipped unchanged steps: {', '.join(graph.skipped)}")
+    return values, graph.timings
+
+
+def open_state(state_file):
+    from State.store import StateStore
+    return StateStore(state_file) if state_file else None
+
+
+def main(state_file=DEFAULT_STATE_FILE):
+    from Clients.registry import client_stats
+
+    values, timings = provision_site(state=open_state(state_file))
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds:.1f}s")
+    stats = client_stats()
+    print(f"boto3 clients created: {stats['created']} ({stats['construction_seconds']:.2f}s), reused: {stats['reused']}")
+    from Clients.throttle import throttle_stats
+    for key, counters in throttle_stats().items():
+        print(f"rate limit {key}: {counters['requests']} requests at {counters['rate']}/s, "
+              f"waited {counters['waited_seconds']:.1f}s, throttled {counters['throttled']}")
+
+
+def bucket_command(args):
+    site = site_inputs()
+    if not S3StaticWebsite(site['bucket_name'], site['region']).s3_bucket():
+        sys.exit(1)
+
+
+def pipeline_command(args):
+    site = site_inputs()
+    if not PipelineS3Github(site['pipeline_name'], site['bucket_data'], site['github_data']).manage_pipeline():
+        sys.exit(1)
+
+
+def hostedzone_command(args):
+    site = site_inputs()
+    hostedzone_id = Route53HostedZone(site['hostedzone_data']).create_hostedzone(site['hostedzone_data']['domain_name'])
+    print(f"Hosted Zone ID: {hostedzone_id}")
+
+
+def zone_hosted_zone_id(args):
+    from Route53.hostedzone import Route53Manager
+    manager = Route53Manager()
+    hosted_zone_id = args.zone_id or manager.get_hosted_zone_id(args.domain or DEFAULT_SITE['bucket_name'])
+    if not hosted_zone_id:
+        sys.exit(f"No hosted zone for {args.domain or DEFAULT_SITE['bucket_name']}.")
+    return manager, hosted_zone_id
+
+
+def zone_import_command(args):
+    manager, hosted_zone_id = zone_hosted_zone_id(args)
+    change_ids = manager.import_zone_file(hosted_zone_id, args.zone_file, args.domain or DEFAULT_SITE['bucket_name'], delete=args.delete, dry_run=args.dry_run)
+    if change_ids is None:
+        sys.exit(1)
+    if change_ids and args.wait:
+        manager.wait_for_changes(change_ids)
+
+
+def zone_export_command(args):
+    manager, hosted_zone_id = zone_hosted_zone_id(args)
+    if manager.export_zone_file(hosted_zone_id, args.zone_file) is None:
+        sys.exit(1)
+
+
+def fleet_command(args):
+    from Fleet.fleet import FleetProvisioner, load_manifest
+    state = open_state(args.state)
+    fleet = FleetProvisioner(load_manifest(args.manifest), lambda site: provision_site(site, state), max_workers=args.workers)
+    results = fleet.run()
+    fleet.print_summary(results)
+    if any(result['error'] for result in results):
+        sys.exit(1)
+
+
+def invalidate_changes(args, bucket_name, result):
+    """
+    Invalidate the uploaded and deleted keys of a sync/publish result on the site's distribution.
+    """
+    from CloudFront.invalidation import InvalidationQueue
+    state = open_state(args.state)
+    distribution_id = args.distribution_id or (state.site_outputs(bucket_name).get('distribution_id') if state else None)
+    if not distribution_id:
+        print(f'No distribution recorded for {bucket_name}; pass --distribution-id to invalidate.')
+        return False
+    changed = result['uploaded'] + result['deleted']
+    all_keys = changed + result['unchanged'] + result['failed']
+    return InvalidationQueue(distribution_id).request(changed, all_keys).result()
+
+
+def sync_command(args):
+    from Bucket.sync import S3ContentSync
+    bucket_name = args.bucket or DEFAULT_SITE['bucket_name']
+    region = args.region or DEFAULT_SITE['region']
+    result = S3ContentSync(bucket_name, region, max_workers=args.workers).sync(
+        args.local_dir, delete=args.delete, dry_run=args.dry_run, use_manifest=not args.full
+    )
+    print(f"Uploaded {len(result['uploaded'])}, deleted {len(result['deleted'])}, failed {len(result['failed'])}.")
+    if args.invalidate and not args.dry_run and not invalidate_changes(args, bucket_name, result):
+        sys.exit(1)
+    if result['failed']:
+        sys.exit(1)
+
+
+def publish_command(args):
+    from Assets.compress import AssetPublisher
+    bucket_name = args.bucket or DEFAULT_SITE['bucket_name']
+    region = args.region or DEFAULT_SITE['region']
+    result = AssetPublisher(bucket_name, region).publish(
+        args.local_dir, delete=args.delete, dry_run=args.dry_run, fingerprint=args.fingerprint, optimize=args.optimize
+    )
+    print(f"Uploaded {len(result['uploaded'])}, deleted {len(result['deleted'])}, failed {len(result['failed'])}.")
+    if args.invalidate and not args.dry_run and not invalidate_changes(args, bucket_name, result):
+        sys.exit(1)
+    if result['failed']:
+        sys.exit(1)
+
+
+def optimize_command(args):
+    from Assets.optimize import AssetOptimizer
+    optimizer = AssetOptimizer(args.cache_dir)
+    stats = optimizer.optimize(args.source_dir, args.output_dir)
+    print(f"Optimized {stats['optimized']}, from cache {stats['cached']}, copied {stats['copied']}, failed {stats['failed']}; "
+          f"{stats['bytes_before']} -> {stats['bytes_after']} bytes.")
+
+
+def deploy_latency_command(args):
+    from CodePipeline.latency import DeployLatencyTracker
+    tracker = DeployLatencyTracker(args.pipeline or DEFAULT_SITE['pipeline_name'], args.region or DEFAULT_SITE['region'])
+    print(f"{tracker.update()} new executions recorded.")
+    tracker.print_report(args.days)
+
+
+def scan_command(args):
+    from Drift.scanner import DriftScanner, print_report
+    from Fleet.fleet import load_manifest
+    state = open_state(args.state)
+    sites = load_manifest(args.manifest) if args.manifest else [DEFAULT_SITE]
+    scanners = [
+        DriftScanner(site_inputs(site), state.site_outputs(site['bucket_name']) if state else None)
+        for site in sites
+    ]
+    if print_report(DriftScanner.scan_sites(scanners, max_workers=args.workers)):
+        sys.exit(1)
+
+
+def logs_command(args):
+    from CloudFront.logs import LogAnalyzer
+    analyzer = LogAnalyzer(args.checkpoint, max_workers=args.workers)
+    print(f"{analyzer.analyze(args.location)} new log files read.")
+    analyzer.print_report(top=args.top)
+
+
+def certificate_status_command(args):
+    from Clients.registry import get_client
+    response = get_client('acm', 'us-east-1').describe_certificate(CertificateArn=args.arn)
+    print(f"Certificate {args.arn}: {response['Certificate']['Status']}")
+
+
+def distribution_status_command(args):
+    from Clients.registry import get_client
+    response = get_client('cloudfront').get_distribution(Id=args.id)
+    print(f"Distribution {args.id}: {response['Distribution']['Status']}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Provision a static website on S3, CodePipeline, Route 53, ACM and CloudFront.')
+    parser.add_argument('--state', default=DEFAULT_STATE_FILE, help=f'State file used to skip unchanged steps (default: {DEFAULT_STATE_FILE}).')
+    parser.add_argument('--resolver-cache', help='JSON file caching name-to-ID lookups (policies, OACs, hosted zones) between runs.')
+    parser.add_argument('--trace', help='Write a Chrome trace-event JSON of every AWS API call to this file and print a summary.')
+    parser.add_argument('--no-state', dest='state', action='store_const', const=None, help='Run every step, ignoring the state file.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('provision', help='Run every provisioning step (default).').set_defaults(func=lambda args: main(args.state))
+    subparsers.add_parser('bucket', help='Create and configure the website bucket only.').set_defaults(func=bucket_command)
+    subparsers.add_parser('pipeline', help='Create the artifact bucket and pipeline only.').set_defaults(func=pipeline_command)
+    subparsers.add_parser('hostedzone', help='Create the hosted zone only.').set_defaults(func=hostedzone_command)
+    for name, command, help_text in (
+        ('zone-import', zone_import_command, 'Apply a BIND zone file to the hosted zone (only changed record sets are sent).'),
+        ('zone-export', zone_export_command, 'Write the records of the hosted zone to a BIND zone file.')
+    ):
+        zone_parser = subparsers.add_parser(name, help=help_text)
+        zone_parser.add_argument('zone_file')
+        zone_parser.add_argument('--domain', help='Zone name, also the $ORIGIN of the file (default: the bucket of DEFAULT_SITE).')
+        zone_parser.add_argument('--zone-id', help='Hosted zone ID; looked up by --domain when omitted.')
+        if name == 'zone-import':
+            zone_parser.add_argument('--delete', action='store_true', help='Delete record sets that are not in the file (never SOA, apex NS or alias records).')
+            zone_parser.add_argument('--dry-run', action='store_true')
+            zone_parser.add_argument('--wait', action='store_true', help='Wait until the changes are INSYNC.')
+        zone_parser.set_defaults(func=command)
+    fleet_parser = subparsers.add_parser('fleet', help='Provision every site in a JSON manifest concurrently.')
+    fleet_parser.add_argument('manifest', help='JSON file with a list of site definitions (same shape as DEFAULT_SITE).')
+    fleet_parser.add_argument('--workers', type=int, default=4, help='Number of sites provisioned at the same time.')
+    fleet_parser.set_defaults(func=fleet_command)
+    sync_parser = subparsers.add_parser('sync', help='Upload new and changed files from a local directory to the website bucket.')
+    sync_parser.add_argument('local_dir')
+    sync_parser.add_argument('--bucket', help='Defaults to the bucket of DEFAULT_SITE.')
+    sync_parser.add_argument('--region', help='Defaults to the region of DEFAULT_SITE.')
+    sync_parser.add_argument('--workers', type=int, default=8)
+    sync_parser.add_argument('--delete', action='store_true', help='Delete objects that no longer exist locally.')
+    sync_parser.add_argument('--dry-run', action='store_true')
+    sync_parser.add_argument('--full', action='store_true', help='Compare against the bucket listing instead of the stored manifest.')
+    sync_parser.add_argument('--invalidate', action='store_true', help='Invalidate the changed paths on CloudFront and wait for completion.')
+    sync_parser.add_argument('--distribution-id', help='Defaults to the distribution recorded in the state file.')
+    sync_parser.set_defaults(func=sync_command)
+    publish_parser = subparsers.add_parser('publish', help='Pre-compress assets, set Cache-Control/Content-Type and sync them to the website bucket.')
+    publish_parser.add_argument('local_dir')
+    publish_parser.add_argument('--bucket', help='Defaults to the bucket of DEFAULT_SITE.')
+    publish_parser.add_argument('--region', help='Defaults to the region of DEFAULT_SITE.')
+    publish_parser.add_argument('--delete', action='store_true', help='Delete objects that no longer exist locally.')
+    publish_parser.add_argument('--dry-run', action='store_true')
+    publish_parser.add_argument('--fingerprint', action='store_true', help='Rename CSS/JS/images to content-hashed names and update references.')
+    publish_parser.add_argument('--optimize', action='store_true', help='Minify HTML/CSS/JS and recompress images before publishing.')
+    publish_parser.add_argument('--invalidate', action='store_true', help='Invalidate the changed paths on CloudFront and wait for completion.')
+    publish_parser.add_argument('--distribution-id', help='Defaults to the distribution recorded in the state file.')
+    publish_parser.set_defaults(func=publish_command)
+    optimize_parser = subparsers.add_parser('optimize', help='Minify HTML/CSS/JS and strip/recompress images into an output directory.')
+    optimize_parser.add_argument('source_dir')
+    optimize_parser.add_argument('output_dir')
+    optimize_parser.add_argument('--cache-dir', default='.asset-cache')
+    optimize_parser.set_defaults(func=optimize_command)
+    latency_parser = subparsers.add_parser('deploy-latency', help='Record new pipeline executions and report commit-to-live p50/p95.')
+    latency_parser.add_argument('--pipeline', help='Defaults to the pipeline of DEFAULT_SITE.')
+    latency_parser.add_argument('--region', help='Defaults to the region of DEFAULT_SITE.')
+    latency_parser.add_argument('--days', type=int, default=7, help='Report window in days.')
+    latency_parser.set_defaults(func=deploy_latency_command)
+    scan_parser = subparsers.add_parser('scan', help='Compare the live configuration of each site with its definition (read-only).')
+    scan_parser.add_argument('--manifest', help='JSON file with a list of site definitions; defaults to DEFAULT_SITE.')
+    scan_parser.add_argument('--workers', type=int, default=4, help='Number of sites scanned at the same time.')
+    scan_parser.set_defaults(func=scan_command)
+    logs_parser = subparsers.add_parser('logs', help='Analyze CloudFront standard logs (hit ratio, time-taken percentiles, edges).')
+    logs_parser.add_argument('location', help='Directory of .gz log files or s3://bucket/prefix.')
+    logs_parser.add_argument('--checkpoint', default='.cloudfront-logs.json', help='Totals and processed files, so reruns read only new logs.')
+    logs_parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count).')
+    logs_parser.add_argument('--top', type=int, default=10, help='Number of missed URIs to show.')
+    logs_parser.set_defaults(func=logs_command)
+    certificate_parser = subparsers.add_parser('certificate-status', help='Show the status of an ACM certificate.')
+    certificate_parser.add_argument('arn')
+    certificate_parser.set_defaults(func=certificate_status_command)
+    distribution_parser = subparsers.add_parser('distribution-status', help='Show the status of a CloudFront distribution.')
+    distribution_parser.add_argument('id')
+    distribution_parser.set_defaults(func=distribution_status_command)
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args.func = lambda args: main(args.state)
+    return args
+
+
+def cli(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.resolver_cache:
+        from Clients.resolver import configure_resolver
+        configure_resolver(cache_file=args.resolver_cache)
+    tracer = None
+    if args.trace:
+        from Clients.tracing import enable_tracing
+        tracer = enable_tracing()
+    try:
+        args.func(args)
+    finally:
+        if tracer:
+            tracer.export_chrome_trace(args.trace)
+            tracer.print_summary()
+            print(f"Trace written to {args.trace}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
@@ -0,0 +1,24 @@
+import unittest
+
+from Benchmark.provisioning import compare
+
+BASELINE = {'wall_seconds': 0.007, 'api_calls': 0, 'clients_created': 0, 'client_seconds': 0.0, 'peak_mb': 0.04}
+
+
+class CompareTest(unittest.TestCase):
+    def test_zero_counts_must_stay_zero(self):
+        self.assertEqual(compare({'rerun': dict(BASELINE)}, {'rerun': BASELINE}, 1.25), [])
+        failures = compare({'rerun': dict(BASELINE, api_calls=1, clients_created=1)}, {'rerun': BASELINE}, 1.25)
+        self.assertEqual([failure.split(':')[0] for failure in failures], ['rerun.api_calls', 'rerun.clients_created'])
+
+    def test_small_times_have_an_absolute_floor(self):
+        self.assertEqual(compare({'rerun': dict(BASELINE, wall_seconds=0.1)}, {'rerun': BASELINE}, 1.25), [])
+        failures = compare({'rerun': dict(BASELINE, wall_seconds=2.0, peak_mb=5.0)}, {'rerun': BASELINE}, 1.25)
+        self.assertEqual([failure.split(':')[0] for failure in failures], ['rerun.wall_seconds', 'rerun.peak_mb'])
+
+    def test_missing_baseline_fails(self):
+        self.assertEqual(len(compare({'rerun': dict(BASELINE)}, {}, 1.25)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
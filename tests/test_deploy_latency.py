@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+try:
+    from CodePipeline.latency import DeployLatencyTracker
+except ImportError:  # botocore is not installed
+    DeployLatencyTracker = None
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def execution(execution_id, status):
+    return {'pipelineExecutionId': execution_id, 'status': status, 'startTime': START}
+
+
+class FakePaginator():
+    def __init__(self, pages) -> None:
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class FakeCodePipeline():
+    def __init__(self) -> None:
+        self.executions = []
+
+    def get_paginator(self, operation):
+        if operation == 'list_pipeline_executions':
+            # One page per two executions, newest first.
+            return FakePaginator([{'pipelineExecutionSummaries': self.executions[index:index + 2]}
+                                  for index in range(0, len(self.executions), 2)])
+        action = {'stageName': 'Deploy', 'startTime': START, 'lastUpdateTime': START + timedelta(seconds=30)}
+        return FakePaginator([{'actionExecutionDetails': [action]}])
+
+
+@unittest.skipIf(DeployLatencyTracker is None, 'botocore is not installed')
+class CursorTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.client = FakeCodePipeline()
+        patcher = mock.patch('CodePipeline.latency.get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.history_file = os.path.join(directory.name, 'history.json')
+
+    def tracker(self):
+        return DeployLatencyTracker('pipeline', 'eu-west-1', self.history_file)
+
+    def test_cursor_stays_older_than_unfinished_executions(self):
+        self.client.executions = [
+            execution('e5', 'InProgress'), execution('e4', 'Cancelled'), execution('e3', 'InProgress'),
+            execution('e2', 'Succeeded'), execution('e1', 'Failed')
+        ]
+        tracker = self.tracker()
+        self.assertEqual(tracker.update(), 3)
+        self.assertEqual(tracker.history['cursor'], 'e2')
+        self.assertEqual([item['id'] for item in tracker.history['executions']], ['e1', 'e2', 'e4'])
+
+        # Both finish; paging stops at the cursor and the already recorded e4 is not added twice.
+        self.client.executions[0] = execution('e5', 'Succeeded')
+        self.client.executions[2] = execution('e3', 'Cancelled')
+        tracker = self.tracker()
+        self.assertEqual(tracker.update(), 2)
+        self.assertEqual(tracker.history['cursor'], 'e5')
+        self.assertEqual(sorted(item['id'] for item in tracker.history['executions']), ['e1', 'e2', 'e3', 'e4', 'e5'])
+
+    def test_cancelled_execution_is_finished(self):
+        self.client.executions = [execution('e2', 'Cancelled'), execution('e1', 'Succeeded')]
+        tracker = self.tracker()
+        tracker.update()
+        self.assertEqual(tracker.history['cursor'], 'e2')
+
+
+if __name__ == '__main__':
+    unittest.main()
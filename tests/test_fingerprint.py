@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from Assets.fingerprint import fingerprint_assets
+
+
+class FingerprintTest(unittest.TestCase):
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        output = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(output.cleanup)
+        self.source_dir, self.output_dir = source.name, output.name
+
+    def write(self, key, text):
+        path = os.path.join(self.source_dir, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def read(self, key):
+        with open(os.path.join(self.output_dir, *key.split('/'))) as file:
+            return file.read()
+
+    def output_keys(self):
+        keys = set()
+        for root, dirs, files in os.walk(self.output_dir):
+            for name in files:
+                keys.add(os.path.relpath(os.path.join(root, name), self.output_dir).replace(os.sep, '/'))
+        return keys
+
+    def test_css_import_is_hashed_before_the_importing_file(self):
+        self.write('css/a.css', '@import url("b.css");\n@import "c.css";\n')
+        self.write('css/b.css', 'p{color:red}')
+        self.write('css/c.css', 'p{color:blue}')
+        self.write('index.html', '<link rel="stylesheet" href="css/a.css">')
+        renames = fingerprint_assets(self.source_dir, self.output_dir)
+
+        a_css = self.read(renames['css/a.css'])
+        self.assertIn(f'url("{os.path.basename(renames["css/b.css"])}")', a_css)
+        self.assertIn(f'"{os.path.basename(renames["css/c.css"])}"', a_css)
+        self.assertEqual(self.output_keys(), {'index.html', *renames.values()})
+
+    def test_js_imports_are_rewritten_and_hashed(self):
+        self.write('js/app.js', 'import { x } from "./lib.js";\nimport "./side.js";\nimport("./lazy.js");\n')
+        self.write('js/lib.js', 'export const x = 1;\n')
+        self.write('js/side.js', '1;\n')
+        self.write('js/lazy.js', '2;\n')
+        renames = fingerprint_assets(self.source_dir, self.output_dir)
+        app_js = self.read(renames['js/app.js'])
+        for key in ('js/lib.js', 'js/side.js', 'js/lazy.js'):
+            self.assertIn(f'"./{os.path.basename(renames[key])}"', app_js)
+
+        # A change in an imported file changes the hash of the importing file.
+        first = renames['js/app.js']
+        self.write('js/lib.js', 'export const x = 2;\n')
+        self.assertNotEqual(fingerprint_assets(self.source_dir, tempfile.mkdtemp())['js/app.js'], first)
+
+    def test_srcset_candidates_are_rewritten(self):
+        self.write('img/a.png', 'a')
+        self.write('img/b.png', 'b')
+        self.write('index.html', '<img src="img/a.png" srcset="img/a.png 1x, img/b.png 2x">')
+        renames = fingerprint_assets(self.source_dir, self.output_dir)
+        self.assertEqual(
+            self.read('index.html'),
+            f'<img src="{renames["img/a.png"]}" srcset="{renames["img/a.png"]} 1x, {renames["img/b.png"]} 2x">'
+        )
+
+    def test_unrewritable_references_keep_the_original_name(self):
+        self.write('js/app.js', 'const logo = "img/logo.png";\n')
+        self.write('js/one.js', 'import "./two.js";\n')
+        self.write('js/two.js', 'import "./one.js";\n')
+        self.write('img/logo.png', 'logo')
+        self.write('site.webmanifest', '{"icons": [{"src": "icon.png"}]}')
+        self.write('icon.png', 'icon')
+        renames = fingerprint_assets(self.source_dir, self.output_dir)
+
+        for key in ('img/logo.png', 'icon.png', 'js/one.js', 'js/two.js'):
+            self.assertNotIn(key, renames)
+            self.assertIn(key, self.output_keys())
+        self.assertIn('js/app.js', renames)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from Assets.optimize import is_javascript, minify_html
+
+
+class MinifyHtmlTest(unittest.TestCase):
+    def test_attribute_values_are_kept(self):
+        html = '<p   title="a   b"  data-x=\'c\n d\'>one   two</p>'
+        self.assertEqual(minify_html(html), '<p title="a   b" data-x=\'c\n d\'>one two</p>')
+
+    def test_quote_in_text_is_not_an_attribute(self):
+        self.assertEqual(minify_html("<p>don't   <b title=\"x  y\">stop</b></p>"), "<p>don't <b title=\"x  y\">stop</b></p>")
+
+    def test_data_scripts_are_kept(self):
+        for script in (
+            '<script type="application/ld+json">{\n  "a":   1\n}</script>',
+            '<script type="text/template"><p>  {{ name }}  </p></script>',
+        ):
+            self.assertEqual(minify_html(script), script)
+
+    def test_javascript_types(self):
+        self.assertTrue(is_javascript('<script>'))
+        self.assertTrue(is_javascript('<script type="module">'))
+        self.assertTrue(is_javascript("<script type='Text/JavaScript'>"))
+        self.assertFalse(is_javascript('<script type="application/json">'))
+
+
+if __name__ == '__main__':
+    unittest.main()
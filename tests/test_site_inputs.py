@@ -0,0 +1,32 @@
+import unittest
+
+from main import DEFAULT_SITE, site_inputs
+
+
+def fleet_site(region, hostedzone_data=None):
+    site = dict(DEFAULT_SITE, bucket_name='example.com', region=region, pipeline_name='example-pipeline')
+    site['hostedzone_data'] = hostedzone_data or {}
+    return site
+
+
+class SiteInputsTest(unittest.TestCase):
+    def test_alias_target_follows_region(self):
+        hostedzone_data = site_inputs(fleet_site('eu-west-2'))['hostedzone_data']
+        self.assertEqual(hostedzone_data['alias_target_dns'], 's3-website.eu-west-2.amazonaws.com')
+        self.assertEqual(hostedzone_data['alias_hosted_zone_id'], 'Z3GKZC51ZF0DB4')
+
+    def test_manifest_values_win(self):
+        hostedzone_data = site_inputs(fleet_site('eu-west-2', {'alias_hosted_zone_id': 'ZOVERRIDE'}))['hostedzone_data']
+        self.assertEqual(hostedzone_data['alias_hosted_zone_id'], 'ZOVERRIDE')
+
+    def test_unknown_region_needs_manifest_values(self):
+        with self.assertRaises(ValueError):
+            site_inputs(fleet_site('xx-example-1'))
+        hostedzone_data = site_inputs(fleet_site('xx-example-1', {
+            'alias_target_dns': 's3-website.xx-example-1.amazonaws.com', 'alias_hosted_zone_id': 'ZEXAMPLE'
+        }))['hostedzone_data']
+        self.assertEqual(hostedzone_data['alias_hosted_zone_id'], 'ZEXAMPLE')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from State.store import StateStore
+from TaskGraph.executor import TaskGraph, TaskGraphError
+
+
+class TaskGraphTest(unittest.TestCase):
+    def test_runs_dependencies_first(self):
+        order = []
+        lock = threading.Lock()
+
+        def step(name, value):
+            def func(**kwargs):
+                with lock:
+                    order.append(name)
+                return value
+            return func
+
+        graph = TaskGraph(max_workers=4)
+        graph.add_task('c', step('c', 3), inputs=['a_out', 'b_out'], outputs=['c_out'])
+        graph.add_task('a', step('a', 1), inputs=['start'], outputs=['a_out'])
+        graph.add_task('b', step('b', 2), inputs=['a_out'], outputs=['b_out'])
+        values = graph.run({'start': 0})
+
+        self.assertEqual(order, ['a', 'b', 'c'])
+        self.assertEqual(values['c_out'], 3)
+        self.assertEqual(set(graph.timings), {'a', 'b', 'c'})
+
+    def test_single_output_keeps_dict_value(self):
+        record = {'Name': '_x.example.com.', 'Type': 'CNAME', 'Value': '_y.acm-validations.aws.'}
+        graph = TaskGraph()
+        graph.add_task('record', lambda: record, outputs=['validation_record'])
+        self.assertEqual(graph.run()['validation_record'], record)
+
+    def test_multiple_outputs_come_from_a_mapping(self):
+        graph = TaskGraph()
+        graph.add_task('distribution', lambda: {'distribution_id': 'E1', 'distribution_arn': 'arn:E1', 'extra': 1},
+                       outputs=['distribution_id', 'distribution_arn'])
+        values = graph.run()
+        self.assertEqual((values['distribution_id'], values['distribution_arn']), ('E1', 'arn:E1'))
+        self.assertNotIn('extra', values)
+
+    def test_missing_output_fails_and_skips_dependents(self):
+        ran = []
+        graph = TaskGraph()
+        graph.add_task('partial', lambda: {'first': 1}, outputs=['first', 'second'])
+        graph.add_task('after', lambda second: ran.append(second), inputs=['second'])
+        with self.assertRaises(TaskGraphError) as error:
+            graph.run()
+        self.assertIn('partial', str(error.exception))
+        self.assertIn('after', str(error.exception))
+        self.assertEqual(ran, [])
+
+    def test_cycle_is_rejected_before_running(self):
+        ran = []
+        graph = TaskGraph()
+        graph.add_task('a', lambda b_out: ran.append('a'), inputs=['b_out'], outputs=['a_out'])
+        graph.add_task('b', lambda a_out: ran.append('b'), inputs=['a_out'], outputs=['b_out'])
+        with self.assertRaisesRegex(TaskGraphError, 'cycle'):
+            graph.run()
+        self.assertEqual(ran, [])
+
+    def test_unknown_input_is_rejected(self):
+        graph = TaskGraph()
+        graph.add_task('a', lambda missing: None, inputs=['missing'])
+        with self.assertRaisesRegex(TaskGraphError, "needs 'missing'"):
+            graph.run()
+
+    def test_duplicate_producer_is_rejected(self):
+        graph = TaskGraph()
+        graph.add_task('a', lambda: 1, outputs=['value'])
+        with self.assertRaises(TaskGraphError):
+            graph.add_task('b', lambda: 2, outputs=['value'])
+
+
+class TaskGraphStateTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.state_file = os.path.join(directory.name, 'state.json')
+
+    def build(self, calls, result):
+        graph = TaskGraph(state=StateStore(self.state_file), namespace='example.com')
+
+        def step(name):
+            calls.append(name)
+            return result
+        graph.add_task('step', step, inputs=['name'], outputs=['value'])
+        return graph
+
+    def test_unchanged_step_is_skipped(self):
+        calls = []
+        self.build(calls, 'id-1').run({'name': 'a'})
+        graph = self.build(calls, 'id-2')
+        values = graph.run({'name': 'a'})
+
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(graph.skipped, ['step'])
+        self.assertEqual(values['value'], 'id-1')
+
+    def test_changed_input_reruns_step(self):
+        calls = []
+        self.build(calls, 'id-1').run({'name': 'a'})
+        values = self.build(calls, 'id-2').run({'name': 'b'})
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertEqual(values['value'], 'id-2')
+
+    def test_failed_step_is_not_recorded(self):
+        calls = []
+        self.build(calls, None).run({'name': 'a'})
+        graph = self.build(calls, 'id-1')
+        graph.run({'name': 'a'})
+        self.assertEqual(calls, ['a', 'a'])
+        self.assertEqual(graph.skipped, [])
+
+
+if __name__ == '__main__':
+    unittest.main()